@@ -1,19 +1,31 @@
 import os
+import base64
 from dotenv import load_dotenv
 from pathlib import Path
-import requests
-from threading import Thread
+from threading import Thread, Lock
+from datetime import datetime
+from concurrent.futures import wait
 import uuid
 
-from flask import Flask, render_template, redirect, url_for, request, send_from_directory, jsonify
+from flask import Flask, render_template, redirect, url_for, request, send_from_directory, jsonify, abort
 from werkzeug.utils import secure_filename
-
-from karapp.wifi import connection_bp, get_current_wifi
-from karapp.bluetooth import  bluetooth_bp, get_connected_bluetooth_devices
-from karapp.update import update_bp
-from karapp.deezer import deezer_bp
-from karapp.models import db, FileModel
-from karapp.tools.music import get_metadata
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import aliased
+
+from karapp.wifi import connection_bp
+from karapp.bluetooth import  bluetooth_bp, start_auto_reconnect
+from karapp.update import update_bp, update_checker
+from karapp.deezer import deezer_bp, details_worker
+from karapp.search import search_bp, init_search_index
+from karapp.browse import browse_bp
+from karapp.status import network_status
+from karapp.background import db_writer
+from karapp.fragments import cached_fragment
+from karapp.models import (db, sqlite_engine_options, upgrade_schema, create_missing_indexes, FileModel,
+                           ApplePodcastFeed, add_to_folders, remove_from_folders, rebuild_folder_aggregates,
+                           newest_date, track_order)
+from karapp.library import audio_worker
+from karapp.tools.music import get_metadata, audio_fields
 from karapp.tools.photo import make_artwork_base64
 from karapp.tools import rss
 
@@ -24,30 +36,84 @@ DB_PATH = os.path.join(os.getenv('DB_PATH'), 'karapp.db')
 
 tasks_progress = {}
 
+# Nombre de cartes par page dans les dossiers (défilement infini)
+PAGE_SIZE = 48
+
+# Tris proposés dans les dossiers, du plus grand au plus petit (`added` :
+# ordre d'ajout ; `track` : ordre de l'album, croissant). Lus dans les totaux
+# des dossiers et les colonnes audio, sans ouvrir aucun fichier.
+LISTING_SORTS = {
+    'added': None,
+    'track': track_order,
+    'recent': lambda m: func.coalesce(newest_date(m), datetime.min),
+    'count': lambda m: func.coalesce(m.file_count, 0),
+    'size': lambda m: func.coalesce(m.total_bytes, m.size, 0),
+    'duration': lambda m: func.coalesce(m.total_duration, m.duration, 0),
+}
+ASCENDING_SORTS = {'track'}
+# Tri par défaut d'une catégorie (sinon ordre d'ajout)
+DEFAULT_SORTS = {'musique': 'track'}
+
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///'+DB_PATH
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options()
 app.register_blueprint(connection_bp)
 app.register_blueprint(bluetooth_bp)
 app.register_blueprint(update_bp)
 app.register_blueprint(deezer_bp)
+app.register_blueprint(search_bp)
+app.register_blueprint(browse_bp)
 
 db.init_app(app)
 
-# if not os.path.exists(DB_PATH):
-with app.app_context():
-    # db.drop_all()
-    db.create_all()
+def init_database():
+    with app.app_context():
+        # db.drop_all()
+        db.create_all()
+        added = upgrade_schema()
+        create_missing_indexes()
+        init_search_index()
+        if 'files.file_count' in added:
+            # Base antérieure aux totaux des dossiers : les calculer une fois
+            rebuild_folder_aggregates()
+        if 'files.codec' in added:
+            # Base antérieure aux colonnes audio : relire les fichiers en
+            # arrière-plan (karapp/library.py)
+            audio_worker.trigger()
+
+# Initialisation de la base et workers d'arrière-plan, à la première requête :
+# l'import de l'application reste rapide, et rien n'est lancé dans le
+# processus parent du reloader (qui ne sert aucune page).
+_workers_started = False
+_workers_lock = Lock()
+
+@app.before_request
+def start_background_workers():
+    global _workers_started
+    if _workers_started:
+        return
+    with _workers_lock:
+        if not _workers_started:
+            init_database()
+            details_worker.start(app)
+            audio_worker.start(app)
+            network_status.start()
+            update_checker.start(app)
+            _workers_started = True
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return cached_fragment(('index',), lambda: render_template('index.html'))
 
 @app.route('/parameters')
 def parametres():
-    current_wifi = get_current_wifi()
-    connected_bluetooth = get_connected_bluetooth_devices()
-    return render_template('parameters.html', current_wifi=current_wifi, connected_bluetooth=connected_bluetooth)
+    # État réseau tenu à jour en arrière-plan (karapp/status.py) : la page
+    # s'affiche sans attendre wpa_cli ni bluetoothctl.
+    status = network_status.snapshot()
+    return render_template('parameters.html',
+                           current_wifi=status['wifi'], wifi_ready=status['wifi_ready'],
+                           connected_bluetooth=status['bluetooth'], bluetooth_ready=status['bluetooth_ready'])
 
 @app.route('/sync_db', endpoint='db_sync')
 def synd_db():
@@ -61,14 +127,19 @@ def synd_db():
                 name = None
                 artist = None
                 album = None
+                size = None
+                audio = {}
                 if f.is_file():
                     ftype = 'file'
+                    size = f.stat().st_size
                     if each == 'musique':
-                        meta = get_metadata(str(f))
-                        artwork = meta['artwork']
-                        artist = meta['artist']
-                        name = meta['title']
-                        album = meta['album']
+                        # None si le fichier est illisible
+                        meta = get_metadata(str(f)) or {}
+                        artwork = meta.get('artwork')
+                        artist = meta.get('artist')
+                        name = meta.get('title')
+                        album = meta.get('album')
+                        audio = audio_fields(meta)
                     elif each == 'photo':
                         name = f.name.split('.')[0]
                         artwork = make_artwork_base64(str(f))
@@ -83,27 +154,115 @@ def synd_db():
                     name = name,
                     artwork = artwork,
                     artist = artist,
-                    album=album
-
+                    album=album,
+                    size=size,
+                    # Renseignée dès maintenant (et non au flush) : c'est elle
+                    # qui entre dans newest_at des dossiers parents
+                    added_at=datetime.now(),
+                    **audio
                 )
                 parent = FileModel.query.filter_by(path=str(f.parent)).first()
                 if parent is not None:
                     fmodel.parent = parent.id
                 db.session.add(fmodel)
+                add_to_folders(fmodel)
 
         # retirer ceux qui n'existent plus
-        all_files = FileModel.query.all()
-        for f in all_files:
-            if not os.path.exists(f.path):
-                FileModel.query.filter(FileModel.id == f.id).delete()
+        missing = [f for f in FileModel.query.all() if not os.path.exists(f.path)]
+        # Décompter les fichiers pendant que leurs dossiers sont encore en base
+        for f in missing:
+            if f.type == 'file':
+                remove_from_folders(f)
+        for f in missing:
+            FileModel.query.filter(FileModel.id == f.id).delete()
         db.session.commit()
     return redirect(url_for('parametres'))
 
+def list_files(category, parent_id, after=None, sort=None):
+    """Une page du contenu d'un dossier, selon l'un des LISTING_SORTS (sans
+    tri : ordre d'ajout).
+
+    `after` est le curseur reçu avec la page précédente (id de sa dernière
+    carte). Seules les colonnes affichées sont lues : la pochette (base64) est
+    servie à part par /artwork/<id>. Retourne (cartes, curseur suivant ou None).
+    """
+    query = (
+        db.session.query(FileModel.id, FileModel.type, FileModel.path, FileModel.name, FileModel.artist,
+                         FileModel.duration, FileModel.file_count, FileModel.total_bytes, FileModel.total_duration,
+                         FileModel.artwork.isnot(None).label('has_artwork'))
+        .filter(FileModel.category == category, FileModel.parent == parent_id)
+    )
+    sort_key = LISTING_SORTS.get(sort)
+    if sort_key is None:
+        if after is not None:
+            query = query.filter(FileModel.id > after)
+        query = query.order_by(FileModel.id)
+    elif sort in ASCENDING_SORTS:
+        key = sort_key(FileModel)
+        if after is not None:
+            # Valeur de tri de la dernière carte envoyée, relue en base
+            previous = aliased(FileModel)
+            after_key = select(sort_key(previous)).where(previous.id == after).scalar_subquery()
+            query = query.filter(or_(key > after_key, and_(key == after_key, FileModel.id > after)))
+        query = query.order_by(key, FileModel.id)
+    else:
+        key = sort_key(FileModel)
+        if after is not None:
+            previous = aliased(FileModel)
+            after_key = select(sort_key(previous)).where(previous.id == after).scalar_subquery()
+            query = query.filter(or_(key < after_key, and_(key == after_key, FileModel.id < after)))
+        query = query.order_by(key.desc(), FileModel.id.desc())
+    rows = query.limit(PAGE_SIZE + 1).all()
+    next_cursor = rows[PAGE_SIZE - 1].id if len(rows) > PAGE_SIZE else None
+    return rows[:PAGE_SIZE], next_cursor
+
+def file_cards(category, parent_id, after=None, sort=None):
+    """Cartes HTML d'une page de dossier et curseur suivant, rendues une seule
+    fois par génération de la bibliothèque (karapp/fragments.py)."""
+    def render():
+        items, next_cursor = list_files(category, parent_id, after, sort)
+        return render_template('_file_cards.html', cat=category, items=items), next_cursor
+    return cached_fragment(('categorie', category, parent_id, after, sort), render)
+
+def listing_sort(category):
+    """Tri demandé (paramètre `sort`), ou celui par défaut de la catégorie."""
+    sort = request.args.get('sort')
+    return sort if sort in LISTING_SORTS else DEFAULT_SORTS.get(category, 'added')
+
 @app.route('/categorie/<nom>')
 def categorie(nom):
-    parent_id = request.args.get('parent_id')
-    models = FileModel.query.filter_by(category=nom, parent=parent_id).all()
-    return render_template('files.html', cat=nom, items=models)
+    parent_id = request.args.get('parent_id', type=int)
+    sort = listing_sort(nom)
+    cards, next_cursor = file_cards(nom, parent_id, sort=sort)
+    # Totaux du dossier affiché (nombre de pistes, durée de la playlist)
+    folder = None
+    if parent_id is not None:
+        folder = (db.session.query(FileModel.name, FileModel.file_count, FileModel.total_bytes,
+                                   FileModel.total_duration)
+                  .filter_by(id=parent_id, type='dir').first())
+    return render_template('files.html', cat=nom, cards=cards, parent_id=parent_id, next_cursor=next_cursor,
+                           sort=sort, folder=folder)
+
+@app.get('/listing/<nom>')
+def categorie_page(nom):
+    """Page suivante d'un dossier pour le défilement infini : {html, next}."""
+    sort = listing_sort(nom)
+    cards, next_cursor = file_cards(nom, request.args.get('parent_id', type=int),
+                                    after=request.args.get('after', type=int), sort=sort)
+    return jsonify({"html": cards, "next": next_cursor})
+
+@app.get('/artwork/<int:file_id>')
+def artwork(file_id):
+    """Pochette d'un fichier ou dossier (JPEG), demandée par la carte quand
+    elle arrive à l'écran."""
+    data = db.session.query(FileModel.artwork).filter_by(id=file_id).scalar()
+    if not data:
+        abort(404)
+    response = app.response_class(base64.b64decode(data), mimetype='image/jpeg')
+    response.add_etag()
+    # Court : un id supprimé peut être réattribué à un nouveau fichier
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
 
 @app.route("/categorie/<path:filename>")
 def serve_file(filename):
@@ -120,7 +279,15 @@ def serve_file(filename):
 @app.route('/add_podcast', methods=['GET', 'POST'])
 def add_podcast():
     if request.method == 'POST':
-        url = request.form['url']
+        url = request.form.get('url')
+        apple_url = request.form.get('apple_url')
+        if not url and apple_url:
+            try:
+                url = resolve_apple_feed(apple_url)
+            except Exception as e:
+                print(f"Flux introuvable pour {apple_url}: {e}")
+                return render_template('add_rss.html', searchtools=[rss.ALL_TOOLS] + rss.list_tools(),
+                                       erreur="Impossible de trouver le flux RSS de ce podcast.")
         episodes = rss.get_episodes_list(url)
         return render_template('select_ep.html', podcast=url, episodes=episodes)
     else:
@@ -136,17 +303,46 @@ def add_podcast():
                 existing_names = {ep.name for ep in existing_episodes}
             return render_template('select_ep.html', podcast=url, episodes=episodes, existing=existing_names)
 
-        tool_list = rss.list_tools()
+        tool_list = [rss.ALL_TOOLS] + rss.list_tools()
         return render_template('add_rss.html', searchtools=tool_list)
 
 @app.route("/podcast_search", methods=["POST"])
 def podcast_search():
     podcast_name = request.form.get("podcast_name")
     search_tool_name = request.form.get("searchtool")
-    tool = rss.get_tool_by_name(search_tool_name)
-    resultats = tool.search(podcast_name)
+    if search_tool_name == rss.ALL_TOOLS:
+        # Tous les outils en parallèle : un fournisseur lent ne bloque pas la page
+        resultats = rss.search_all(podcast_name)
+    else:
+        tool = rss.get_tool_by_name(search_tool_name)
+        resultats = tool.search(podcast_name)
+    fill_cached_feeds(resultats)
     return render_template("add_rss.html", resultats=resultats)
 
+def resolve_apple_feed(apple_url):
+    """Retourne le flux RSS d'une page Apple Podcasts, depuis le cache en base
+    ou en chargeant la page (le résultat est alors mémorisé)."""
+    cached = db.session.get(ApplePodcastFeed, apple_url)
+    if cached:
+        return cached.feed_url
+    from karapp.tools.rss.mpdsearch import MpdSearchTool
+    feed_url = MpdSearchTool.get_rss_from_apple_podcast(apple_url)
+    db.session.merge(ApplePodcastFeed(apple_url=apple_url, feed_url=feed_url))
+    db.session.commit()
+    return feed_url
+
+def fill_cached_feeds(resultats):
+    """Complète les résultats sans flux RSS dont la page Apple a déjà été
+    résolue (une seule requête en base pour toute la liste)."""
+    apple_urls = {r['apple_url'] for r in resultats if not r.get('flux_rss') and r.get('apple_url')}
+    if not apple_urls:
+        return
+    known = ApplePodcastFeed.query.filter(ApplePodcastFeed.apple_url.in_(apple_urls)).all()
+    feeds = {k.apple_url: k.feed_url for k in known}
+    for r in resultats:
+        if not r.get('flux_rss') and r.get('apple_url') in feeds:
+            r['flux_rss'] = feeds[r['apple_url']]
+
 @app.post('/download_podcast')
 def download_podcast():
     selected = request.form.getlist("selected")
@@ -164,12 +360,22 @@ def download_podcast():
     # Retourner la page avec la barre de progression
     return render_template("progress.html", task_id=task_id)
 
+def insert_file(fields):
+    """Écriture pour le db_writer : ajoute un FileModel et renvoie son id."""
+    file_model = FileModel(added_at=datetime.now(), **fields)
+    db.session.add(file_model)
+    db.session.flush()
+    add_to_folders(file_model)
+    return file_model.id
+
 def download_worker(task_id, selected, podcast_url):
     """
     Worker exécuté dans un thread séparé.
     IMPORTANT : on doit recréer un app_context pour pouvoir utiliser `db` et d'autres
     objets Flask/SQAlchemy en toute sécurité.
     """
+    import requests
+
     with app.app_context():   # <-- s'assurer d'avoir le contexte Flask
         # Récup infos du podcast
         infos = rss.get_infos(podcast_url)
@@ -182,7 +388,7 @@ def download_worker(task_id, selected, podcast_url):
 
             # artwork et model de dossier
             artwork = make_artwork_base64(infos.get('image'), size=150)
-            dir_model = FileModel(
+            dir_id = db_writer.submit(app, insert_file, dict(
                 type='dir',
                 category='podcast',
                 path=str(path),
@@ -190,10 +396,9 @@ def download_worker(task_id, selected, podcast_url):
                 artwork=artwork,
                 url=podcast_url,
                 description=infos.get('description')
-            )
-            db.session.add(dir_model)
-            db.session.commit()
+            )).result()
         else:
+            dir_id = dir_model.id
             print('%s existe' %infos['titre'])
 
         episodes = rss.get_episodes_list(podcast_url) or []
@@ -204,12 +409,17 @@ def download_worker(task_id, selected, podcast_url):
             return
 
         done = 0
+        # Écritures confiées au db_writer, attendues en fin de téléchargement
+        pending = []
+        known = {name for (name,) in db.session.query(FileModel.name).filter_by(parent=dir_id)}
+        # Rendre la connexion au pool pendant les téléchargements (longs)
+        db.session.close()
         for each in episodes:
-            epModel = FileModel.query.filter_by(parent=dir_model.id, name=each['titre']).first()
-            if each['titre'] not in selected or epModel is not None:
-                if epModel is not None:
+            if each['titre'] not in selected or each['titre'] in known:
+                if each['titre'] in known:
                     print('%s déjà en mémoire' %each['titre'])
                 continue
+            known.add(each['titre'])
 
             epath = path / secure_filename(f"{each['titre']}.mp3")
             ep_url = each.get('audio')
@@ -218,8 +428,9 @@ def download_worker(task_id, selected, podcast_url):
 
             with open(epath, "wb") as f:
                 f.write(response.content)
+            meta = get_metadata(str(epath))
 
-            epModel = FileModel(
+            pending.append(db_writer.submit(app, insert_file, dict(
                 type='file',
                 category='podcast',
                 path=str(epath),
@@ -227,15 +438,16 @@ def download_worker(task_id, selected, podcast_url):
                 artwork=make_artwork_base64(each.get('image'), size=150),
                 url=ep_url,
                 description=each.get('description'),
-                parent=dir_model.id
-            )
-            db.session.add(epModel)
-            db.session.commit()
+                parent=dir_id,
+                size=len(response.content),
+                **audio_fields(meta)
+            )))
             # Mettre à jour la progression
             done += 1
             # calcul safe (entier)
-            tasks_progress[task_id] = int(done * 100 / total)
+            tasks_progress[task_id] = min(int(done * 100 / total), 99)
 
+        wait(pending)
         # fin du travail
         tasks_progress[task_id] = 100
 
@@ -291,6 +503,7 @@ def refresh_folder(folder_id):
             for file_model in existing_files:
                 if file_model.path not in current_paths:
                     if file_model.type == 'file':
+                        remove_from_folders(file_model)
                         db.session.delete(file_model)
                         removed_count += 1
 
@@ -303,13 +516,16 @@ def refresh_folder(folder_id):
                     name = None
                     artist = None
                     album = None
+                    audio = {}
 
                     if category == 'musique':
-                        meta = get_metadata(str(f))
-                        artwork = meta['artwork']
-                        artist = meta['artist']
-                        name = meta['title']
-                        album = meta['album']
+                        # None si le fichier est illisible
+                        meta = get_metadata(str(f)) or {}
+                        artwork = meta.get('artwork')
+                        artist = meta.get('artist')
+                        name = meta.get('title')
+                        album = meta.get('album')
+                        audio = audio_fields(meta)
                     elif category == 'photo':
                         name = f.name.split('.')[0]
                         artwork = make_artwork_base64(str(f))
@@ -322,9 +538,13 @@ def refresh_folder(folder_id):
                         artwork=artwork,
                         artist=artist,
                         album=album,
-                        parent=folder_id
+                        parent=folder_id,
+                        size=f.stat().st_size,
+                        added_at=datetime.now(),
+                        **audio
                     )
                     db.session.add(fmodel)
+                    add_to_folders(fmodel)
                     added_count += 1
 
             db.session.commit()
@@ -357,6 +577,7 @@ def delete_file(file_id):
     parent_id = file_model.parent
 
     try:
+        remove_from_folders(file_model)
         # Si c'est un dossier, supprimer récursivement tous les enfants
         if file_model.type == 'dir':
             def delete_recursive(dir_id):
@@ -397,6 +618,26 @@ def delete_file(file_id):
             return jsonify({"success": False, "error": str(e)}), 500
         return redirect(url_for('categorie', nom=category, parent_id=parent_id))
 
+@app.template_filter('duration')
+def duration_filter(seconds):
+    """Durée lisible : « 2 h 05 », « 42 min », « 35 s »."""
+    seconds = int(seconds or 0)
+    if seconds >= 3600:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d}"
+    if seconds >= 60:
+        return f"{seconds // 60} min"
+    return f"{seconds} s"
+
+@app.template_filter('filesize')
+def filesize_filter(size):
+    """Taille lisible : « 1,2 Go », « 350 Mo », « 12 ko »."""
+    size = size or 0
+    for unit, factor in (('Go', 1 << 30), ('Mo', 1 << 20)):
+        if size >= factor:
+            value = size / factor
+            return (f"{value:.1f}".replace('.', ',') if value < 10 else f"{value:.0f}") + f" {unit}"
+    return f"{max(size >> 10, 1)} ko"
+
 @app.template_filter('basename')
 def basename_filter(path):
     p = Path(path).name
@@ -404,8 +645,21 @@ def basename_filter(path):
 
 
 if __name__ == '__main__':
-    # Exclure .git et .venv du reloader : sans cela, le `git fetch` déclenché
-    # par la vérification de mise à jour modifie des fichiers dans .git/ et
-    # provoque des redémarrages en boucle du serveur en mode debug.
-    app.run(host="0.0.0.0", port=5000, debug=True,
-            exclude_patterns=["*/.git/*", "*/.venv/*"])
\ No newline at end of file
+    if os.getenv('APP_MODE', 'dev') == 'prod':
+        # Serveur de production (karapp/server.py) : pas de reloader, tout
+        # est démarré avant d'ouvrir le port.
+        from karapp.server import serve
+        start_background_workers()
+        start_auto_reconnect()
+        serve(app)
+    else:
+        # Reconnexion de l'enceinte Bluetooth dès le démarrage, sans attendre la
+        # première requête ; seulement dans le processus qui sert les pages (pas
+        # dans le processus parent du reloader).
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_auto_reconnect()
+        # Exclure .git et .venv du reloader : sans cela, le `git fetch` déclenché
+        # par la vérification de mise à jour modifie des fichiers dans .git/ et
+        # provoque des redémarrages en boucle du serveur en mode debug.
+        app.run(host="0.0.0.0", port=5000, debug=True,
+                exclude_patterns=["*/.git/*", "*/.venv/*"])
@@ -0,0 +1,151 @@
+"""
+Test de charge de la base SQLite : lectures des pages pendant des écritures
+concurrentes.
+
+    python bench/db_stress.py [--mode all] [--writers 4] [--readers 4] [--rows 200] [--check]
+
+Des threads « téléchargement » ajoutent chacun `--rows` fichiers pendant que
+des threads « pages » lisent en boucle le contenu d'un dossier. Modes :
+- `legacy` : réglages SQLite par défaut, chaque thread commite après chaque
+  ajout (ancien fonctionnement) ;
+- `direct` : mêmes commits, avec les réglages de SQLITE_PRAGMAS (WAL…) ;
+- `writer` : réglages SQLITE_PRAGMAS, ajouts confiés à `db_writer` (comme
+  download_worker).
+Tous les modes passent par `insert_file` (totaux du dossier compris), pour
+comparer le même travail. Affiche le débit d'écriture, les erreurs « database
+is locked » et la latence des lectures. Avec `--check`, sort en erreur si une
+écriture a échoué ou manque en base (utilisé par tests/test_db_writer.py).
+
+Chaque mode tourne dans un interpréteur neuf, avec DB_PATH et DATA_PATH dans un
+dossier temporaire : la vraie base n'est pas touchée.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import wait
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+def run_mode(args):
+    sys.path.insert(0, PROJECT_ROOT)
+    from sqlalchemy.exc import OperationalError
+
+    import app as karadoc
+    from karapp import models
+    from karapp.background import db_writer, shutdown
+    from karapp.models import db, FileModel
+
+    if args.mode == 'legacy':
+        # Aucune connexion n'est encore ouverte : le réglage s'applique à toutes
+        models.SQLITE_PRAGMAS = ()
+
+    app = karadoc.app
+    karadoc.init_database()
+    with app.app_context():
+        folder_id = karadoc.insert_file(dict(type='dir', category='podcast', path='/stress', name='stress'))
+        db.session.commit()
+
+    errors = []
+    write_done = threading.Event()
+    read_latencies = []
+
+    def fields(writer, index):
+        return dict(type='file', category='podcast', path=f'/stress/{writer}-{index}.mp3',
+                    name=f'Épisode {writer}-{index}', parent=folder_id)
+
+    def write_direct(writer):
+        with app.app_context():
+            for index in range(args.rows):
+                try:
+                    karadoc.insert_file(fields(writer, index))
+                    db.session.commit()
+                except OperationalError as e:
+                    db.session.rollback()
+                    errors.append(str(e.orig))
+
+    def write_batched(writer):
+        with app.app_context():
+            pending = [db_writer.submit(app, karadoc.insert_file, fields(writer, index))
+                       for index in range(args.rows)]
+            for future in wait(pending).done:
+                if future.exception() is not None:
+                    errors.append(str(future.exception()))
+
+    def read():
+        while not write_done.is_set():
+            started = time.perf_counter()
+            with app.app_context():
+                try:
+                    FileModel.query.filter_by(parent=folder_id).order_by(FileModel.name).limit(100).all()
+                except OperationalError as e:
+                    errors.append(str(e.orig))
+                    continue
+            read_latencies.append(time.perf_counter() - started)
+
+    target = write_batched if args.mode == 'writer' else write_direct
+    writers = [threading.Thread(target=target, args=(w,)) for w in range(args.writers)]
+    readers = [threading.Thread(target=read) for _ in range(args.readers)]
+    started = time.perf_counter()
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    write_done.set()
+    for thread in readers:
+        thread.join()
+    shutdown()
+
+    with app.app_context():
+        written = FileModel.query.filter_by(parent=folder_id).count()
+        folder_count = db.session.get(FileModel, folder_id).file_count
+    expected = args.writers * args.rows
+    latencies = sorted(read_latencies) or [0]
+    print(f"Mode {args.mode} : {written} écritures en {elapsed:.2f} s "
+          f"({written / elapsed:.0f}/s), {len(errors)} erreur(s)")
+    for message in sorted(set(errors))[:5]:
+        print(f"  erreur : {message}")
+    print(f"  lectures : {len(read_latencies)}, médiane {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    if args.check:
+        locked = sum('database is locked' in message for message in errors)
+        if errors or written != expected or folder_count != expected:
+            print(f"  ÉCHEC : {written}/{expected} écritures en base, total du dossier {folder_count}, "
+                  f"{len(errors)} erreur(s) dont {locked} « database is locked »")
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mode', choices=('all', 'legacy', 'direct', 'writer'), default='all')
+    parser.add_argument('--writers', type=int, default=4, help="threads d'écriture")
+    parser.add_argument('--readers', type=int, default=4, help="threads de lecture")
+    parser.add_argument('--rows', type=int, default=200, help="écritures par thread")
+    parser.add_argument('--check', action='store_true',
+                        help="échec si une écriture manque ou a échoué")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args)
+        return
+    for mode in (('legacy', 'direct', 'writer') if args.mode == 'all' else (args.mode,)):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DB_PATH=tmp, DATA_PATH=tmp)
+            result = subprocess.run([sys.executable, __file__, '--child', '--mode', mode,
+                                     '--writers', str(args.writers), '--readers', str(args.readers),
+                                     '--rows', str(args.rows)] + (['--check'] if args.check else []),
+                                    cwd=PROJECT_ROOT, env=env)
+            if result.returncode != 0:
+                sys.exit(result.returncode)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Mesure du temps de démarrage de l'application.
+
+    python bench/startup.py [--runs 3] [--top 25]
+
+Pour chaque passage, un interpréteur neuf importe app.py sous
+`python -X importtime`, puis sert deux requêtes sur / avec le client de test
+Flask : la première inclut l'initialisation différée (base, workers).
+Affiche les durées médianes, puis le coût d'import cumulé des modules les
+plus lents (imports directs de app.py) et le total par paquet, pour repérer
+ce qui ralentit le démarrage.
+
+DB_PATH et DATA_PATH pointent vers un dossier temporaire : la vraie base
+n'est pas touchée.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+CHILD = r'''
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.get('/')
+t2 = time.perf_counter()
+client.get('/')
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_request": t2 - t1, "next_request": t3 - t2}))
+'''
+
+# « import time:   self [us] | cumulative | imported package »
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_once(env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD],
+                            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Échec du démarrage :\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent)))
+    return timings, modules
+
+
+def direct_imports(modules, parent):
+    """Modules importés directement par `parent`, avec leur coût cumulé.
+
+    -X importtime affiche chaque module après ceux qu'il importe, indentés de
+    deux espaces de plus."""
+    for index, (name, _, _, indent) in enumerate(modules):
+        if name == parent:
+            break
+    else:
+        return []
+    children = []
+    for name, _, cumulative, child_indent in reversed(modules[:index]):
+        if child_indent <= indent:
+            break
+        if child_indent == indent + 2:
+            children.append((name, cumulative))
+    return sorted(children, key=lambda c: c[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=3, help="nombre de passages (médiane)")
+    parser.add_argument('--top', type=int, default=25, help="nombre de modules affichés")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=tmp, DATA_PATH=tmp)
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"Démarrage ({args.runs} passage(s), médiane) :")
+    for key, label in (('import', "import de app.py"),
+                       ('first_request', "première requête"),
+                       ('next_request', "requête suivante")):
+        value = statistics.median(timings[key] for timings, _ in runs)
+        print(f"  {label:<20} {value * 1000:8.1f} ms")
+
+    # Coûts d'import du dernier passage (fichiers .pyc déjà en place)
+    _, modules = runs[-1]
+
+    print("\nImports directs de app.py, du plus lent au plus rapide (cumulé) :")
+    for name, cumulative in direct_imports(modules, 'app')[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    print("\nTotal par paquet (somme des temps propres) :")
+    packages = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        packages[name.split('.')[0]] += self_us
+    for name, total in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:args.top]:
+        print(f"  {total / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
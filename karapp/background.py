@@ -0,0 +1,244 @@
+"""Travaux en arrière-plan (threads démons).
+
+Les pages doivent répondre tout de suite : ce qui dépend du réseau ou d'un
+matériel lent (téléchargement de pochettes, etc.) passe par un worker. Comme
+pour `download_worker` dans app.py, chaque tâche est exécutée dans un
+app_context pour pouvoir utiliser `db`.
+
+Les écritures des workers passent par `db_writer` (un seul écrivain, commits
+regroupés) : SQLite n'accepte qu'une transaction d'écriture à la fois.
+
+`shutdown()` arrête proprement tous les workers (tâches en cours terminées,
+file vidée dans la limite du délai) : appelé par le serveur de production
+avant de quitter ou de redémarrer.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import text
+
+from karapp.models import db
+
+# Tous les workers créés, pour `shutdown`
+_workers = []
+
+
+def shutdown(timeout=5):
+    """Arrête tous les workers démarrés, en leur laissant au plus `timeout`
+    secondes au total pour finir leur travail."""
+    deadline = time.monotonic() + timeout
+    # Les écrivains en dernier : les autres workers leur confient encore
+    # leurs dernières écritures en s'arrêtant
+    for worker in sorted(_workers, key=lambda w: isinstance(w, BatchWriter)):
+        worker.stop(max(0, deadline - time.monotonic()))
+
+
+class QueueWorker:
+    """Un thread unique qui traite, dans l'ordre, les tâches mises en file.
+
+    `handler(*args)` est appelé dans l'app_context de l'application passée à
+    `submit`. Le thread n'est démarré qu'à la première tâche.
+    """
+
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        _workers.append(self)
+
+    def submit(self, app, *args):
+        self._queue.put((app, args))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        """Traite les tâches en file (dans la limite de `timeout`), puis arrête
+        le thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                return
+            app, args = task
+            try:
+                with app.app_context():
+                    try:
+                        self.handler(*args)
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"Erreur dans le worker {self.name}: {e}")
+                    finally:
+                        db.session.remove()
+            finally:
+                self._queue.task_done()
+
+
+class PeriodicWorker:
+    """Un thread qui appelle `job()` toutes les `interval` secondes, dans
+    l'app_context de l'application passée à `start`.
+
+    `trigger()` réveille le thread pour lancer un passage sans attendre la fin
+    de l'intervalle (p. ex. juste après un ajout en base).
+    """
+
+    def __init__(self, name, job, interval):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._lock = threading.Lock()
+        _workers.append(self)
+
+    def start(self, app):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), name=self.name, daemon=True)
+            self._thread.start()
+
+    def trigger(self):
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        """Laisse finir le passage en cours (dans la limite de `timeout`) et
+        arrête le thread."""
+        self._stopping = True
+        self._wake.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def _run(self, app):
+        while not self._stopping:
+            with app.app_context():
+                try:
+                    self.job()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Erreur dans le worker {self.name}: {e}")
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping:
+                return
+
+
+class BatchWriter:
+    """Thread unique qui fait les écritures en base des workers.
+
+    `submit(app, func, *args)` met l'écriture en file et renvoie un Future.
+    `func(*args)` est appelée dans l'app_context, avec `db.session`, et sa
+    valeur de retour est transmise au Future après le commit. Elle ne doit pas
+    renvoyer d'objet ORM (lié à la session du writer) : un id, par exemple.
+
+    Les écritures en attente sont regroupées (jusqu'à `max_batch`) dans une
+    seule transaction, donc un seul fsync, chacune dans son SAVEPOINT : une
+    écriture en erreur n'annule pas les autres du lot.
+    """
+
+    def __init__(self, name, max_batch=50, linger=0.05):
+        self.name = name
+        self.max_batch = max_batch
+        # Délai d'attente des écritures qui arrivent en rafale (secondes)
+        self.linger = linger
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        _workers.append(self)
+
+    def submit(self, app, func, *args):
+        future = Future()
+        self._queue.put((app, func, args, future))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return future
+
+    def stop(self, timeout=5):
+        """Écrit ce qui est en file (dans la limite de `timeout`), puis arrête
+        le thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            task = self._queue.get()
+            if task is None:
+                return
+            batch = [task]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch:
+                try:
+                    task = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if task is None:
+                    stopping = True
+                    break
+                batch.append(task)
+            self._write(batch)
+
+    def _write(self, batch):
+        app = batch[0][0]
+        results = []
+        with app.app_context():
+            try:
+                # Verrou d'écriture pris dès le début : pas d'échec immédiat
+                # (SQLITE_BUSY) si un autre écrivain passe entre une lecture
+                # et une écriture du lot
+                db.session.execute(text('BEGIN IMMEDIATE'))
+                # Références aux objets chargés par le lot : la session ne les
+                # garde que tant qu'ils sont utilisés, et chaque écriture
+                # relirait sinon les mêmes dossiers parents
+                loaded = set()
+                for _, func, args, future in batch:
+                    try:
+                        with db.session.begin_nested():
+                            value = func(*args)
+                            loaded.update(db.session.identity_map.values())
+                            results.append((future, value, None))
+                    except Exception as e:
+                        print(f"Erreur dans le worker {self.name}: {e}")
+                        results.append((future, None, e))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erreur dans le worker {self.name}: {e}")
+                for _, _, _, future in batch:
+                    future.set_exception(e)
+                return
+            finally:
+                db.session.remove()
+        for future, value, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+
+# Écrivain partagé par tous les workers
+db_writer = BatchWriter("db-writer")
@@ -1,102 +1,239 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, current_app
+import json
+import os
+import threading
+import time
+
+from karapp.background import QueueWorker
 
 bluetooth_bp = Blueprint("bluetooth", __name__)
 _bt_manager = None
+_bt_manager_lock = threading.Lock()
+# Prochaine tentative de connexion à BlueZ par D-Bus (time.monotonic)
+_dbus_retry_at = 0
+DBUS_RETRY_DELAY = 30
 
 @bluetooth_bp.route('/bluetooth_settings')
 def bluetooth_settings():
-    devices = bluetooth_scan_devices()
-    connected_devices = get_connected_bluetooth_devices()
-    debug_logs = get_debug_logs()
-    return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, debug_logs=debug_logs)
-
+    # Rendu immédiat depuis la table de la découverte en arrière-plan ; la
+    # page se met ensuite à jour seule via /bluetooth/devices.
+    scan = bt_discovery.snapshot()
+    return render_template('bluetooth.html', **_devices_context(scan))
 
-@bluetooth_bp.route('/bluetooth/pair', methods=['POST'])
-def bluetooth_pair():
-    mac_address = request.form.get('mac')
-    if not mac_address:
-        return redirect(url_for('bluetooth_settings'))
+@bluetooth_bp.route('/bluetooth/devices')
+def bluetooth_devices():
+    """Table des appareils (JSON) : fragment HTML prêt à insérer et numéro de
+    version de la table, pour la mise à jour en direct de la page."""
+    scan = bt_discovery.snapshot()
+    return jsonify({
+        'updated_at': scan['updated_at'],
+        'html': render_template('_bluetooth_devices.html', **_devices_context(scan)),
+    })
 
-    success, message = bluetooth_pair_device(mac_address)
+def _devices_context(scan):
+    return {
+        'devices': scan['devices'],
+        'connected_devices': [d for d in scan['devices'] if d.get('connected')],
+        'messages': scan['messages'],
+        'updated_at': scan['updated_at'],
+    }
 
-    devices = bluetooth_scan_devices()
-    connected_devices = get_connected_bluetooth_devices()
 
-    if success:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, success=message)
-    else:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, error=message)
+@bluetooth_bp.route('/bluetooth/pair', methods=['POST'])
+def bluetooth_pair():
+    return _submit_action('pair')
 
 
 @bluetooth_bp.route('/bluetooth/connect', methods=['POST'])
 def bluetooth_connect():
-    mac_address = request.form.get('mac')
-    if not mac_address:
-        return redirect(url_for('bluetooth_settings'))
+    return _submit_action('connect')
 
-    success, message = bluetooth_connect_device(mac_address)
 
-    devices = bluetooth_scan_devices()
-    connected_devices = get_connected_bluetooth_devices()
+@bluetooth_bp.route('/bluetooth/disconnect', methods=['POST'])
+def bluetooth_disconnect():
+    return _submit_action('disconnect')
 
-    if success:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, success=message)
-    else:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, error=message)
 
+@bluetooth_bp.route('/bluetooth/remove', methods=['POST'])
+def bluetooth_remove():
+    return _submit_action('remove')
 
-@bluetooth_bp.route('/bluetooth/disconnect', methods=['POST'])
-def bluetooth_disconnect():
+
+def _submit_action(action):
+    """Met l'action en file et répond tout de suite : l'appareil est marqué
+    « en cours » dans la table, puis mis à jour avec le résultat."""
     mac_address = request.form.get('mac')
     if not mac_address:
-        return redirect(url_for('bluetooth_settings'))
+        return redirect(url_for('bluetooth.bluetooth_settings'))
 
-    success, message = bluetooth_disconnect_device(mac_address)
+    bt_discovery.set_action(mac_address, pending=action)
+    action_worker.submit(current_app._get_current_object(), action, mac_address)
 
-    devices = bluetooth_scan_devices()
-    connected_devices = get_connected_bluetooth_devices()
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return jsonify({'success': True})
+    return redirect(url_for('bluetooth.bluetooth_settings'))
 
-    if success:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, success=message)
-    else:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, error=message)
 
+class BluetoothDiscovery:
+    """Découverte Bluetooth continue en arrière-plan, avec une table des
+    appareils (dernière apparition, RSSI, état).
 
-@bluetooth_bp.route('/bluetooth/remove', methods=['POST'])
-def bluetooth_remove():
-    mac_address = request.form.get('mac')
-    if not mac_address:
-        return redirect(url_for('bluetooth_settings'))
+    Comme `WifiScanner`, le thread ne tourne que tant que quelqu'un consulte
+    la table : chaque lecture (`snapshot`) le relance si besoin, et la
+    découverte s'arrête d'elle-même après IDLE_TIMEOUT secondes sans lecture.
+    """
 
-    success, message = bluetooth_remove_device(mac_address)
+    IDLE_TIMEOUT = 60
+    # Un appareil non appairé qui n'a pas été vu depuis STALE_AFTER secondes
+    # n'est plus affiché (hors de portée ou plus en mode découverte).
+    STALE_AFTER = 120
+    # Résultat d'une action sur un appareil qui n'est plus dans la table
+    # (supprimé de BlueZ...) : affiché à part pendant MESSAGE_TTL secondes.
+    MESSAGE_TTL = 60
 
-    devices = bluetooth_scan_devices()
-    connected_devices = get_connected_bluetooth_devices()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._devices = {}  # mac -> infos de l'appareil (+ last_seen)
+        # mac -> action en cours ou dernier résultat, gardé hors de la table :
+        # il survit à la disparition de l'appareil (suppression)
+        self._actions = {}
+        self._version = 0
+        self._last_read = 0
 
-    if success:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, success=message)
-    else:
-        return render_template('bluetooth.html', devices=devices, connected_devices=connected_devices, error=message)
+    def snapshot(self):
+        """Appareils connus : {devices, messages (résultats d'actions sur des
+        appareils qui ne sont plus affichés), updated_at (numéro de version de
+        la table)}. Ne bloque jamais ; (re)démarre la découverte si besoin."""
+        now = time.monotonic()
+        with self._lock:
+            self._last_read = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='bt-discovery', daemon=True)
+                self._thread.start()
+            devices = [{**d, **self._actions.get(d['mac'], {})} for d in self._devices.values()
+                       if d.get('paired') or d.get('connected') or now - d['last_seen'] < self.STALE_AFTER]
+            shown = {d['mac'] for d in devices}
+            messages = [dict(a) for mac, a in self._actions.items()
+                        if mac not in shown and a.get('result') and now - a['at'] < self.MESSAGE_TTL]
+            version = self._version
+        # Connectés d'abord, puis du meilleur signal au plus faible
+        devices.sort(key=lambda d: (not d.get('connected'), -(d.get('rssi') or -999), d.get('name') or ''))
+        return {'devices': devices, 'messages': messages, 'updated_at': version}
 
+    def set_action(self, mac, pending=None, result=None, failed=False):
+        """Action en cours sur un appareil (`pending`), ou son résultat."""
+        mac = mac.upper()
+        with self._lock:
+            name = (self._devices.get(mac) or self._actions.get(mac) or {}).get('name') or mac
+            self._actions[mac] = {'name': name, 'pending': pending, 'result': result, 'failed': failed,
+                                  'at': time.monotonic()}
+            self._version += 1
 
-def _get_bt_manager():
-    """Récupère ou crée l'instance du gestionnaire Bluetooth"""
-    global _bt_manager
-    if _bt_manager is None:
+    def update_device(self, mac, changes):
+        """Fusionne des informations sur un appareil (None : appareil oublié).
+        Retourne True si l'appareil vient d'être ajouté à la table."""
+        mac = mac.upper()
+        with self._lock:
+            added = changes is not None and mac not in self._devices
+            if changes is None:
+                self._devices.pop(mac, None)
+            else:
+                device = self._devices.setdefault(mac, {
+                    'mac': mac, 'name': mac, 'connected': False, 'paired': False,
+                    'trusted': False, 'device_type': 'unknown', 'rssi': None,
+                })
+                device.update(changes)
+                device['mac'] = mac
+                device['last_seen'] = time.monotonic()
+            self._version += 1
+        return added
+
+    def get_device(self, mac):
+        """Copie des infos connues d'un appareil (seulement sa MAC s'il est inconnu)."""
+        with self._lock:
+            return dict(self._devices.get(mac.upper(), {'mac': mac.upper()}))
+
+    def _is_idle(self):
+        with self._lock:
+            if time.monotonic() - self._last_read > self.IDLE_TIMEOUT:
+                self._thread = None
+                return True
+            return False
+
+    def _run(self):
+        manager = _get_bt_manager()
+        if manager is None:
+            return
         try:
-            from karapp.bluetooth_manager import BluetoothManager
-            _bt_manager = BluetoothManager()
+            # Table initiale : appareils déjà connus de BlueZ
+            for device in manager.get_devices():
+                self.update_device(device['mac'], device)
+            manager.discover(self._on_device_event, self._is_idle)
         except Exception as e:
-            print(f"Erreur lors de l'initialisation du gestionnaire Bluetooth: {e}")
-            _bt_manager = None
-    return _bt_manager
+            print(f"Erreur lors de la découverte Bluetooth: {e}")
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
 
-def bluetooth_scan_devices():
-    """Scanne les périphériques Bluetooth disponibles"""
-    manager = _get_bt_manager()
-    if manager is None:
-        return []
-    return manager.scan_devices(duration=5)
+    def _on_device_event(self, mac, changes):
+        # Test et ajout sous le même verrou que les threads des requêtes
+        if self.update_device(mac, changes):
+            # Nouvel appareil : compléter ses infos (type, appairage)
+            manager = _get_bt_manager()
+            info = manager.get_device(mac) if manager else None
+            if info:
+                if info['name'] == info['mac']:
+                    # Pas de nom côté BlueZ : garder celui de la découverte
+                    del info['name']
+                self.update_device(mac, info)
+
+
+bt_discovery = BluetoothDiscovery()
+
+
+def _get_bt_manager():
+    """Récupère ou crée l'instance du gestionnaire Bluetooth.
+
+    BlueZ par D-Bus de préférence, bluetoothctl sinon. Au démarrage, le bus
+    système ou bluetoothd peuvent ne pas être encore prêts : le repli sur
+    bluetoothctl n'est que provisoire, D-Bus est réessayé toutes les
+    DBUS_RETRY_DELAY secondes et remplace bluetoothctl dès qu'il répond."""
+    # pydbus n'est importé qu'à la création du gestionnaire
+    from karapp.bluetooth_dbus import BluezDbusManager
+
+    global _bt_manager, _dbus_retry_at
+    with _bt_manager_lock:
+        if isinstance(_bt_manager, BluezDbusManager):
+            return _bt_manager
+        if time.monotonic() >= _dbus_retry_at:
+            try:
+                _bt_manager = BluezDbusManager()
+                return _bt_manager
+            except ImportError as e:
+                # pydbus absent : inutile de réessayer
+                _dbus_retry_at = float('inf')
+                print(f"BlueZ inaccessible par D-Bus, utilisation de bluetoothctl: {e}")
+            except Exception as e:
+                _dbus_retry_at = time.monotonic() + DBUS_RETRY_DELAY
+                if _bt_manager is None:
+                    print(f"BlueZ inaccessible par D-Bus, utilisation de bluetoothctl: {e}")
+        if _bt_manager is None:
+            try:
+                from karapp.bluetooth_manager import BluetoothManager
+                _bt_manager = BluetoothManager()
+            except Exception as e:
+                print(f"Erreur lors de l'initialisation du gestionnaire Bluetooth: {e}")
+        return _bt_manager
+
+def reset_bt_manager():
+    """Oublie le gestionnaire en cache : le prochain appel le recrée, en
+    retentant D-Bus tout de suite (BlueZ redémarré, bus revenu...)."""
+    global _bt_manager, _dbus_retry_at
+    with _bt_manager_lock:
+        _bt_manager = None
+        if _dbus_retry_at != float('inf'):
+            _dbus_retry_at = 0
 
 def bluetooth_pair_device(mac_address):
     """Appaire un périphérique Bluetooth"""
@@ -110,7 +247,13 @@ def bluetooth_connect_device(mac_address):
     manager = _get_bt_manager()
     if manager is None:
         return False, "Gestionnaire Bluetooth non disponible"
-    return manager.connect_device(mac_address)
+    success, message = manager.connect_device(mac_address)
+    if success:
+        # Dernière enceinte / casque connecté : reconnecté au prochain démarrage
+        device = manager.get_device(mac_address)
+        if device and device['device_type'] == 'audio':
+            save_preferred_device(device)
+    return success, message
 
 def bluetooth_disconnect_device(mac_address):
     """Se déconnecte d'un périphérique Bluetooth"""
@@ -126,16 +269,135 @@ def get_connected_bluetooth_devices():
         return []
     return manager.get_connected_devices()
 
+def get_bluetooth_device(mac_address):
+    """Récupère les infos d'un appareil Bluetooth connu (ou None)"""
+    manager = _get_bt_manager()
+    if manager is None:
+        return None
+    return manager.get_device(mac_address)
+
 def bluetooth_remove_device(mac_address):
     """Supprime un périphérique Bluetooth (unpair)"""
     manager = _get_bt_manager()
     if manager is None:
         return False, "Gestionnaire Bluetooth non disponible"
-    return manager.remove_device(mac_address)
+    success, message = manager.remove_device(mac_address)
+    if success:
+        preferred = load_preferred_device()
+        if preferred and preferred['mac'] == mac_address.upper():
+            save_preferred_device(None)
+    return success, message
 
-def get_debug_logs():
-    """Récupère les logs de debug du scan Bluetooth"""
-    manager = _get_bt_manager()
-    if manager is None:
-        return ["Gestionnaire Bluetooth non disponible"]
-    return getattr(manager, 'debug_logs', [])
\ No newline at end of file
+ACTIONS = {
+    'pair': bluetooth_pair_device,
+    'connect': bluetooth_connect_device,
+    'disconnect': bluetooth_disconnect_device,
+    'remove': bluetooth_remove_device,
+}
+
+def run_action(action, mac_address):
+    """Exécute une action (dans le worker) et met à jour la table des
+    appareils d'après son résultat, sans relancer de scan."""
+    success, message = False, "Erreur inattendue"
+    try:
+        success, message = ACTIONS[action](mac_address)
+    finally:
+        if success:
+            if action == 'remove':
+                # Toujours à portée peut-être, mais plus connu de BlueZ
+                bt_discovery.update_device(mac_address, {'paired': False, 'trusted': False, 'connected': False})
+            else:
+                device = get_bluetooth_device(mac_address)
+                if device is not None:
+                    bt_discovery.update_device(mac_address, device)
+        # Après la mise à jour de la table : le résultat reste lisible même si
+        # la découverte retire l'appareil entre-temps
+        bt_discovery.set_action(mac_address, result=message, failed=not success)
+    if success and action in ('connect', 'disconnect', 'remove'):
+        # Page Paramètres à jour sans attendre l'événement de bluetoothctl
+        from karapp.status import network_status
+        network_status.set_bluetooth_device(
+            {**bt_discovery.get_device(mac_address), 'connected': action == 'connect'})
+
+
+# Une action à la fois : BlueZ gère mal les opérations simultanées
+action_worker = QueueWorker("bluetooth-actions", run_action)
+
+
+# --- Reconnexion automatique au démarrage --------------------------------
+
+# Attente avant chaque nouvelle tentative (secondes) ; abandon ensuite.
+RECONNECT_DELAYS = (2, 4, 8, 15, 30, 60)
+
+def _preferred_device_path():
+    # DB_PATH est lu à l'appel : le .env n'est chargé qu'après l'import du module
+    return os.path.join(os.getenv('DB_PATH') or '.', 'bluetooth_device.json')
+
+def load_preferred_device():
+    """Dernier appareil audio connecté ({mac, name}), ou None."""
+    try:
+        with open(_preferred_device_path()) as f:
+            device = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return device if isinstance(device, dict) and device.get('mac') else None
+
+def save_preferred_device(device):
+    """Mémorise l'appareil audio à reconnecter (None : l'oublier)."""
+    path = _preferred_device_path()
+    try:
+        if device is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        data = {'mac': device['mac'].upper(), 'name': device.get('name')}
+        if load_preferred_device() == data:
+            return
+        # Écriture atomique : jamais de fichier à moitié écrit après une coupure
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Impossible d'enregistrer l'appareil Bluetooth préféré: {e}")
+
+def reconnect_preferred_device():
+    """Reconnecte le dernier appareil audio, en réessayant avec des délais
+    croissants (BlueZ et l'enceinte peuvent démarrer après l'application)."""
+    preferred = load_preferred_device()
+    if preferred is None:
+        return
+    mac = preferred['mac']
+    for delay in RECONNECT_DELAYS:
+        manager = _get_bt_manager()
+        if manager is not None:
+            try:
+                device = manager.find_device(mac)
+            except Exception as e:
+                # BlueZ pas encore prêt (démarrage) : réessayer plus tard, avec
+                # un gestionnaire recréé (D-Bus peut être devenu accessible)
+                print(f"Reconnexion Bluetooth: BlueZ indisponible ({e})")
+                reset_bt_manager()
+                time.sleep(delay)
+                continue
+            if device is None:
+                # Réponse certaine : appareil oublié par BlueZ entre-temps
+                print(f"Reconnexion Bluetooth: {preferred.get('name') or mac} inconnu de BlueZ, abandon")
+                return
+            if device.get('connected'):
+                return
+            success, message = bluetooth_connect_device(mac)
+            if success:
+                print(f"Reconnexion Bluetooth: {preferred.get('name') or mac} connecté")
+                # Pas encore vu par la découverte : partir des infos de BlueZ
+                # et du nom mémorisé
+                bt_discovery.update_device(mac, {'name': preferred.get('name') or mac, **device, 'connected': True})
+                from karapp.status import network_status
+                network_status.set_bluetooth_device(bt_discovery.get_device(mac))
+                return
+        time.sleep(delay)
+    print(f"Reconnexion Bluetooth: {preferred.get('name') or mac} injoignable, abandon")
+
+def start_auto_reconnect():
+    """Lance la reconnexion en arrière-plan (l'interface démarre en parallèle)."""
+    threading.Thread(target=reconnect_preferred_device, name='bt-reconnect', daemon=True).start()
@@ -0,0 +1,232 @@
+"""
+Gestionnaire Bluetooth parlant directement à BlueZ par D-Bus (pydbus)
+
+Même interface que `BluetoothManager` (bluetoothctl), mais sans sous-processus
+ni analyse de texte : un seul appel `GetManagedObjects` donne les propriétés de
+tous les appareils, et les actions passent par `org.bluez.Device1`. Si le bus
+système ou BlueZ ne sont pas accessibles, karapp.bluetooth se rabat sur
+`BluetoothManager`.
+
+Un faux bus BlueZ pour les tests est dans tests/fake_bluez.py.
+"""
+import re
+import time
+
+BLUEZ = 'org.bluez'
+ADAPTER_IFACE = 'org.bluez.Adapter1'
+DEVICE_IFACE = 'org.bluez.Device1'
+
+# Profils qui déterminent le type d'appareil affiché
+AUDIO_SINK_UUID = '0000110b-0000-1000-8000-00805f9b34fb'
+HID_UUID = '00001124-0000-1000-8000-00805f9b34fb'
+
+# Délai des actions longues (appairage, connexion), en secondes
+ACTION_TIMEOUT = 30
+
+_ERROR_RE = re.compile(r'org\.bluez\.Error\.(\w+)(?::\s*(.*))?')
+
+
+class BluezDbusManager:
+    """Gestionnaire Bluetooth utilisant l'API D-Bus de BlueZ"""
+
+    def __init__(self, bus=None):
+        """
+        Initialise le gestionnaire
+
+        Args:
+            bus: bus D-Bus à utiliser (défaut : bus système via pydbus)
+
+        Lève une exception si BlueZ ou l'adaptateur sont introuvables.
+        """
+        if bus is None:
+            from pydbus import SystemBus
+            bus = SystemBus()
+        self.bus = bus
+        self.adapter_path = self._find_adapter()
+
+    def _find_adapter(self):
+        for path, interfaces in self._managed_objects().items():
+            if ADAPTER_IFACE in interfaces:
+                return path
+        raise RuntimeError("Aucun adaptateur Bluetooth")
+
+    def _managed_objects(self):
+        return self.bus.get(BLUEZ, '/').GetManagedObjects()
+
+    def _adapter(self):
+        return self.bus.get(BLUEZ, self.adapter_path)
+
+    def _device_path(self, mac_address):
+        return f"{self.adapter_path}/dev_{mac_address.upper().replace(':', '_')}"
+
+    def _device(self, mac_address):
+        return self.bus.get(BLUEZ, self._device_path(mac_address))
+
+    @staticmethod
+    def _device_info(props):
+        """Convertit les propriétés `org.bluez.Device1` au format de
+        BluetoothManager (plus le RSSI quand BlueZ le connaît)."""
+        uuids = [u.lower() for u in props.get('UUIDs', [])]
+        icon = props.get('Icon', '')
+        device_type = 'unknown'
+        if AUDIO_SINK_UUID in uuids or icon.startswith('audio'):
+            device_type = 'audio'
+        elif HID_UUID in uuids or icon.startswith('input'):
+            device_type = 'input'
+        mac = props.get('Address', '').upper()
+        return {
+            'mac': mac,
+            'name': props.get('Alias') or props.get('Name') or mac,
+            'connected': bool(props.get('Connected')),
+            'paired': bool(props.get('Paired')),
+            'trusted': bool(props.get('Trusted')),
+            'device_type': device_type,
+            'rssi': props.get('RSSI'),
+        }
+
+    def _error_message(self, error):
+        """Message lisible pour une erreur D-Bus (org.bluez.Error.*)."""
+        match = _ERROR_RE.search(str(error))
+        if match:
+            return match.group(2) or match.group(1)
+        return str(error)
+
+    def get_devices(self):
+        """
+        Récupère tous les appareils connus de BlueZ, en un seul appel
+
+        Returns:
+            Liste de dictionnaires contenant les infos des périphériques
+        """
+        devices = []
+        for path, interfaces in self._managed_objects().items():
+            props = interfaces.get(DEVICE_IFACE)
+            if props is not None and path.startswith(self.adapter_path + '/'):
+                devices.append(self._device_info(props))
+        return devices
+
+    def get_device(self, mac_address):
+        """
+        Récupère les informations d'un seul appareil connu
+
+        Returns:
+            Dictionnaire avec les infos de l'appareil ou None
+        """
+        interfaces = self._managed_objects().get(self._device_path(mac_address))
+        if not interfaces or DEVICE_IFACE not in interfaces:
+            return None
+        return self._device_info(interfaces[DEVICE_IFACE])
+
+    def find_device(self, mac_address):
+        """
+        Comme `get_device` : None si BlueZ n'a pas d'objet pour cet appareil,
+        exception si le bus ou BlueZ ne répondent pas.
+        """
+        return self.get_device(mac_address)
+
+    def get_connected_devices(self):
+        """
+        Récupère la liste des périphériques connectés
+
+        Returns:
+            Liste de dictionnaires contenant les infos des périphériques connectés
+        """
+        try:
+            return [d for d in self.get_devices() if d['connected']]
+        except Exception as e:
+            print(f"Erreur lors de la récupération des appareils connectés: {e}")
+            return []
+
+    def discover(self, callback, should_stop, interval=1):
+        """
+        Découverte continue jusqu'à ce que `should_stop()` soit vrai. Même
+        contrat que `BluetoothManager.discover` : `callback(mac, changements)`
+        reçoit les propriétés qui ont changé, ou None si l'appareil a disparu.
+
+        Les propriétés sont relues toutes les `interval` secondes (un seul
+        GetManagedObjects), ce qui évite d'avoir à faire tourner une boucle
+        GLib pour recevoir les signaux PropertiesChanged.
+        """
+        adapter = self._adapter()
+        adapter.StartDiscovery()
+        known = {}
+        try:
+            while not should_stop():
+                current = {d['mac']: d for d in self.get_devices()}
+                for mac, device in current.items():
+                    previous = known.get(mac)
+                    if previous is None:
+                        callback(mac, device)
+                    else:
+                        changes = {k: v for k, v in device.items() if previous.get(k) != v}
+                        if changes:
+                            callback(mac, changes)
+                for mac in known.keys() - current.keys():
+                    callback(mac, None)
+                known = current
+                time.sleep(interval)
+        finally:
+            try:
+                adapter.StopDiscovery()
+            except Exception:
+                pass
+
+    def pair_device(self, mac_address):
+        """
+        Appaire un périphérique Bluetooth (et lui fait confiance)
+
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        try:
+            device = self._device(mac_address)
+            if device.Paired:
+                device.Trusted = True
+                return True, "Périphérique déjà appairé"
+            device.Pair(timeout=ACTION_TIMEOUT)
+            device.Trusted = True
+            return True, "Appairage réussi"
+        except Exception as e:
+            return False, f"Erreur d'appairage: {self._error_message(e)}"
+
+    def connect_device(self, mac_address):
+        """
+        Se connecte à un périphérique Bluetooth
+
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        try:
+            device = self._device(mac_address)
+            if device.Connected:
+                return True, "Périphérique déjà connecté"
+            device.Connect(timeout=ACTION_TIMEOUT)
+            return True, "Connexion réussie"
+        except Exception as e:
+            return False, f"Erreur de connexion: {self._error_message(e)}"
+
+    def disconnect_device(self, mac_address):
+        """
+        Se déconnecte d'un périphérique Bluetooth
+
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        try:
+            self._device(mac_address).Disconnect(timeout=ACTION_TIMEOUT)
+            return True, "Déconnexion réussie"
+        except Exception as e:
+            return False, f"Erreur de déconnexion: {self._error_message(e)}"
+
+    def remove_device(self, mac_address):
+        """
+        Supprime un périphérique Bluetooth (unpair)
+
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        try:
+            self._adapter().RemoveDevice(self._device_path(mac_address))
+            return True, "Périphérique supprimé"
+        except Exception as e:
+            return False, f"Erreur de suppression: {self._error_message(e)}"
@@ -1,21 +1,20 @@
 """
 Gestionnaire Bluetooth utilisant bluetoothctl en ligne de commande
 """
+import os
+import select
 import subprocess
-import time
 import re
-import threading
+
+# Lignes affichées par bluetoothctl pour chaque appareil pendant la découverte :
+# « [NEW] Device <mac> <nom> », « [CHG] Device <mac> RSSI: -60 », « [DEL] ... »
+_DEVICE_EVENT_RE = re.compile(r'\[(NEW|CHG|DEL)\]\s+Device\s+([0-9A-Fa-f:]{17})\s*(.*)')
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]|\x01|\x02')
 
 
 class BluetoothManager:
     """Gestionnaire Bluetooth utilisant bluetoothctl"""
 
-    def __init__(self):
-        """Initialise le gestionnaire Bluetooth"""
-        self.scan_process = None
-        self.scan_lock = threading.Lock()
-        self.debug_logs = []
-
     def _run_bluetoothctl_command(self, command, timeout=10):
         """
         Exécute une commande bluetoothctl
@@ -40,145 +39,13 @@ class BluetoothManager:
         except Exception as e:
             return -1, "", str(e)
 
-    def scan_devices(self, duration=5):
-        """
-        Scanne les périphériques Bluetooth disponibles (Classic + BLE)
-
-        Args:
-            duration: Durée du scan en secondes (défaut: 5)
-
-        Returns:
-            Liste de dictionnaires contenant les infos des périphériques
-        """
-        devices_dict = {}
-        self.debug_logs = []
-
-        try:
-            with self.scan_lock:
-                # 1. Scanner les appareils Bluetooth LE avec hcitool
-                self.debug_logs.append("=== DEBUT SCAN BLUETOOTH ===")
-                self.debug_logs.append("Scan BLE avec hcitool (avec sudo)...")
-
-                # Utiliser un fichier temporaire pour capturer la sortie de hcitool
-                import tempfile
-                lescan_output_file = tempfile.NamedTemporaryFile(mode='w+', delete=False)
-                lescan_output_path = lescan_output_file.name
-                lescan_output_file.close()
-
-                lescan_process = subprocess.Popen(
-                    ['sudo', 'hcitool', 'lescan'],
-                    stdout=open(lescan_output_path, 'w'),
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                self.debug_logs.append(f"Process hcitool lancé: PID {lescan_process.pid}")
-
-                # 2. Scanner les appareils Bluetooth Classic avec bluetoothctl
-                self.debug_logs.append("Scan Classic avec bluetoothctl...")
-                subprocess.Popen(
-                    ['bluetoothctl', 'scan', 'on'],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL
-                )
-
-                # Attendre que les scans trouvent des appareils
-                self.debug_logs.append(f"Attente de {duration} secondes...")
-                time.sleep(duration)
-
-                # Arrêter le scan BLE
-                self.debug_logs.append("Arrêt du scan BLE...")
-                lescan_process.terminate()
-                time.sleep(0.5)  # Laisser le temps d'écrire dans le fichier
-                lescan_process.kill()
-
-                # Lire la sortie du fichier
-                try:
-                    with open(lescan_output_path, 'r') as f:
-                        lescan_stdout = f.read()
-                    import os
-                    os.unlink(lescan_output_path)
-                    self.debug_logs.append(f"Sortie hcitool: {len(lescan_stdout)} caractères")
-                    if lescan_stdout:
-                        lines = lescan_stdout.strip().split('\n')
-                        self.debug_logs.append(f"Nombre de lignes: {len(lines)}")
-                except Exception as e:
-                    lescan_stdout = ""
-                    self.debug_logs.append(f"Erreur lecture fichier: {e}")
-
-                # Arrêter le scan Classic
-                subprocess.run(
-                    ['bluetoothctl', 'scan', 'off'],
-                    capture_output=True,
-                    timeout=5
-                )
-
-            # Parser les résultats du scan BLE (hcitool lescan)
-            for line in lescan_stdout.split('\n'):
-                # Format: "MAC_ADDRESS Name" ou "MAC_ADDRESS (unknown)"
-                match = re.match(r'([\w:]{17})\s+(.+)', line.strip())
-                if match:
-                    mac = match.group(1)
-                    name = match.group(2)
-                    if name and name != '(unknown)' and mac not in devices_dict:
-                        devices_dict[mac] = {'mac': mac, 'name': name, 'type': 'BLE'}
-
-            # Récupérer aussi la liste des appareils via bluetoothctl
-            returncode, stdout, stderr = self._run_bluetoothctl_command(['devices'])
-
-            if returncode == 0:
-                # Parser les appareils (format: "Device MAC_ADDRESS Name")
-                for line in stdout.strip().split('\n'):
-                    if line.startswith('Device '):
-                        match = re.match(r'Device\s+([\w:]+)\s+(.+)', line)
-                        if match:
-                            mac = match.group(1)
-                            name = match.group(2)
-                            if mac not in devices_dict:
-                                devices_dict[mac] = {'mac': mac, 'name': name, 'type': 'Classic'}
-
-            # Obtenir les infos détaillées pour chaque appareil
-            self.debug_logs.append(f"Appareils trouvés dans dictionnaire: {len(devices_dict)}")
-            for mac, info in devices_dict.items():
-                self.debug_logs.append(f"  - {mac}: {info['name']} ({info['type']})")
-
-            devices = []
-            for mac, info in devices_dict.items():
-                device_info = self._get_device_info(mac, info['name'])
-                if device_info:
-                    devices.append(device_info)
-                else:
-                    # Si bluetoothctl ne connaît pas l'appareil, retourner les infos basiques
-                    devices.append({
-                        'mac': mac,
-                        'name': info['name'],
-                        'connected': False,
-                        'paired': False,
-                        'trusted': False,
-                        'device_type': 'audio' if 'BLE' in info['type'] else 'unknown'
-                    })
-
-            self.debug_logs.append(f"=== FIN SCAN: {len(devices)} appareils retournés ===")
-            return devices
-
-        except Exception as e:
-            self.debug_logs.append(f"ERREUR lors du scan Bluetooth: {e}")
-            import traceback
-            self.debug_logs.append(traceback.format_exc())
-            # Essayer d'arrêter les scans en cas d'erreur
-            try:
-                subprocess.run(['bluetoothctl', 'scan', 'off'], timeout=2)
-                subprocess.run(['sudo', 'pkill', 'hcitool'], timeout=2)
-            except:
-                pass
-            return []
-
-    def _get_device_info(self, mac, name):
+    def _get_device_info(self, mac, name=None):
         """
         Récupère les informations détaillées d'un appareil
 
         Args:
             mac: Adresse MAC de l'appareil
-            name: Nom de l'appareil
+            name: Nom de l'appareil (lu dans la sortie de `info` si absent)
 
         Returns:
             Dictionnaire avec les infos de l'appareil ou None
@@ -188,32 +55,39 @@ class BluetoothManager:
 
             if returncode != 0:
                 return None
-
-            # Parser les informations
-            connected = 'Connected: yes' in stdout
-            paired = 'Paired: yes' in stdout
-            trusted = 'Trusted: yes' in stdout
-
-            # Déterminer le type d'appareil
-            device_type = 'unknown'
-            if 'UUID: Audio' in stdout or '0000110b' in stdout.lower():
-                device_type = 'audio'
-            elif 'UUID: Human Interface Device' in stdout or '00001124' in stdout.lower():
-                device_type = 'input'
-
-            return {
-                'mac': mac,
-                'name': name,
-                'connected': connected,
-                'paired': paired,
-                'trusted': trusted,
-                'device_type': device_type
-            }
+            return self._parse_device_info(mac, stdout, name)
 
         except Exception as e:
             print(f"Erreur lors de la récupération des infos de {mac}: {e}")
             return None
 
+    def _parse_device_info(self, mac, stdout, name=None):
+        """Infos d'un appareil d'après la sortie de `bluetoothctl info`."""
+        if name is None:
+            match = re.search(r'^\s*(?:Alias|Name):\s*(.+)$', stdout, re.MULTILINE)
+            name = match.group(1).strip() if match else mac
+
+        # Parser les informations
+        connected = 'Connected: yes' in stdout
+        paired = 'Paired: yes' in stdout
+        trusted = 'Trusted: yes' in stdout
+
+        # Déterminer le type d'appareil
+        device_type = 'unknown'
+        if 'UUID: Audio' in stdout or '0000110b' in stdout.lower():
+            device_type = 'audio'
+        elif 'UUID: Human Interface Device' in stdout or '00001124' in stdout.lower():
+            device_type = 'input'
+
+        return {
+            'mac': mac,
+            'name': name,
+            'connected': connected,
+            'paired': paired,
+            'trusted': trusted,
+            'device_type': device_type
+        }
+
     def pair_device(self, mac_address):
         """
         Appaire un périphérique Bluetooth
@@ -316,6 +190,123 @@ class BluetoothManager:
         except Exception as e:
             return False, f"Erreur: {str(e)}"
 
+    def get_device(self, mac_address):
+        """
+        Récupère les informations d'un seul appareil connu
+
+        Args:
+            mac_address: Adresse MAC du périphérique
+
+        Returns:
+            Dictionnaire avec les infos de l'appareil ou None
+        """
+        return self._get_device_info(mac_address)
+
+    def find_device(self, mac_address):
+        """
+        Comme `get_device`, mais distingue un appareil inconnu d'un échec
+
+        Returns:
+            Dictionnaire avec les infos de l'appareil, ou None si BlueZ répond
+            qu'il ne le connaît pas. Lève RuntimeError si bluetoothctl échoue
+            (bluetoothd pas encore démarré, délai dépassé...).
+        """
+        returncode, stdout, stderr = self._run_bluetoothctl_command(['info', mac_address])
+        if 'not available' in stdout or 'not available' in stderr:
+            return None
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or stdout.strip() or "bluetoothctl info a échoué")
+        return self._parse_device_info(mac_address, stdout)
+
+    def get_devices(self):
+        """
+        Récupère tous les appareils connus de BlueZ (déjà vus ou appairés)
+
+        Returns:
+            Liste de dictionnaires contenant les infos des périphériques
+        """
+        devices = []
+        returncode, stdout, stderr = self._run_bluetoothctl_command(['devices'])
+        if returncode != 0:
+            return []
+        for line in stdout.strip().split('\n'):
+            match = re.match(r'Device\s+([\w:]+)\s+(.+)', line)
+            if match:
+                device_info = self._get_device_info(match.group(1), match.group(2))
+                if device_info:
+                    devices.append(device_info)
+        return devices
+
+    def discover(self, callback, should_stop):
+        """
+        Découverte continue des appareils (Classic et BLE) par un bluetoothctl
+        interactif (`scan on`), jusqu'à ce que `should_stop()` soit vrai
+
+        Args:
+            callback: appelée avec (mac, changements) à chaque nouvelle
+                information sur un appareil ; changements est un dictionnaire
+                partiel ({'name': ...}, {'rssi': -60}, {'connected': True}...)
+                ou None quand BlueZ oublie l'appareil
+            should_stop: fonction sans argument, consultée chaque seconde
+        """
+        process = subprocess.Popen(
+            ['bluetoothctl'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        try:
+            process.stdin.write(b'scan on\n')
+            buffer = b''
+            while not should_stop():
+                ready, _, _ = select.select([process.stdout], [], [], 1)
+                if not ready:
+                    continue
+                data = os.read(process.stdout.fileno(), 4096)
+                if not data:
+                    break  # bluetoothctl s'est arrêté
+                buffer += data
+                *lines, buffer = re.split(rb'[\r\n]', buffer)
+                for line in lines:
+                    event = self._parse_device_event(line.decode('utf-8', errors='replace'))
+                    if event is not None:
+                        callback(*event)
+        finally:
+            try:
+                process.stdin.write(b'scan off\nquit\n')
+                process.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+
+    @staticmethod
+    def _parse_device_event(line):
+        """
+        Interprète une ligne de bluetoothctl
+
+        Returns:
+            Tuple (mac, changements) ou None si la ligne ne concerne pas un appareil
+        """
+        match = _DEVICE_EVENT_RE.search(_ANSI_RE.sub('', line))
+        if not match:
+            return None
+        kind, mac, rest = match.group(1), match.group(2).upper(), match.group(3).strip()
+        if kind == 'DEL':
+            return mac, None
+        if kind == 'NEW':
+            return mac, {'name': rest or mac}
+
+        key, _, value = rest.partition(':')
+        value = value.strip()
+        if key == 'RSSI':
+            # « -60 » ou, selon la version, « 0xffffffc4 (-60) »
+            numbers = re.findall(r'-?\d+', value.split('(')[-1])
+            return (mac, {'rssi': int(numbers[0])}) if numbers else None
+        if key in ('Name', 'Alias') and value:
+            return mac, {'name': value}
+        if key in ('Connected', 'Paired', 'Trusted'):
+            return mac, {key.lower(): value == 'yes'}
+        return None
+
     def get_connected_devices(self):
         """
         Récupère la liste des périphériques connectés
@@ -0,0 +1,183 @@
+"""Navigation dans la musique par artiste et par album, d'après les tags.
+
+Pas de table à tenir à jour : artistes et albums sont des GROUP BY sur les
+colonnes `artist` et `album` du FileModel, servis par deux index qui couvrent
+aussi la durée (ix_files_artists, ix_files_albums). SQLite parcourt l'index
+dans l'ordre des groupes et s'arrête à la fin de la page, quel que soit le
+nombre de pistes. La pochette d'un artiste ou d'un album est celle de sa
+première piste qui en a une, cherchée pour les seules cartes de la page.
+
+Les pages suivent le défilement infini des dossiers (cardlist.js) avec un
+curseur sur la valeur du dernier groupe envoyé. Les fichiers sans tags
+restent accessibles par les dossiers.
+"""
+import json
+
+from flask import Blueprint, render_template, request, jsonify
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import aliased
+
+from karapp.fragments import cached_fragment
+from karapp.models import db, FileModel, track_order
+
+browse_bp = Blueprint("browse", __name__)
+
+BROWSE_CATEGORY = 'musique'
+# Cartes par page, comme dans les dossiers
+BROWSE_PAGE_SIZE = 48
+
+
+def _tracks():
+    """Filtre des pistes taguées (début des deux index)."""
+    return (FileModel.category == BROWSE_CATEGORY, FileModel.type == 'file')
+
+
+def _cover(*keys):
+    """Sous-requête : id de la première piste du groupe qui a une pochette,
+    évaluée pour les seules lignes de la page."""
+    track = aliased(FileModel)
+    return (
+        db.session.query(track.id)
+        .filter(track.category == BROWSE_CATEGORY, track.type == 'file', track.artwork.isnot(None),
+                *(getattr(track, key) == getattr(FileModel, key) for key in keys))
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def list_artists(after=None):
+    """Une page d'artistes (ordre alphabétique) : nom, albums, pistes, durée
+    totale et pochette. Retourne (artistes, curseur suivant ou None)."""
+    query = (
+        db.session.query(FileModel.artist,
+                         func.count(FileModel.album.distinct()).label('album_count'),
+                         func.count().label('track_count'),
+                         func.sum(FileModel.duration).label('total_duration'),
+                         _cover('artist').label('cover_id'))
+        .filter(*_tracks(), FileModel.artist.isnot(None))
+        .group_by(FileModel.artist)
+        .order_by(FileModel.artist)
+    )
+    if after is not None:
+        query = query.filter(FileModel.artist > after)
+    rows = query.limit(BROWSE_PAGE_SIZE + 1).all()
+    next_cursor = rows[BROWSE_PAGE_SIZE - 1].artist if len(rows) > BROWSE_PAGE_SIZE else None
+    return rows[:BROWSE_PAGE_SIZE], next_cursor
+
+
+def _album_cursor(after):
+    """(album, artiste) d'un curseur de `list_albums`. Lève ValueError si le
+    curseur (reçu dans l'URL) n'en est pas un."""
+    cursor = json.loads(after)
+    if not (isinstance(cursor, list) and len(cursor) == 2 and all(isinstance(v, str) for v in cursor)):
+        raise ValueError(f"Curseur d'albums invalide : {after!r}")
+    return cursor
+
+
+def list_albums(artist=None, after=None):
+    """Une page d'albums (ordre alphabétique), de tous les artistes ou d'un
+    seul. `after` : curseur de la page précédente, JSON [album, artiste].
+    Retourne (albums, curseur suivant ou None)."""
+    query = (
+        db.session.query(FileModel.album, FileModel.artist,
+                         func.count().label('track_count'),
+                         func.sum(FileModel.duration).label('total_duration'),
+                         _cover('artist', 'album').label('cover_id'))
+        .filter(*_tracks(), FileModel.album.isnot(None))
+        .group_by(FileModel.album, FileModel.artist)
+        # Après le regroupement : dans le WHERE, SQLite préfère ix_files_artists
+        # et trie ensuite toute la table
+        .having(FileModel.artist.isnot(None))
+        .order_by(FileModel.album, FileModel.artist)
+    )
+    if artist is not None:
+        query = query.filter(FileModel.artist == artist)
+    if after is not None:
+        after_album, after_artist = _album_cursor(after)
+        query = query.filter(tuple_(FileModel.album, FileModel.artist) > tuple_(after_album, after_artist))
+    rows = query.limit(BROWSE_PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(rows) > BROWSE_PAGE_SIZE:
+        last = rows[BROWSE_PAGE_SIZE - 1]
+        next_cursor = json.dumps([last.album, last.artist], ensure_ascii=False)
+    return rows[:BROWSE_PAGE_SIZE], next_cursor
+
+
+def list_album_tracks(artist, album):
+    """Pistes d'un album, dans l'ordre du disque (mêmes colonnes que
+    `list_files` pour _file_cards.html)."""
+    return (
+        db.session.query(FileModel.id, FileModel.type, FileModel.path, FileModel.name, FileModel.artist,
+                         FileModel.duration, FileModel.artwork.isnot(None).label('has_artwork'))
+        .filter(*_tracks(), FileModel.artist == artist, FileModel.album == album)
+        .order_by(track_order(FileModel), FileModel.id)
+        .all()
+    )
+
+
+def _group_cards(kind, artist, after):
+    """Cartes HTML d'une page d'artistes ou d'albums et curseur suivant,
+    rendues une fois par génération de la bibliothèque."""
+    def render():
+        if kind == 'artists':
+            groups, next_cursor = list_artists(after)
+        else:
+            groups, next_cursor = list_albums(artist, after)
+        return render_template('_browse_cards.html', kind=kind, groups=groups), next_cursor
+    return cached_fragment(('browse', kind, artist, after), render)
+
+
+def _browse_page(kind, artist=None):
+    cards, next_cursor = _group_cards(kind, artist, None)
+    return render_template('browse.html', kind=kind, artist=artist, cards=cards, next_cursor=next_cursor)
+
+
+@browse_bp.route("/musique/artistes")
+def artists():
+    return _browse_page('artists')
+
+
+@browse_bp.route("/musique/albums")
+def albums():
+    """Tous les albums, ou ceux d'un artiste (paramètre `artist`)."""
+    return _browse_page('albums', request.args.get('artist'))
+
+
+@browse_bp.get("/musique/<kind>/page")
+def browse_page(kind):
+    """Page suivante pour le défilement infini : {html, next}."""
+    if kind not in ('artists', 'albums'):
+        return jsonify({"success": False, "error": "Vue inconnue"}), 404
+    after = request.args.get('after')
+    if kind == 'albums' and after is not None:
+        try:
+            _album_cursor(after)
+        except ValueError:
+            return jsonify({"success": False, "error": "Curseur invalide"}), 400
+    cards, next_cursor = _group_cards(kind, request.args.get('artist'), after)
+    return jsonify({"html": cards, "next": next_cursor})
+
+
+@browse_bp.route("/musique/album")
+def album():
+    """Pistes d'un album (paramètres `artist` et `album`), jouées avec le
+    lecteur des dossiers."""
+    artist = request.args.get('artist')
+    album_name = request.args.get('album')
+    if artist is None or album_name is None:
+        return jsonify({"success": False, "error": "Paramètres artist et album requis"}), 400
+
+    def render():
+        tracks = list_album_tracks(artist, album_name)
+        return render_template('_file_cards.html', cat=BROWSE_CATEGORY, items=tracks), tracks
+
+    cards, tracks = cached_fragment(('browse', 'album', artist, album_name), render)
+    # Même en-tête que les dossiers : nombre de pistes et durée de l'album
+    folder = {
+        'name': f"{album_name} · {artist}",
+        'file_count': len(tracks),
+        'total_duration': sum(track.duration or 0 for track in tracks),
+        'total_bytes': None,
+    }
+    return render_template('files.html', cat=BROWSE_CATEGORY, cards=cards, parent_id=None, next_cursor=None,
+                           sort=None, folder=folder)
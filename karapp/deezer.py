@@ -6,12 +6,21 @@ proxifiée ici côté serveur : le navigateur ne peut pas l'interroger directeme
 `DeezerItem` (pochette en base64). La lecture se fait via le widget officiel
 Deezer (`widget.deezer.com`) embarqué en iframe — voir `deezer_widget.html`.
 """
-from flask import Blueprint, render_template, request, jsonify, abort, redirect
-import requests
+from flask import Blueprint, render_template, request, jsonify, abort, redirect, current_app, url_for
 import subprocess
 import os
-
-from karapp.models import db, DeezerItem
+import json
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+from sqlalchemy import or_
+
+from karapp.background import QueueWorker, PeriodicWorker, db_writer
+from karapp.fragments import cached_fragment
+from karapp.models import db, DeezerItem, DeezerDetail
+from karapp.tools.cache import TTLCache
 from karapp.tools.photo import make_artwork_base64
 
 deezer_bp = Blueprint("deezer", __name__)
@@ -27,6 +36,39 @@ TYPE_LABELS = {
     "artist": "Artistes",
 }
 
+# Nombre de résultats demandés à l'API par recherche.
+SEARCH_LIMIT = 25
+
+# Délai accordé à chaque type dans la recherche groupée (/deezer/search/all).
+ALL_TYPES_TIMEOUT = 6
+
+# Types dont les détails (liste des titres…) sont gardés hors ligne, durée
+# avant rafraîchissement, et rythme / taille des passages du worker.
+DETAIL_TYPES = ["album", "playlist", "artist"]
+DETAILS_MAX_AGE = timedelta(days=7)
+DETAILS_REFRESH_INTERVAL = 3600
+DETAILS_BATCH = 20
+# Après un échec, attente avant de réessayer, doublée à chaque nouvel échec
+# (dans la limite de DETAILS_MAX_AGE) : un élément qui échoue toujours ne
+# bloque pas la file des autres
+DETAILS_RETRY_DELAY = timedelta(hours=1)
+
+# Résultats de recherche gardés en mémoire, par (type, requête normalisée) :
+# la saisie au clavier relance souvent les mêmes requêtes ou des préfixes.
+search_cache = TTLCache(maxsize=256, ttl=600)
+
+# Session HTTP partagée : réutilise la connexion TLS vers api.deezer.com au
+# lieu d'en ouvrir une nouvelle à chaque recherche. Créée au premier appel :
+# `requests` (lent à importer) n'est chargé qu'à ce moment-là.
+_api_session = None
+
+def get_api_session():
+    global _api_session
+    if _api_session is None:
+        import requests
+        _api_session = requests.Session()
+    return _api_session
+
 
 @deezer_bp.route("/deezer")
 def deezer():
@@ -120,28 +162,137 @@ def deezer_search():
     if not query:
         return jsonify({"results": []})
 
+    import requests
     try:
-        response = requests.get(
-            f"https://api.deezer.com/search/{search_type}",
-            params={"q": query, "limit": 25},
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
+        results = search_deezer(search_type, query)
     except requests.RequestException:
         return jsonify({"error": "Impossible de contacter Deezer"}), 502
     except ValueError:
         return jsonify({"error": "Réponse Deezer invalide"}), 502
 
-    results = [normalize_item(item, search_type) for item in data.get("data", [])]
-    results = [r for r in results if r]
+    return jsonify({"results": results})
+
+
+@deezer_bp.route("/deezer/search/all")
+def deezer_search_all():
+    """Recherche simultanée sur tous les types, résultats groupés (JSON).
+
+    Chaque type a son propre délai : un type trop lent ou en erreur est listé
+    dans `failed` sans empêcher l'affichage des autres.
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"groups": {t: [] for t in SEARCH_TYPES}, "failed": []})
+
+    groups, failed = search_deezer_all(query)
+    if len(failed) == len(SEARCH_TYPES):
+        return jsonify({"error": "Impossible de contacter Deezer"}), 502
+    return jsonify({"groups": groups, "failed": failed})
+
+
+def search_deezer_all(query, timeout=ALL_TYPES_TIMEOUT):
+    """Lance `search_deezer` pour chaque type en parallèle.
 
+    Retourne (groupes {type: résultats}, liste des types en échec).
+    """
+    import requests
+
+    # Pas de `with` : on n'attend pas les types qui ont dépassé leur délai.
+    executor = ThreadPoolExecutor(max_workers=len(SEARCH_TYPES))
+    start = time.monotonic()
+    futures = {t: executor.submit(search_deezer, t, query) for t in SEARCH_TYPES}
+
+    groups = {}
+    failed = []
+    try:
+        for search_type, future in futures.items():
+            remaining = max(0, start + timeout - time.monotonic())
+            try:
+                groups[search_type] = future.result(timeout=remaining)
+            except (FutureTimeout, requests.RequestException, ValueError):
+                groups[search_type] = []
+                failed.append(search_type)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return groups, failed
+
+
+def search_deezer(search_type, query):
+    """Résultats normalisés et classés d'une recherche, servis depuis le cache
+    quand c'est possible.
+
+    Ordre d'essai : même requête déjà en cache ; sinon une requête plus courte
+    dont elle prolonge le texte et dont la réponse était complète (Deezer
+    avait renvoyé tous ses résultats), filtrée localement ; sinon l'API, avec
+    regroupement des appels identiques simultanés.
+    """
+    key = (search_type, normalize_query(query))
+    entry = search_cache.get(key)
+    if entry is None:
+        results = _results_from_prefix(search_type, key[1])
+        if results:
+            return _rank(results, query)
+        entry = search_cache.get_or_compute(key, lambda: _fetch_search(search_type, key[1]))
+    return _rank(entry["results"], query)
+
+
+def _fetch_search(search_type, query):
+    """Interroge l'API Deezer. Lève requests.RequestException / ValueError."""
+    response = get_api_session().get(
+        f"https://api.deezer.com/search/{search_type}",
+        params={"q": query, "limit": SEARCH_LIMIT},
+        timeout=10,
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    items = data.get("data", [])
+    results = [normalize_item(item, search_type) for item in items]
+    return {
+        "results": [r for r in results if r],
+        # Tous les résultats tiennent dans cette page : une requête plus
+        # précise ne pourra renvoyer qu'une partie de ceux-ci.
+        "complete": data.get("total", len(items)) <= len(items),
+    }
+
+
+def _results_from_prefix(search_type, query):
+    """Cherche en cache une réponse complète pour un préfixe de la requête et
+    n'en garde que les éléments dont le titre ou le sous-titre contient chaque
+    mot saisi. Retourne None si rien d'exploitable (la liste vide aussi : Deezer
+    compare d'autres champs que ceux affichés, on préfère alors l'interroger)."""
+    best = None
+    for (cached_type, cached_query), entry in search_cache.items():
+        if (cached_type == search_type and entry["complete"]
+                and cached_query and query.startswith(cached_query)
+                and (best is None or len(cached_query) > len(best[0]))):
+            best = (cached_query, entry)
+    if best is None:
+        return None
+
+    words = fold_text(query).split()
+    results = [r for r in best[1]["results"]
+               if all(w in fold_text(f"{r.get('title', '')} {r.get('subtitle', '')}") for w in words)]
+    return results or None
+
+
+def _rank(results, query):
     # Deezer compare `q` au titre ET à d'autres champs (p. ex. le propriétaire
     # d'une playlist) : on re-classe pour faire remonter les éléments dont le
     # TITRE correspond le mieux à la recherche, sans en supprimer aucun.
-    results.sort(key=lambda r: title_relevance(r.get("title", ""), query), reverse=True)
+    return sorted(results, key=lambda r: title_relevance(r.get("title", ""), query), reverse=True)
+
+
+def normalize_query(query):
+    """Clé de cache d'une requête : minuscules, espaces superflus retirés."""
+    return " ".join((query or "").casefold().split())
 
-    return jsonify({"results": results})
+
+def fold_text(text):
+    """Texte en minuscules et sans accents, pour les comparaisons locales."""
+    text = unicodedata.normalize("NFKD", (text or "").casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
 
 
 def title_relevance(title, query):
@@ -160,59 +311,288 @@ def title_relevance(title, query):
 
 @deezer_bp.route("/deezer/save", methods=["POST"])
 def deezer_save():
-    """Enregistre un élément Deezer en base (pochette téléchargée en base64)."""
-    payload = request.get_json(silent=True) or {}
-    deezer_id = str(payload.get("deezer_id") or "").strip()
-    item_type = payload.get("type")
-    title = payload.get("title") or ""
-    subtitle = payload.get("subtitle") or ""
-    cover_url = payload.get("cover") or ""
+    """Enregistre un élément Deezer en base.
 
-    if not deezer_id or item_type not in SEARCH_TYPES:
+    L'élément est enregistré tout de suite, sans pochette (l'interface affiche
+    alors la couleur par défaut) : la pochette est téléchargée et encodée en
+    arrière-plan par `artwork_worker`.
+    """
+    payload = request.get_json(silent=True) or {}
+    fields = parse_save_payload(payload)
+    if fields is None:
         return jsonify({"error": "Élément invalide"}), 400
 
     # Déjà enregistré ?
-    existing = DeezerItem.query.filter_by(deezer_id=deezer_id, type=item_type).first()
+    existing = DeezerItem.query.filter_by(deezer_id=fields["deezer_id"], type=fields["type"]).first()
     if existing:
         return jsonify({"success": True, "already": True,
                         "message": "Déjà dans ta bibliothèque."})
 
-    # Télécharger et encoder la pochette (comme les artworks du FileModel).
-    artwork = None
-    if cover_url:
-        try:
-            artwork = make_artwork_base64(cover_url)
-        except Exception:
-            artwork = None
-
-    item = DeezerItem(
-        deezer_id=deezer_id,
-        type=item_type,
-        title=title,
-        subtitle=subtitle,
-        artwork=artwork,
-    )
+    cover_url = fields.pop("cover")
+    item = DeezerItem(**fields)
     db.session.add(item)
     db.session.commit()
+    queue_artwork(item, cover_url)
+    if item.type in DETAIL_TYPES:
+        details_worker.trigger()
 
     return jsonify({"success": True, "already": False,
                     "message": "Ajouté à ta bibliothèque Deezer."})
 
 
+@deezer_bp.route("/deezer/save/batch", methods=["POST"])
+def deezer_save_batch():
+    """Enregistre une liste d'éléments (p. ex. une page de résultats) en une
+    seule transaction. Corps JSON : {"items": [{deezer_id, type, title,
+    subtitle, cover}, ...]}. Les éléments déjà présents sont ignorés."""
+    payload = request.get_json(silent=True) or {}
+    entries = payload.get("items")
+    if not isinstance(entries, list):
+        return jsonify({"error": "Liste d'éléments attendue"}), 400
+
+    parsed = [parse_save_payload(e) for e in entries if isinstance(e, dict)]
+    invalid = len(entries) - sum(1 for p in parsed if p)
+    # Dédoublonner la requête elle-même, en gardant le premier exemplaire
+    wanted = {}
+    for fields in parsed:
+        if fields:
+            wanted.setdefault((fields["deezer_id"], fields["type"]), fields)
+
+    # Une seule requête pour repérer ceux déjà en base
+    existing = set()
+    if wanted:
+        rows = DeezerItem.query.filter(
+            DeezerItem.deezer_id.in_([deezer_id for deezer_id, _ in wanted])
+        ).with_entities(DeezerItem.deezer_id, DeezerItem.type).all()
+        existing = {(row.deezer_id, row.type) for row in rows}
+
+    added = []
+    for key, fields in wanted.items():
+        if key in existing:
+            continue
+        cover_url = fields.pop("cover")
+        item = DeezerItem(**fields)
+        db.session.add(item)
+        added.append((item, cover_url))
+    db.session.commit()
+
+    for item, cover_url in added:
+        queue_artwork(item, cover_url)
+    if any(item.type in DETAIL_TYPES for item, _ in added):
+        details_worker.trigger()
+
+    return jsonify({
+        "success": True,
+        "saved": len(added),
+        "already": len(wanted) - len(added),
+        "invalid": invalid,
+        "message": f"{len(added)} élément(s) ajouté(s) à ta bibliothèque Deezer.",
+    })
+
+
+def parse_save_payload(payload):
+    """Valide un élément à enregistrer. Retourne les champs du DeezerItem
+    (plus `cover`, l'URL de la pochette) ou None si l'élément est invalide."""
+    deezer_id = str(payload.get("deezer_id") or "").strip()
+    item_type = payload.get("type")
+    if not deezer_id or item_type not in SEARCH_TYPES:
+        return None
+    return {
+        "deezer_id": deezer_id,
+        "type": item_type,
+        "title": payload.get("title") or "",
+        "subtitle": payload.get("subtitle") or "",
+        "cover": payload.get("cover") or "",
+    }
+
+
+def queue_artwork(item, cover_url):
+    """Confie le téléchargement de la pochette d'un élément enregistré au
+    worker d'arrière-plan."""
+    if cover_url:
+        artwork_worker.submit(current_app._get_current_object(), item.id, cover_url)
+
+
+def fetch_artwork(item_id, cover_url):
+    """Télécharge et encode la pochette (comme les artworks du FileModel)."""
+    try:
+        artwork = make_artwork_base64(cover_url)
+    except Exception as e:
+        print(f"Pochette Deezer indisponible ({cover_url}): {e}")
+        return
+    db_writer.submit(current_app._get_current_object(), save_artwork, item_id, artwork)
+
+
+def save_artwork(item_id, artwork):
+    """Écriture pour le db_writer."""
+    item = db.session.get(DeezerItem, item_id)
+    if item is not None:
+        item.artwork = artwork
+
+
+artwork_worker = QueueWorker("deezer-artwork", fetch_artwork)
+
+
+def refresh_details():
+    """Passage du worker : récupère les détails des éléments qui n'en ont pas
+    encore, puis de ceux dont la copie a plus de DETAILS_MAX_AGE. Une erreur
+    laisse l'ancienne copie en place et repousse l'élément (record_details_failure)."""
+    import requests
+
+    now = datetime.now()
+    stale = (
+        DeezerItem.query
+        .outerjoin(DeezerDetail, DeezerDetail.item_id == DeezerItem.id)
+        .filter(DeezerItem.type.in_(DETAIL_TYPES))
+        .filter(or_(DeezerDetail.id.is_(None), DeezerDetail.fetched_at < now - DETAILS_MAX_AGE))
+        .filter(or_(DeezerItem.details_retry_at.is_(None), DeezerItem.details_retry_at <= now))
+        # Jamais récupérés d'abord, puis les plus anciens
+        .order_by(DeezerDetail.fetched_at.isnot(None), DeezerDetail.fetched_at)
+        .limit(DETAILS_BATCH)
+        .all()
+    )
+
+    stale = [(item.id, item.type, item.deezer_id) for item in stale]
+    # Rendre la connexion au pool pendant les appels à l'API
+    db.session.close()
+
+    app = current_app._get_current_object()
+    saved = []
+    offline = False
+    for item_id, item_type, deezer_id in stale:
+        try:
+            payload = fetch_details(item_type, deezer_id)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Réseau indisponible : rien à reprocher aux éléments, on
+            # réessaiera au passage suivant
+            print(f"Détails Deezer indisponibles (réseau): {e}")
+            offline = True
+            break
+        except (requests.RequestException, ValueError) as e:
+            print(f"Détails Deezer indisponibles pour {item_type}/{deezer_id}: {e}")
+            saved.append(db_writer.submit(app, record_details_failure, item_id, datetime.now()))
+            continue
+        saved.append(db_writer.submit(app, save_details, item_id, json.dumps(payload), datetime.now()))
+    # Le passage suivant doit voir ces écritures (sinon il redemanderait les
+    # mêmes éléments)
+    wait(saved)
+
+    # Lot complet : il en reste sans doute, on enchaîne sans attendre l'heure
+    # (les éléments en échec sont repoussés, le passage suivant ne les revoit pas)
+    if len(stale) == DETAILS_BATCH and not offline:
+        details_worker.trigger()
+
+
+def save_details(item_id, payload, fetched_at):
+    """Écriture pour le db_writer."""
+    item = db.session.get(DeezerItem, item_id)
+    if item is None:
+        return
+    item.details_failures = None
+    item.details_retry_at = None
+    if item.details is None:
+        item.details = DeezerDetail(payload=payload, fetched_at=fetched_at)
+    else:
+        item.details.payload = payload
+        item.details.fetched_at = fetched_at
+
+
+def record_details_failure(item_id, failed_at):
+    """Écriture pour le db_writer : repousse la prochaine tentative."""
+    item = db.session.get(DeezerItem, item_id)
+    if item is None:
+        return
+    item.details_failures = (item.details_failures or 0) + 1
+    delay = min(DETAILS_RETRY_DELAY * 2 ** (item.details_failures - 1), DETAILS_MAX_AGE)
+    item.details_retry_at = failed_at + delay
+
+
+def fetch_details(item_type, deezer_id):
+    """Interroge l'API pour un album, une playlist ou un artiste (ses titres
+    les plus écoutés) et renvoie le JSON normalisé stocké dans DeezerDetail."""
+    data = _api_get(f"{item_type}/{deezer_id}")
+    if item_type == "artist":
+        tracks = _api_get(f"artist/{deezer_id}/top", params={"limit": 50}).get("data", [])
+        cover = data.get("picture_medium")
+    elif item_type == "playlist":
+        tracks = (data.get("tracks") or {}).get("data", [])
+        cover = data.get("picture_medium")
+    else:
+        tracks = (data.get("tracks") or {}).get("data", [])
+        cover = data.get("cover_medium")
+
+    tracks = [{
+        "id": t.get("id"),
+        "title": t.get("title", ""),
+        "artist": (t.get("artist") or {}).get("name", ""),
+        "duration": t.get("duration") or 0,
+    } for t in tracks]
+    return {
+        "cover": cover or "",
+        "duration": data.get("duration") or sum(t["duration"] for t in tracks),
+        "tracks": tracks,
+    }
+
+
+def _api_get(path, params=None):
+    """GET sur l'API Deezer. Elle répond 200 même en cas d'erreur (objet
+    `error` dans le JSON) : on le transforme en ValueError."""
+    response = get_api_session().get(f"https://api.deezer.com/{path}", params=params, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise ValueError(data["error"].get("message", "erreur API"))
+    return data
+
+
+details_worker = PeriodicWorker("deezer-details", refresh_details, DETAILS_REFRESH_INTERVAL)
+
+
 @deezer_bp.route("/deezer/section/<item_type>")
 def deezer_section(item_type):
     """Grille des éléments enregistrés d'un type donné."""
     if item_type not in SEARCH_TYPES:
         abort(404)
-    items = DeezerItem.query.filter_by(type=item_type).order_by(DeezerItem.title).all()
+
+    def render():
+        items = DeezerItem.query.filter_by(type=item_type).order_by(DeezerItem.title).all()
+        return render_template("_deezer_section_items.html", items=items, detail_types=DETAIL_TYPES)
+
     return render_template(
         "deezer_section.html",
-        items=items,
-        item_type=item_type,
+        grid=cached_fragment(("deezer_section", item_type), render),
         label=TYPE_LABELS[item_type],
     )
 
 
+@deezer_bp.route("/deezer/item/<int:item_id>")
+def deezer_item(item_id):
+    """Détails d'un élément enregistré (titres, durées), lus depuis la copie
+    locale uniquement : aucun appel réseau pendant la navigation."""
+    item = DeezerItem.query.get_or_404(item_id)
+    details = json.loads(item.details.payload) if item.details else None
+    if details is None and item.type in DETAIL_TYPES:
+        # Pas encore récupérés : le worker s'en charge dès maintenant
+        details_worker.trigger()
+    return render_template(
+        "deezer_item.html",
+        item=item,
+        details=details,
+        label=TYPE_LABELS[item.type],
+    )
+
+
+@deezer_bp.app_template_filter("duree")
+def format_duration(seconds):
+    """Durée en secondes → « m:ss » (ou « h:mm:ss » au-delà d'une heure)."""
+    seconds = int(seconds or 0)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
 @deezer_bp.route("/deezer/play/<item_type>/<deezer_id>")
 def deezer_play(item_type, deezer_id):
     """Lecture : redirige vers le vrai lecteur web Deezer.
@@ -238,12 +618,7 @@ def deezer_delete(item_id):
     db.session.commit()
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return jsonify({"success": True})
-    return render_template(
-        "deezer_section.html",
-        items=DeezerItem.query.filter_by(type=item_type).order_by(DeezerItem.title).all(),
-        item_type=item_type,
-        label=TYPE_LABELS[item_type],
-    )
+    return redirect(url_for("deezer.deezer_section", item_type=item_type))
 
 
 def normalize_item(item, search_type):
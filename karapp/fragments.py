@@ -0,0 +1,75 @@
+"""Cache des grilles de cartes rendues, invalidé par la génération de la
+bibliothèque.
+
+La bibliothèque (fichiers, éléments Deezer) change rarement, alors que chaque
+visite d'un dossier relisait la base et rendait tout le template. La
+génération augmente à chaque commit qui modifie un `FileModel`, un
+`DeezerItem` ou un `DeezerDetail` (synchronisation, téléchargement,
+suppression, enregistrement…). Elle est suivie par des événements de session
+SQLAlchemy, donc sans rien changer aux routes qui écrivent.
+
+`cached_fragment(key, render)` garde le résultat de `render()` pour
+(key, génération) : revisiter un dossier ne coûte qu'une lecture du cache.
+"""
+import threading
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from karapp.models import FileModel, DeezerItem, DeezerDetail
+from karapp.tools.cache import TTLCache
+
+LIBRARY_MODELS = (FileModel, DeezerItem, DeezerDetail)
+
+# Les entrées ne périment pas avec le temps mais avec la génération : la durée
+# de vie ne sert qu'à libérer la mémoire des pages plus visitées.
+fragment_cache = TTLCache(maxsize=64, ttl=24 * 3600)
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def library_generation():
+    return _generation
+
+
+def bump_library_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    # Les fragments des générations précédentes ne seront plus jamais lus
+    fragment_cache.clear()
+
+
+def cached_fragment(key, render):
+    """Résultat de `render()` pour `key` (p. ex. ('categorie', nom, parent_id)),
+    calculé une seule fois par génération de la bibliothèque."""
+    return fragment_cache.get_or_compute((key, library_generation()), render)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_library_changes(session, flush_context):
+    # Les listes new/dirty/deleted décrivent encore ce qui vient d'être écrit
+    if any(isinstance(obj, LIBRARY_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['library_changed'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_bulk_changes(orm_execute_state):
+    # query(...).delete() / update() ne passent pas par le flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, LIBRARY_MODELS):
+            orm_execute_state.session.info['library_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    if session.info.pop('library_changed', False):
+        bump_library_generation()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('library_changed', None)
@@ -0,0 +1,69 @@
+"""Infos techniques des fichiers audio (durée, débit, codec, numéros de piste
+et de disque), lues une fois par mutagen et gardées dans le FileModel.
+
+Les fichiers ajoutés par la synchronisation, l'actualisation d'un dossier ou
+un téléchargement de podcast sont lus à l'ajout. `audio_worker` complète en
+arrière-plan ceux qui n'ont pas encore ces colonnes (base antérieure), par
+lots, sans bloquer les pages : ensuite, ordre des pistes et durées des
+playlists se lisent en base sans ouvrir aucun fichier.
+"""
+import os
+from concurrent.futures import wait
+
+from flask import current_app
+
+from karapp.background import PeriodicWorker, db_writer
+from karapp.models import db, FileModel, add_to_folders, remove_from_folders
+from karapp.tools.music import get_metadata, audio_fields
+
+AUDIO_CATEGORIES = ('musique', 'podcast')
+# Fichiers relus par passage du worker (lecture des en-têtes sur la carte SD)
+AUDIO_BATCH = 50
+# Le worker ne trouve plus rien à faire une fois la base complétée
+AUDIO_REFRESH_INTERVAL = 24 * 3600
+
+
+def backfill_audio_metadata():
+    """Passage du worker : relit les en-têtes d'un lot de fichiers audio qui
+    n'ont pas encore de codec, et enchaîne tant qu'il en reste."""
+    pending = (
+        db.session.query(FileModel.id, FileModel.path)
+        .filter(FileModel.type == 'file', FileModel.category.in_(AUDIO_CATEGORIES), FileModel.codec.is_(None))
+        .order_by(FileModel.id)
+        .limit(AUDIO_BATCH)
+        .all()
+    )
+    # Rendre la connexion au pool pendant la lecture des fichiers
+    db.session.close()
+
+    app = current_app._get_current_object()
+    saved = []
+    for file_id, path in pending:
+        fields = audio_fields(get_metadata(path))
+        # Fichier illisible : codec vide, pour ne pas le relire à chaque passage
+        fields['codec'] = fields.get('codec') or ''
+        try:
+            fields['size'] = os.path.getsize(path)
+        except OSError:
+            pass
+        saved.append(db_writer.submit(app, save_audio_fields, file_id, fields))
+    # Le passage suivant ne doit pas relire les mêmes fichiers
+    wait(saved)
+
+    if len(pending) == AUDIO_BATCH:
+        audio_worker.trigger()
+
+
+def save_audio_fields(file_id, fields):
+    """Écriture pour le db_writer, totaux des dossiers parents compris (la
+    durée et la taille du fichier peuvent changer)."""
+    file_model = db.session.get(FileModel, file_id)
+    if file_model is None:
+        return
+    remove_from_folders(file_model)
+    for key, value in fields.items():
+        setattr(file_model, key, value)
+    add_to_folders(file_model)
+
+
+audio_worker = PeriodicWorker("audio-metadata", backfill_audio_metadata, AUDIO_REFRESH_INTERVAL)
@@ -1,8 +1,49 @@
+import os
+import sqlite3
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import ForeignKey, UniqueConstraint, case, event, func, inspect, literal_column, text, update
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
+# Réglages appliqués à chaque nouvelle connexion SQLite. Avec le journal par
+# défaut, un écrivain bloque tous les lecteurs (et inversement) : les commits
+# des téléchargements provoquaient des « database is locked » dans les pages.
+SQLITE_PRAGMAS = (
+    # Les lecteurs ne bloquent plus l'écrivain, ni l'écrivain les lecteurs
+    'journal_mode=WAL',
+    # Sans risque de corruption en WAL ; fsync aux checkpoints seulement
+    'synchronous=NORMAL',
+    # Attendre jusqu'à 10 s que le verrou d'écriture se libère (ms)
+    'busy_timeout=10000',
+    # Lecture de la base par mmap (64 Mo), sans copie dans le cache SQLite
+    'mmap_size=67108864',
+    'temp_store=MEMORY',
+)
+
+
+def sqlite_engine_options():
+    """Options du moteur (SQLALCHEMY_ENGINE_OPTIONS) : une connexion par thread
+    du serveur, plus celles des workers et des téléchargements en cours."""
+    return {
+        'pool_size': int(os.getenv('SERVER_THREADS', 4)) + 2,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
 class FileModel(db.Model):
     __tablename__ = 'files'
     id = db.Column(db.Integer, primary_key=True)
@@ -16,6 +57,150 @@ class FileModel(db.Model):
     album = db.Column(db.String(50))
     artist = db.Column(db.String(50))
     name = db.Column(db.String(50))
+    # Fichiers : taille (octets), durée (secondes, audio) et date d'ajout
+    size = db.Column(db.Integer)
+    duration = db.Column(db.Float)
+    added_at = db.Column(db.DateTime, default=datetime.now)
+    # Audio : infos techniques lues par mutagen à l'ajout (bits/s, format)
+    bitrate = db.Column(db.Integer)
+    codec = db.Column(db.String(20))
+    track_number = db.Column(db.Integer)
+    disc_number = db.Column(db.Integer)
+    # Dossiers : totaux de tous les fichiers qu'ils contiennent, sous-dossiers
+    # compris. Tenus à jour à chaque ajout ou suppression (add_to_folders,
+    # remove_from_folders) pour ne jamais parcourir l'arborescence à l'affichage.
+    file_count = db.Column(db.Integer)
+    total_bytes = db.Column(db.Integer)
+    total_duration = db.Column(db.Float)
+    newest_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Contenu d'un dossier, page par page (curseur sur l'id)
+        db.Index('ix_files_listing', 'category', 'parent', 'id'),
+        # Artistes et albums d'après les tags (karapp/browse.py) : GROUP BY
+        # dans l'ordre de l'index, durée comprise, sans lire la table
+        db.Index('ix_files_artists', 'category', 'type', 'artist', 'album', 'duration'),
+        db.Index('ix_files_albums', 'category', 'type', 'album', 'artist', 'duration'),
+    )
+
+
+def track_order(model):
+    """Expression SQL : position d'une piste dans son album (disque puis piste,
+    les fichiers sans numéro à la fin). Constantes écrites en clair : SQLite
+    n'utilise l'index ix_files_tracks que pour une expression identique."""
+    return func.coalesce(
+        func.coalesce(model.disc_number, literal_column('1')) * literal_column('1000') + model.track_number,
+        literal_column('999999'))
+
+
+# Pistes d'un dossier dans l'ordre de l'album, page par page
+db.Index('ix_files_tracks', FileModel.category, FileModel.parent, track_order(FileModel), FileModel.id)
+
+
+def _totals(file_model):
+    """(fichiers, octets, secondes, plus récent) qu'un fichier ou un dossier
+    représente dans les totaux de ses parents."""
+    if file_model.type == 'dir':
+        return (file_model.file_count or 0, file_model.total_bytes or 0,
+                file_model.total_duration or 0, file_model.newest_at)
+    # Les ajouts renseignent added_at eux-mêmes ; à défaut (rempli au flush),
+    # fichier tout juste ajouté
+    return 1, file_model.size or 0, file_model.duration or 0, file_model.added_at or datetime.now()
+
+
+def newest_date(model):
+    """Expression SQL : date d'ajout d'un fichier, ou du fichier le plus récent
+    d'un dossier."""
+    return case((model.type == 'dir', model.newest_at), else_=model.added_at)
+
+
+def _parent_folders(parent_id):
+    """Dossiers parents, du plus proche à la racine."""
+    while parent_id is not None:
+        folder = db.session.get(FileModel, parent_id)
+        if folder is None:
+            return
+        yield folder
+        parent_id = folder.parent
+
+
+def add_to_folders(file_model):
+    """Ajoute un fichier (ou un dossier et son contenu) qui vient d'être créé
+    aux totaux de tous ses dossiers parents."""
+    count, size, duration, newest = _totals(file_model)
+    if not count:
+        return
+    for folder in _parent_folders(file_model.parent):
+        folder.file_count = (folder.file_count or 0) + count
+        folder.total_bytes = (folder.total_bytes or 0) + size
+        folder.total_duration = (folder.total_duration or 0) + duration
+        if newest is not None and (folder.newest_at is None or newest > folder.newest_at):
+            folder.newest_at = newest
+
+
+def remove_from_folders(file_model):
+    """Retire un fichier (ou un dossier et son contenu) des totaux de ses
+    dossiers parents. À appeler avant de le supprimer de la session."""
+    count, size, duration, newest = _totals(file_model)
+    if not count:
+        return
+    removed_id = file_model.id
+    for folder in _parent_folders(file_model.parent):
+        folder.file_count = max((folder.file_count or 0) - count, 0)
+        folder.total_bytes = max((folder.total_bytes or 0) - size, 0)
+        folder.total_duration = max((folder.total_duration or 0) - duration, 0)
+        # Le plus récent s'en va : relire celui des autres enfants (les
+        # dossiers plus bas ont déjà été recalculés, on remonte vers la racine)
+        if newest is not None and folder.newest_at is not None and newest >= folder.newest_at:
+            folder.newest_at = (
+                db.session.query(func.max(newest_date(FileModel)))
+                .filter(FileModel.parent == folder.id, FileModel.id != removed_id)
+                .scalar()
+            )
+        removed_id = None
+
+
+def rebuild_folder_aggregates():
+    """Recalcule les totaux de tous les dossiers en un passage (après l'ajout
+    des colonnes à une base existante). Complète au passage la taille et la
+    date d'ajout des fichiers qui n'en ont pas, d'après le disque."""
+    rows = db.session.query(FileModel.id, FileModel.parent, FileModel.type, FileModel.path,
+                            FileModel.size, FileModel.duration, FileModel.added_at).all()
+    parents = {row.id: row.parent for row in rows}
+    totals = {row.id: [0, 0, 0.0, None] for row in rows if row.type == 'dir'}
+    file_updates = []
+    for row in rows:
+        if row.type == 'dir':
+            continue
+        size, added_at = row.size, row.added_at
+        if size is None or added_at is None:
+            try:
+                stat = os.stat(row.path)
+            except OSError:
+                stat = None
+            if size is None and stat is not None:
+                size = stat.st_size
+            if added_at is None:
+                added_at = datetime.fromtimestamp(stat.st_mtime) if stat is not None else datetime.now()
+            file_updates.append({'id': row.id, 'size': size, 'added_at': added_at})
+        parent_id = row.parent
+        while parent_id in totals:
+            total = totals[parent_id]
+            total[0] += 1
+            total[1] += size or 0
+            total[2] += row.duration or 0
+            if total[3] is None or added_at > total[3]:
+                total[3] = added_at
+            parent_id = parents.get(parent_id)
+    if file_updates:
+        db.session.execute(update(FileModel), file_updates)
+    if totals:
+        db.session.execute(update(FileModel), [
+            {'id': folder_id, 'file_count': count, 'total_bytes': size,
+             'total_duration': duration, 'newest_at': newest}
+            for folder_id, (count, size, duration, newest) in totals.items()
+        ])
+    db.session.commit()
 
 
 class DeezerItem(db.Model):
@@ -32,7 +217,73 @@ class DeezerItem(db.Model):
     title = db.Column(db.String(200))
     subtitle = db.Column(db.String(200))  # artiste / propriétaire / « X titres »
     artwork = db.Column(db.Text)  # pochette encodée en base64
+    # Échecs consécutifs de récupération des détails (élément retiré de
+    # Deezer…) et date avant laquelle le worker ne réessaie pas
+    details_failures = db.Column(db.Integer)
+    details_retry_at = db.Column(db.DateTime)
+    details = db.relationship('DeezerDetail', uselist=False, cascade='all, delete-orphan')
 
     __table_args__ = (
         UniqueConstraint('deezer_id', 'type', name='uix_deezer_id_type'),
     )
+
+
+class DeezerDetail(db.Model):
+    """Détails d'un élément Deezer enregistré (liste des titres, durées,
+    pochette), copiés depuis l'API en arrière-plan pour que la consultation de
+    la bibliothèque ne dépende jamais du réseau.
+
+    `payload` est un JSON normalisé : {cover, duration, tracks: [{id, title,
+    artist, duration}]}. Table à part pour ne pas alourdir les listes de
+    `DeezerItem`.
+    """
+    __tablename__ = 'deezer_details'
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, ForeignKey('deezer_items.id'), nullable=False, unique=True)
+    payload = db.Column(db.Text, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False)
+
+
+class ApplePodcastFeed(db.Model):
+    """Cache persistant page Apple Podcasts → URL du flux RSS.
+
+    Trouver le flux d'un podcast Apple demande de charger sa page web : on ne
+    le fait qu'une fois par podcast, au moment où il est choisi.
+    """
+    __tablename__ = 'apple_podcast_feeds'
+    apple_url = db.Column(db.String(500), primary_key=True)
+    feed_url = db.Column(db.String(500), nullable=False)
+
+
+def upgrade_schema():
+    """Ajoute aux tables existantes les colonnes déclarées sur les modèles qui
+    leur manquent (`create_all` ne modifie jamais une table existante).
+    Retourne les colonnes ajoutées, sous la forme 'table.colonne'."""
+    added = []
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def create_missing_indexes():
+    """Crée les index déclarés sur les modèles qui manquent en base :
+    `create_all` ne les ajoute pas aux tables qui existent déjà.
+
+    Comparaison par nom dans sqlite_master : la réflexion de SQLAlchemy ignore
+    les index sur expression (ix_files_tracks)."""
+    with db.engine.connect() as connection:
+        existing = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
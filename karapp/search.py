@@ -0,0 +1,175 @@
+"""Recherche plein texte dans toute la bibliothèque locale.
+
+Un index SQLite FTS5 (`library_fts`) couvre les fichiers (`FileModel` : nom,
+artiste, album, description) et les éléments Deezer enregistrés (titre,
+sous-titre). Il est tenu à jour par des triggers SQL, donc sans rien changer
+aux routes qui écrivent en base. Le tokenizer ignore les accents et chaque mot
+saisi est cherché comme préfixe (« ele » trouve « Éléphant »).
+
+Les lignes de l'index réutilisent l'id de la source dans leur rowid : id * 2
+pour un fichier, id * 2 + 1 pour un élément Deezer.
+"""
+import re
+
+from flask import Blueprint, render_template, request, jsonify, url_for
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from karapp.models import db, FileModel, DeezerItem
+
+search_bp = Blueprint("search", __name__)
+
+# Nombre maximal de résultats renvoyés.
+SEARCH_LIMIT = 50
+
+_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE library_fts USING fts5(
+        kind UNINDEXED, title, subtitle, album, description,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+]
+
+_TRIGGERS_DDL = [
+    # Fichiers et dossiers
+    """CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+        INSERT INTO library_fts(rowid, kind, title, subtitle, album, description)
+        VALUES (new.id * 2, 'file', new.name, new.artist, new.album, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+        DELETE FROM library_fts WHERE rowid = old.id * 2;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS files_fts_update
+        AFTER UPDATE OF name, artist, album, description ON files BEGIN
+        DELETE FROM library_fts WHERE rowid = old.id * 2;
+        INSERT INTO library_fts(rowid, kind, title, subtitle, album, description)
+        VALUES (new.id * 2, 'file', new.name, new.artist, new.album, new.description);
+    END""",
+    # Éléments Deezer
+    """CREATE TRIGGER IF NOT EXISTS deezer_fts_insert AFTER INSERT ON deezer_items BEGIN
+        INSERT INTO library_fts(rowid, kind, title, subtitle)
+        VALUES (new.id * 2 + 1, 'deezer', new.title, new.subtitle);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS deezer_fts_delete AFTER DELETE ON deezer_items BEGIN
+        DELETE FROM library_fts WHERE rowid = old.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS deezer_fts_update
+        AFTER UPDATE OF title, subtitle ON deezer_items BEGIN
+        DELETE FROM library_fts WHERE rowid = old.id * 2 + 1;
+        INSERT INTO library_fts(rowid, kind, title, subtitle)
+        VALUES (new.id * 2 + 1, 'deezer', new.title, new.subtitle);
+    END""",
+]
+
+# Remplissage initial, quand l'index est créé sur une base déjà peuplée.
+_INDEX_FILL = [
+    """INSERT INTO library_fts(rowid, kind, title, subtitle, album, description)
+       SELECT id * 2, 'file', name, artist, album, description FROM files""",
+    """INSERT INTO library_fts(rowid, kind, title, subtitle)
+       SELECT id * 2 + 1, 'deezer', title, subtitle FROM deezer_items""",
+]
+
+
+def init_search_index():
+    """Crée l'index et ses triggers s'ils n'existent pas (à appeler après
+    `db.create_all()`, dans un app_context)."""
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'library_fts'"
+            )).first()
+            if not exists:
+                for ddl in _INDEX_DDL + _INDEX_FILL:
+                    conn.execute(text(ddl))
+            for ddl in _TRIGGERS_DDL:
+                conn.execute(text(ddl))
+    except OperationalError as e:
+        # SQLite compilé sans FTS5 : la recherche sera indisponible
+        print(f"Index de recherche indisponible: {e}")
+
+
+def build_match_query(query):
+    """Transforme la saisie en requête FTS5 : chaque mot devient un préfixe
+    entre guillemets (aucun opérateur FTS5 ne peut être injecté), et tous les
+    mots doivent être présents."""
+    words = re.findall(r"\w+", query or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_library(query, limit=SEARCH_LIMIT):
+    """Retourne les résultats (dictionnaires prêts pour le front), du plus
+    pertinent au moins pertinent. Le titre pèse plus que l'artiste/sous-titre,
+    lui-même plus que l'album puis la description."""
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    rows = db.session.execute(text(
+        "SELECT rowid FROM library_fts WHERE library_fts MATCH :match "
+        "ORDER BY bm25(library_fts, 0.0, 10.0, 5.0, 3.0, 1.0) LIMIT :limit"
+    ), {"match": match, "limit": limit}).all()
+    rowids = [row.rowid for row in rows]
+
+    file_ids = [r // 2 for r in rowids if r % 2 == 0]
+    deezer_ids = [r // 2 for r in rowids if r % 2 == 1]
+    files = {f.id: f for f in FileModel.query.filter(FileModel.id.in_(file_ids))} if file_ids else {}
+    deezer = {d.id: d for d in DeezerItem.query.filter(DeezerItem.id.in_(deezer_ids))} if deezer_ids else {}
+
+    results = []
+    for rowid in rowids:
+        if rowid % 2 == 0:
+            model = files.get(rowid // 2)
+            if model is not None:
+                results.append(_file_result(model))
+        else:
+            item = deezer.get(rowid // 2)
+            if item is not None:
+                results.append(_deezer_result(item))
+    return results
+
+
+def _file_result(model):
+    if model.type == 'dir':
+        # Ouvrir le dossier lui-même
+        url = url_for('categorie', nom=model.category, parent_id=model.id)
+    else:
+        # Ouvrir le dossier qui contient le fichier
+        url = url_for('categorie', nom=model.category, parent_id=model.parent)
+    return {
+        "kind": model.type,
+        "category": model.category,
+        "title": model.name or "",
+        "subtitle": " · ".join(v for v in (model.artist, model.album) if v),
+        "url": url,
+    }
+
+
+def _deezer_result(item):
+    return {
+        "kind": "deezer",
+        "category": item.type,
+        "title": item.title or "",
+        "subtitle": item.subtitle or "",
+        "url": url_for('deezer.deezer_play', item_type=item.type, deezer_id=item.deezer_id),
+    }
+
+
+@search_bp.route("/recherche")
+def recherche():
+    """Page de recherche (le JS interroge /search)."""
+    return render_template("search.html")
+
+
+@search_bp.route("/search")
+def search():
+    """Recherche dans la bibliothèque, renvoie une liste de résultats (JSON).
+
+    Paramètre : q (mots-clés, préfixes acceptés, accents ignorés).
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"results": []})
+    try:
+        results = search_library(query)
+    except OperationalError:
+        return jsonify({"error": "Recherche indisponible"}), 500
+    return jsonify({"results": results})
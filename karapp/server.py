@@ -0,0 +1,130 @@
+"""
+Serveur de production (waitress), à la place du serveur de développement de
+Flask : plusieurs threads, ni reloader ni débogueur, arrêt propre des workers
+et fichiers statiques précompressés.
+
+Choisi par `APP_MODE=prod` dans .env (défaut : `dev`). Réglages (.env) :
+- SERVER_HOST (défaut 0.0.0.0) et SERVER_PORT (défaut 5000) ;
+- SERVER_THREADS (défaut 4) : nombre de requêtes traitées en parallèle.
+
+Les fichiers texte de static/ (css, js, svg…) sont compressés une fois au
+démarrage (`fichier.css.gz` à côté de `fichier.css`) et servis tels quels aux
+navigateurs qui acceptent gzip : plus de compression à chaque requête, et
+beaucoup moins d'octets à lire sur la carte SD.
+"""
+import gzip
+import mimetypes
+import os
+import shutil
+import signal
+import threading
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+from karapp import background
+
+# Extensions compressées à l'avance (les images et woff2 le sont déjà)
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.ttf', '.eot', '.otf')
+# En dessous, l'en-tête gzip coûte plus qu'il ne rapporte
+MIN_SIZE = 1024
+
+
+def precompress_static(static_folder):
+    """Crée (ou recrée s'il est plus ancien que l'original) le .gz de chaque
+    fichier compressible de `static_folder`. Retourne le nombre de fichiers
+    compressés."""
+    count = 0
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            target = path + '.gz'
+            try:
+                if os.path.getsize(path) < MIN_SIZE:
+                    continue
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                tmp = target + '.tmp'
+                with open(path, 'rb') as src, open(tmp, 'wb') as raw:
+                    with gzip.GzipFile(filename='', mode='wb', compresslevel=9, fileobj=raw, mtime=0) as dst:
+                        shutil.copyfileobj(src, dst)
+                os.replace(tmp, target)
+                count += 1
+            except OSError as e:
+                print(f"Erreur lors de la compression de {path}: {e}")
+    return count
+
+
+def _fresh_gzip(static_folder, filename):
+    """Chemin du .gz de `filename` s'il existe et est à jour, sinon None."""
+    path = safe_join(static_folder, filename)
+    if path is None or not path.endswith(COMPRESSIBLE):
+        return None
+    try:
+        if os.path.getmtime(path + '.gz') >= os.path.getmtime(path):
+            return path + '.gz'
+    except OSError:
+        pass
+    return None
+
+
+def serve_precompressed(app):
+    """Remplace la vue `static` de l'application : sert `fichier.gz` avec
+    Content-Encoding: gzip quand le navigateur l'accepte. Un .gz absent ou plus
+    ancien que l'original (mise à jour en cours) est ignoré."""
+    static_view = app.view_functions['static']
+
+    def static(filename):
+        if request.accept_encodings['gzip'] and _fresh_gzip(app.static_folder, filename):
+            # Type de l'original (pas celui du .gz)
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(app.static_folder, filename + '.gz', mimetype=mimetype,
+                                           max_age=app.get_send_file_max_age(filename))
+            response.headers['Content-Encoding'] = 'gzip'
+            # Ajouté d'office par werkzeug avec le nom du .gz : inutile pour
+            # un fichier statique
+            response.headers.pop('Content-Disposition', None)
+        else:
+            response = static_view(filename=filename)
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+
+
+def _exit_on_signal(signum, frame):
+    # SIGTERM (systemctl stop) : même arrêt que Ctrl+C ; un second signal
+    # pendant l'arrêt termine le processus sans attendre
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    raise SystemExit(0)
+
+
+def serve(app):
+    """Sert l'application avec waitress jusqu'à SIGINT/SIGTERM, puis arrête
+    les workers d'arrière-plan."""
+    from waitress import create_server
+
+    host = os.getenv('SERVER_HOST', '0.0.0.0')
+    port = int(os.getenv('SERVER_PORT', 5000))
+    threads = int(os.getenv('SERVER_THREADS', 4))
+
+    serve_precompressed(app)
+    # Compression en arrière-plan : le serveur répond tout de suite (fichiers
+    # non compressés en attendant)
+    threading.Thread(target=precompress_static, args=(app.static_folder,),
+                     name='precompress-static', daemon=True).start()
+
+    server = create_server(app, host=host, port=port, threads=threads)
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    print(f"Serveur de production sur http://{host}:{port} ({threads} threads)")
+    try:
+        # waitress termine les requêtes en cours sur SIGINT/SystemExit
+        server.run()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()
+        background.shutdown()
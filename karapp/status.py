@@ -0,0 +1,211 @@
+"""
+État réseau courant (SSID WiFi, appareils Bluetooth connectés) gardé en
+mémoire et mis à jour sur événement.
+
+La page Paramètres lit ce cache au lieu de lancer iwgetid / wpa_cli / iw et un
+`bluetoothctl info` par appareil à chaque affichage. Sources d'événements :
+- WiFi : événements CTRL-EVENT-* de wpa_supplicant (socket de contrôle) et
+  changements d'état des liens réseau (netlink RTMGRP_LINK) ;
+- Bluetooth : un `bluetoothctl` laissé ouvert, qui affiche chaque changement
+  « [CHG] Device <mac> Connected: yes/no ».
+Si une source n'est pas disponible, un rafraîchissement périodique prend le
+relais (FALLBACK_INTERVAL).
+"""
+import re
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+from karapp.wifi import WIFI_INTERFACE, get_current_wifi, get_wpa_ctrl
+from karapp.bluetooth import get_connected_bluetooth_devices, get_bluetooth_device
+
+# Groupe netlink des changements d'état des interfaces
+RTMGRP_LINK = 1
+# nlmsghdr (16 octets) suivi de ifinfomsg : famille, type, index, flags, change
+_NLMSG_HEADER = struct.Struct('=IHHII')
+_IFINFOMSG = struct.Struct('=BxHiII')
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+
+# Événements wpa_supplicant qui changent le réseau associé
+WPA_STATUS_EVENTS = ('CTRL-EVENT-CONNECTED', 'CTRL-EVENT-DISCONNECTED',
+                     'CTRL-EVENT-SSID-TEMP-DISABLED', 'CTRL-EVENT-TERMINATING')
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]|\r')
+_BT_CONNECTED_RE = re.compile(r'\[CHG\]\s+Device\s+([0-9A-Fa-f:]{17})\s+Connected:\s+(yes|no)')
+
+
+class NetworkStatus:
+
+    # Rafraîchissement de secours quand aucun événement n'arrive (secondes)
+    FALLBACK_INTERVAL = 60
+    # Regroupement des rafales d'événements (un seul rafraîchissement)
+    SETTLE_DELAY = 0.3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = False
+        self._wifi_dirty = threading.Event()
+        self._wifi_ssid = None
+        self._wifi_ready = False
+        self._bt_devices = {}  # mac -> infos de l'appareil
+        self._bt_ready = False
+        self._wpa_ctrl = None
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for name, target in (('status-wifi', self._wifi_loop),
+                             ('status-netlink', self._netlink_loop),
+                             ('status-bluetooth', self._bluetooth_loop)):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    def snapshot(self):
+        """État connu, sans jamais bloquer. `*_ready` est faux tant que la
+        première lecture n'est pas terminée (juste après le démarrage)."""
+        with self._lock:
+            return {
+                'wifi': self._wifi_ssid,
+                'wifi_ready': self._wifi_ready,
+                'bluetooth': sorted(self._bt_devices.values(), key=lambda d: d.get('name') or d['mac']),
+                'bluetooth_ready': self._bt_ready,
+            }
+
+    def invalidate_wifi(self):
+        """Force une relecture du SSID (p. ex. après une action de l'utilisateur)."""
+        self._wifi_dirty.set()
+
+    def set_bluetooth_device(self, device):
+        """Met à jour un appareil d'après le résultat d'une action (connexion,
+        déconnexion…) sans attendre l'événement correspondant."""
+        with self._lock:
+            if device.get('connected'):
+                # Appareils partiels (p. ex. seulement la MAC) : la page et le
+                # tri ont besoin d'un nom
+                self._bt_devices[device['mac']] = {**device, 'name': device.get('name') or device['mac']}
+            else:
+                self._bt_devices.pop(device['mac'], None)
+
+    # --- WiFi ------------------------------------------------------------
+
+    def _wifi_loop(self):
+        self._wifi_dirty.set()
+        while True:
+            self._wifi_dirty.wait(self.FALLBACK_INTERVAL)
+            time.sleep(self.SETTLE_DELAY)
+            self._wifi_dirty.clear()
+            self._watch_wpa_events()
+            try:
+                ssid = get_current_wifi()
+            except Exception as e:
+                print(f"Erreur lors de la lecture du WiFi courant: {e}")
+                continue
+            with self._lock:
+                self._wifi_ssid = ssid
+                self._wifi_ready = True
+
+    def _watch_wpa_events(self):
+        # (Ré)abonnement si la connexion à wpa_supplicant a été (re)créée
+        ctrl = get_wpa_ctrl()
+        if ctrl is not None and ctrl is not self._wpa_ctrl:
+            ctrl.add_listener(self._on_wpa_event)
+            self._wpa_ctrl = ctrl
+
+    def _on_wpa_event(self, event):
+        if event.startswith(WPA_STATUS_EVENTS):
+            self._wifi_dirty.set()
+
+    def _netlink_loop(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK))
+        except (AttributeError, OSError) as e:
+            # Pas de netlink (hors Linux) : le rafraîchissement de secours suffit
+            print(f"Suivi netlink indisponible: {e}")
+            return
+        with sock:
+            while True:
+                try:
+                    data = sock.recv(65536)
+                except OSError:
+                    return
+                if self._concerns_wifi(data):
+                    self._wifi_dirty.set()
+
+    @staticmethod
+    def _concerns_wifi(data):
+        """Vrai si le message netlink concerne l'interface WiFi."""
+        try:
+            wifi_index = socket.if_nametoindex(WIFI_INTERFACE)
+        except OSError:
+            return True
+        offset = 0
+        while offset + _NLMSG_HEADER.size + _IFINFOMSG.size <= len(data):
+            length, msg_type = _NLMSG_HEADER.unpack_from(data, offset)[:2]
+            if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+                index = _IFINFOMSG.unpack_from(data, offset + _NLMSG_HEADER.size)[2]
+                if index == wifi_index:
+                    return True
+            if length <= 0:
+                break
+            # Messages alignés sur 4 octets
+            offset += (length + 3) & ~3
+        return False
+
+    # --- Bluetooth -------------------------------------------------------
+
+    def _bluetooth_loop(self):
+        while True:
+            self._refresh_bluetooth()
+            started = time.monotonic()
+            try:
+                self._monitor_bluetooth()
+            except FileNotFoundError:
+                # bluetoothctl absent : rafraîchissement périodique uniquement
+                pass
+            except Exception as e:
+                print(f"Suivi Bluetooth interrompu: {e}")
+            # Ne pas relancer en boucle un suivi qui s'arrête aussitôt
+            if time.monotonic() - started < self.FALLBACK_INTERVAL:
+                time.sleep(self.FALLBACK_INTERVAL)
+
+    def _refresh_bluetooth(self):
+        try:
+            devices = get_connected_bluetooth_devices()
+        except Exception as e:
+            print(f"Erreur lors de la lecture des appareils Bluetooth: {e}")
+            return
+        with self._lock:
+            self._bt_devices = {d['mac']: d for d in devices}
+            self._bt_ready = True
+
+    def _monitor_bluetooth(self):
+        """Suit les connexions/déconnexions affichées par un bluetoothctl
+        interactif ; rend la main si le processus se termine."""
+        process = subprocess.Popen(
+            ['bluetoothctl'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1,
+        )
+        try:
+            for line in process.stdout:
+                match = _BT_CONNECTED_RE.search(_ANSI_RE.sub('', line))
+                if not match:
+                    continue
+                mac, connected = match.group(1).upper(), match.group(2) == 'yes'
+                if connected:
+                    device = get_bluetooth_device(mac) or {'mac': mac, 'name': mac, 'connected': True}
+                    device['connected'] = True
+                    self.set_bluetooth_device(device)
+                else:
+                    self.set_bluetooth_device({'mac': mac, 'connected': False})
+        finally:
+            process.kill()
+            process.wait()
+
+
+network_status = NetworkStatus()
@@ -0,0 +1,103 @@
+"""Cache mémoire à durée de vie limitée (TTL) et taille bornée (LRU).
+
+Partagé entre les threads du serveur : toutes les opérations sont protégées
+par un verrou. `get_or_compute` regroupe en plus les calculs identiques
+lancés en même temps (un seul appel réel, les autres attendent son résultat).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Inflight:
+    """Calcul en cours pour une clé, attendu par les requêtes concurrentes."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # clé -> (expiration, valeur)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get(key, default)
+
+    def _get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        # Élément le plus récemment utilisé en fin de liste
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def _set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def items(self):
+        """Copie des couples (clé, valeur) encore valides."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (expires, v) in self._data.items() if expires >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_compute(self, key, compute):
+        """Retourne la valeur en cache, ou la calcule avec `compute()`.
+
+        Si le même calcul est déjà en cours dans un autre thread, on attend son
+        résultat au lieu de le relancer. Une exception levée par `compute` est
+        transmise à tous les appelants et rien n'est mis en cache.
+        """
+        with self._lock:
+            value = self._get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[key] = _Inflight()
+
+        if not owner:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            inflight.value = compute()
+        except Exception as e:
+            inflight.error = e
+            raise
+        else:
+            with self._lock:
+                self._set(key, inflight.value)
+            return inflight.value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
+
+
+_MISSING = object()
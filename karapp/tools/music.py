@@ -1,7 +1,33 @@
-from mutagen import File
 import base64
 
+# Colonnes techniques du FileModel remplies telles quelles depuis get_metadata
+AUDIO_FIELDS = ('duration', 'bitrate', 'codec', 'track_number', 'disc_number')
+
+
+def audio_fields(metadata):
+    """Champs techniques de `get_metadata` (vide si le fichier est illisible)."""
+    if not metadata:
+        return {}
+    return {key: metadata.get(key) for key in AUDIO_FIELDS}
+
+
+def _number(value):
+    """Numéro de piste ou de disque : « 3/12 », (3, 12) ou 3 → 3."""
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if isinstance(value, tuple):
+        value = value[0]
+    try:
+        return int(str(value).split('/')[0]) or None
+    except (TypeError, ValueError):
+        return None
+
+
 def get_metadata(filepath):
+    # Import à l'usage : mutagen n'est utile qu'à l'actualisation de la
+    # bibliothèque, inutile de ralentir le démarrage de l'application
+    from mutagen import File
+
     try:
         audio_file = File(filepath)
         if audio_file is None:
@@ -11,7 +37,15 @@ def get_metadata(filepath):
             'title': None,
             'artist': None,
             'album': None,
-            'artwork': None
+            'artwork': None,
+            # Infos techniques, lues dans l'en-tête du fichier
+            'duration': getattr(audio_file.info, 'length', None),
+            'bitrate': getattr(audio_file.info, 'bitrate', None) or None,
+            # Codec précis quand mutagen le donne (MP4 : mp4a.40.2, alac…),
+            # sinon le format (mp3, flac, oggvorbis…)
+            'codec': getattr(audio_file.info, 'codec', None) or type(audio_file).__name__.lower(),
+            'track_number': None,
+            'disc_number': None
         }
 
         # Extraction des métadonnées selon le format
@@ -40,6 +74,16 @@ def get_metadata(filepath):
                 artwork = tags['covr'][0]
                 metadata['artwork'] = base64.b64encode(artwork).decode('utf-8')
 
+            # Numéros de piste et de disque : ID3, MP4, puis Vorbis (FLAC, Ogg)
+            for key in ('TRCK', 'trkn', 'tracknumber'):
+                if key in tags:
+                    metadata['track_number'] = _number(tags[key] if key != 'TRCK' else tags[key].text)
+                    break
+            for key in ('TPOS', 'disk', 'discnumber'):
+                if key in tags:
+                    metadata['disc_number'] = _number(tags[key] if key != 'TPOS' else tags[key].text)
+                    break
+
         return metadata
 
     except Exception as e:
@@ -1,10 +1,13 @@
-from PIL import Image
 import base64
 import io
-import requests
 
 
 def make_artwork_base64(path, size=300, quality=60):
+    # Imports à l'usage : Pillow et requests sont lents à charger et inutiles
+    # au démarrage de l'application
+    from PIL import Image
+    import requests
+
     # Charge l’image
     if 'http' in path:
         response = requests.get(path)
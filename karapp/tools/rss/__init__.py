@@ -1,43 +1,108 @@
 import pkgutil
 import importlib
 import inspect
-import feedparser
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 from karapp.tools.rss.base import RssSearchTool
 
 # Charger dynamiquement tous les modules du package rss
-__all__ = ['get_tool_by_name', 'list_tools']
+__all__ = ['get_tool_by_name', 'list_tools', 'search_all', 'ALL_TOOLS']
 
-def get_tool_by_name(name: str):
-    """
-    Retourne la classe dont self.name == name
-    """
-    # Parcourir tous les sous-modules du package
+# Nom « virtuel » proposé dans l'interface pour interroger tous les outils.
+ALL_TOOLS = 'Toutes les sources'
+
+
+def _iter_tool_classes():
+    """Parcourt tous les sous-modules du package et renvoie les classes qui
+    héritent de RssSearchTool."""
     for loader, module_name, is_pkg in pkgutil.iter_modules(__path__):
         module = importlib.import_module(f"{__name__}.{module_name}")
-
-        # Chercher les classes qui héritent de RssSearchTool
         for _, obj in inspect.getmembers(module, inspect.isclass):
             if issubclass(obj, RssSearchTool) and obj is not RssSearchTool:
-                instance = obj()
-                if instance.name == name:
-                    return obj
+                yield obj
+
+
+def get_tool_by_name(name: str):
+    """
+    Retourne la classe dont self.name == name
+    """
+    for obj in _iter_tool_classes():
+        instance = obj()
+        if instance.name == name:
+            return obj
 
     raise ValueError(f"Aucune classe trouvée avec name='{name}'")
 
 
 def list_tools():
-    tools = []
-    for loader, module_name, is_pkg in pkgutil.iter_modules(__path__):
-        module = importlib.import_module(f"{__name__}.{module_name}")
-        for _, obj in inspect.getmembers(module, inspect.isclass):
-            if issubclass(obj, RssSearchTool) and obj is not RssSearchTool:
-                instance = obj()
-                tools.append(instance.name)
-    return tools
+    return [obj().name for obj in _iter_tool_classes()]
+
+
+def search_all(keyword, timeout=None):
+    """
+    Interroge tous les outils de recherche en parallèle.
+
+    Chaque outil dispose de son propre délai (`timeout` de la classe, ou celui
+    passé en paramètre) compté depuis le lancement de la recherche : les
+    résultats arrivés à temps sont renvoyés, les outils en retard ou en erreur
+    sont simplement ignorés. Les doublons (même flux RSS) sont fusionnés.
+    """
+    tools = list(_iter_tool_classes())
+    if not tools:
+        return []
+
+    # Pas de `with` : sa sortie attendrait la fin des outils trop lents, ce
+    # qu'on veut justement éviter. Les threads restants finissent seuls.
+    executor = ThreadPoolExecutor(max_workers=len(tools))
+    start = time.monotonic()
+    futures = [(tool, executor.submit(tool.search, keyword)) for tool in tools]
+
+    resultats = []
+    seen = set()
+    try:
+        for tool, future in futures:
+            limit = tool.timeout if timeout is None else timeout
+            remaining = max(0, start + limit - time.monotonic())
+            source = tool().name
+            try:
+                items = future.result(timeout=remaining) or []
+            except FutureTimeout:
+                print(f"Recherche {source} : délai de {limit} s dépassé")
+                continue
+            except Exception as e:
+                print(f"Recherche {source} en erreur : {e}")
+                continue
+
+            for item in items:
+                # Sans flux encore résolu, la page Apple Podcasts fait office de clé
+                key = _feed_key(item.get('flux_rss')) or item.get('apple_url')
+                if key:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                resultats.append(dict(item, source=source))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return resultats
+
+
+def _feed_key(url):
+    """Forme normalisée d'une URL de flux, pour repérer les doublons entre
+    outils (schéma, casse et « / » final ignorés)."""
+    if not url:
+        return None
+    key = url.strip().lower()
+    for prefix in ('https://', 'http://'):
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+            break
+    return key.rstrip('/') or None
 
 
 def get_infos(url):
+    import feedparser  # lent à charger : seulement quand on lit un flux
     feed = feedparser.parse(url)
     return {
         'titre': feed.feed.get('title', 'Sans titre'),
@@ -46,8 +111,9 @@ def get_infos(url):
     }
 
 def get_episodes_list(url):
+    import feedparser
     feed = feedparser.parse(url)
     return [
         {'titre': e.title, 'audio': e.enclosures[0].href if e.enclosures else None,
          'image': e.image.href if e.image else None, 'description': e.summary if e.summary else ''}
-        for e in feed.entries]
\ No newline at end of file
+        for e in feed.entries]
@@ -2,10 +2,15 @@ from abc import ABC, abstractmethod
 
 class RssSearchTool(ABC):
 
+    # Délai maximal (en secondes) accordé à l'outil, requête HTTP comprise.
+    # Sert aussi de limite dans la recherche « toutes sources » : un outil plus
+    # lent est ignoré, sans retarder les autres.
+    timeout = 10
+
     def __init__(self):
         self.name = ''
 
     @classmethod
     @abstractmethod
     def search(self, keyword):
-        pass
\ No newline at end of file
+        pass
@@ -1,9 +1,13 @@
 import requests
 import json
-from bs4 import BeautifulSoup
+import re
 
 from karapp.tools.rss.base import RssSearchTool
 
+# Apple Podcasts embarque l'URL du flux dans le JSON de la page : on la repère
+# directement dans le HTML brut, sans analyser tout le document.
+FEED_URL_RE = re.compile(rb'"feedUrl"\s*:\s*("(?:[^"\\]|\\.)*")')
+
 
 class MpdSearchTool(RssSearchTool):
 
@@ -18,7 +22,7 @@ class MpdSearchTool(RssSearchTool):
             "Accept": "application/json",
             "User-Agent": "Mozilla/5.0"
         }
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=cls.timeout)
         response.raise_for_status()
         data = json.loads(response.text)
         resultats = []
@@ -29,15 +33,19 @@ class MpdSearchTool(RssSearchTool):
             desc = item.get("description")
             image = item.get("logo")
             flux_rss = item.get("rssSource", None)
+            # Sans flux connu, on garde la page Apple Podcasts : le flux n'est
+            # résolu qu'au moment où l'utilisateur choisit ce podcast (une page
+            # Apple à charger par résultat rendait la recherche très lente).
+            apple_url = None
             if not flux_rss and 'apple' in item:
-                # flux_rss = get_rss_from_apple_podcast(item['apple']['appleUrl'])
-                flux_rss = cls.get_rss_from_apple_podcast(item['apple']['appleUrl'])
+                apple_url = (item['apple'] or {}).get('appleUrl')
             resultats.append({
                 "titre": titre,
                 "url_page": url_page,
                 "description": desc,
                 "image": image,
                 "flux_rss": flux_rss,
+                "apple_url": apple_url,
             })
         return resultats
 
@@ -45,32 +53,20 @@ class MpdSearchTool(RssSearchTool):
     def get_rss_from_apple_podcast(url: str) -> str:
         """
         Extrait l'URL du flux RSS d'un podcast Apple Podcasts.
+
+        La page est lue en flux et abandonnée dès que la clé `feedUrl` est
+        trouvée, sans parser le HTML.
         """
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # Apple Podcasts met le flux RSS dans une balise <script> JSON-LD
-        for script in soup.find_all("script", type="application/json"):
-            data = json.loads(script.string)
-            url_candidates = find_keys(data, 'feedUrl')
-            if len(url_candidates):
-                return url_candidates[0]
+        with requests.get(url, headers=headers, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            buffer = b''
+            for chunk in response.iter_content(chunk_size=16384):
+                buffer += chunk
+                match = FEED_URL_RE.search(buffer)
+                if match:
+                    return json.loads(match.group(1))
+                # Garder la fin du bloc : la clé peut être à cheval sur deux morceaux
+                buffer = buffer[-2048:]
 
         raise ValueError("Impossible de trouver le flux RSS sur cette page.")
-
-
-def find_keys(obj, key):
-    """Cherche récursivement toutes les valeurs associées à une clé donnée."""
-    results = []
-    if isinstance(obj, dict):
-        for k, v in obj.items():
-            if k == key:
-                results.append(v)
-            else:
-                results.extend(find_keys(v, key))
-    elif isinstance(obj, list):
-        for item in obj:
-            results.extend(find_keys(item, key))
-    return results
\ No newline at end of file
@@ -17,7 +17,7 @@ class RadioFranceSearchTool(RssSearchTool):
         params = {"query": keyword}
         url = rss_provider + 'search/' + "?" + urlencode(params)
 
-        response = requests.get(url, timeout=10)
+        response = requests.get(url, timeout=cls.timeout)
         response.raise_for_status()
 
         data = json.loads(response.text)
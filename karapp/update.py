@@ -1,35 +1,68 @@
 """
 Mise à jour de l'application depuis GitHub, sans passer par SSH.
 
-Deux routes :
-- GET  /update/check  : vérifie (git fetch) si des commits sont disponibles.
-- POST /update/apply  : applique la mise à jour (git pull) et réinstalle les
-                        dépendances si besoin.
+Routes :
+- GET  /update/check    : dernier état connu (les vérifications `git fetch`
+                          sont faites en arrière-plan, toutes les
+                          CHECK_INTERVAL secondes) ; POST pour demander une
+                          vérification immédiate, sans l'attendre.
+- POST /update/apply    : lance l'application de la mise à jour en
+                          arrière-plan.
+- POST /update/rollback : revient à la version d'avant la dernière mise à jour
+                          (dépendances réinstallées si besoin).
+- GET  /update/progress : étape en cours, pour l'affichage.
 
-Aucun redémarrage forcé : en mode debug le reloader de Werkzeug recharge
-automatiquement le code Python modifié par le git pull.
+La nouvelle version est préparée à côté, dans un worktree git (STAGING_DIR) :
+dépendances installées et code précompilé pendant que l'application continue
+de tourner. Le dossier servi n'est modifié qu'à la fin (fast-forward), puis le
+serveur redémarre une seule fois. Les .pyc sont générés en mode
+« checked-hash » (validés par le contenu du source et non par sa date) : ils
+restent valides une fois copiés dans le dossier servi, le premier démarrage
+n'a rien à recompiler.
 """
 import os
+import shutil
 import subprocess
+import sys
+import threading
+import time
 from pathlib import Path
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
+
+from karapp.background import PeriodicWorker, shutdown
 
 update_bp = Blueprint("update", __name__)
 
 # Racine du dépôt git = dossier contenant app.py (un niveau au-dessus de karapp/)
 PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
 
+# Intervalle entre deux vérifications automatiques (secondes)
+CHECK_INTERVAL = 6 * 3600
+
+# Worktree de préparation des mises à jour : sous .git/, que le reloader ignore
+STAGING_DIR = os.path.join(PROJECT_ROOT, '.git', 'karadoc-update')
+# Référence git de la version précédente, pour revenir en arrière
+PREVIOUS_REF = 'refs/karadoc/previous'
+# Sources précompilées avant la bascule
+COMPILE_TARGETS = ['app.py', 'karapp']
+# Délai avant redémarrage, le temps que la page voie la dernière étape
+RESTART_DELAY = 1.5
+
+
+class UpdateError(Exception):
+    """Échec d'une étape de la mise à jour (message affichable)."""
 
-def _run_git(args, timeout=30):
-    """Exécute une commande git dans le dossier du projet.
+
+def _run_git(args, timeout=30, cwd=PROJECT_ROOT):
+    """Exécute une commande git dans le dossier du projet (ou `cwd`).
 
     Retourne un tuple (returncode, stdout, stderr).
     """
     try:
         result = subprocess.run(
             ['git'] + args,
-            cwd=PROJECT_ROOT,
+            cwd=cwd,
             capture_output=True,
             text=True,
             timeout=timeout,
@@ -68,62 +101,271 @@ def get_update_status():
         _, log_out, _ = _run_git(['log', '--pretty=format:%s', 'HEAD..@{u}'])
         commits = [line for line in log_out.split('\n') if line][:10]
 
+    # Version d'avant la dernière mise à jour (retour arrière possible)
+    code, previous, _ = _run_git(['rev-parse', '--short', '--verify', '--quiet', PREVIOUS_REF])
+
     return {
         "success": True,
         "update_available": behind > 0,
         "behind": behind,
         "current": current,
         "commits": commits,
+        "previous": previous if code == 0 else None,
     }
 
 
-@update_bp.route('/update/check')
-def update_check():
-    return jsonify(get_update_status())
+class UpdateChecker:
+    """Dernier résultat de `get_update_status`, tenu à jour en arrière-plan.
+
+    La page Paramètres lit ce résultat au lieu d'attendre un `git fetch`
+    (jusqu'à 30 s hors ligne) à chaque affichage.
+    """
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = None
+        self._checked_at = None
+        self._checking = False
+        self.worker = PeriodicWorker("update-check", self.check, CHECK_INTERVAL)
 
-@update_bp.route('/update/apply', methods=['POST'])
-def update_apply():
-    req_path = os.path.join(PROJECT_ROOT, 'requirements.txt')
+    def start(self, app):
+        with self._lock:
+            if self._status is None:
+                self._checking = True
+        self.worker.start(app)
+
+    def request_check(self):
+        """Vérification immédiate, en arrière-plan."""
+        with self._lock:
+            self._checking = True
+        self.worker.trigger()
 
-    def _read_req():
+    def check(self):
+        with self._lock:
+            self._checking = True
         try:
-            with open(req_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except OSError:
-            return None
+            status = get_update_status()
+        except Exception as e:
+            status = {"success": False, "error": str(e)}
+        with self._lock:
+            self._status = status
+            self._checked_at = int(time.time())
+            self._checking = False
+
+    def snapshot(self):
+        """État connu : résultat de la dernière vérification, plus `checked_at`
+        (epoch, None avant la première) et `checking` (vérification en cours)."""
+        with self._lock:
+            status = dict(self._status or {"success": False, "error": None})
+            status["checked_at"] = self._checked_at
+            status["checking"] = self._checking
+            return status
+
+
+update_checker = UpdateChecker()
+
+
+@update_bp.route('/update/check', methods=['GET', 'POST'])
+def update_check():
+    """Dernier état connu ; en POST, lance d'abord une nouvelle vérification
+    (le client interroge ensuite la route jusqu'à ce que `checking` soit faux)."""
+    if request.method == 'POST':
+        update_checker.request_check()
+    return jsonify(update_checker.snapshot())
 
-    req_before = _read_req()
 
-    # Mise à jour du code : fast-forward uniquement, pour ne jamais créer de
-    # commit de merge ni laisser un conflit sur l'appareil.
-    code, out, err = _run_git(['pull', '--ff-only'], timeout=120)
+def _git(args, timeout=30, cwd=PROJECT_ROOT):
+    """Comme `_run_git`, mais lève UpdateError en cas d'échec."""
+    code, out, err = _run_git(args, timeout=timeout, cwd=cwd)
     if code != 0:
-        return jsonify({"success": False, "error": err or out or "Échec du git pull"}), 500
+        raise UpdateError(err or out or f"Échec de git {args[0]}")
+    return out
+
+
+def _run_python(args, timeout, cwd):
+    """Lance l'interpréteur courant (pip, compileall) ; lève UpdateError."""
+    try:
+        result = subprocess.run([sys.executable] + args, cwd=cwd,
+                                capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise UpdateError(f"Délai dépassé ({' '.join(args[:2])})")
+    if result.returncode != 0:
+        raise UpdateError(result.stderr.strip() or result.stdout.strip() or "erreur inconnue")
+
+
+def _remove_staging():
+    if os.path.exists(STAGING_DIR):
+        _run_git(['worktree', 'remove', '--force', STAGING_DIR])
+    if os.path.exists(STAGING_DIR):
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)
+    _run_git(['worktree', 'prune'])
+
+
+def _copy_bytecode(source_root, target_root):
+    """Copie les .pyc précompilés de la version préparée vers le dossier servi."""
+    for dirpath, dirnames, filenames in os.walk(source_root):
+        dirnames[:] = [d for d in dirnames if d != '.git']
+        if os.path.basename(dirpath) != '__pycache__':
+            continue
+        target_dir = os.path.join(target_root, os.path.relpath(dirpath, source_root))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in filenames:
+            if name.endswith('.pyc'):
+                shutil.copy2(os.path.join(dirpath, name), os.path.join(target_dir, name))
+
+
+def restart_application():
+    """Redémarre le serveur (une seule fois, nouveau processus)."""
+    # Laisser les workers finir leurs tâches en cours (pochettes en file…)
+    shutdown()
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Sous le reloader de Werkzeug : le code de sortie 3 demande au
+        # processus parent de relancer le serveur
+        os._exit(3)
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+class UpdateApplier:
+    """Application (ou retour arrière) d'une mise à jour en arrière-plan.
+
+    `status()` donne l'étape en cours pour la page : `state` vaut 'running'
+    pendant les étapes, puis 'restarting', 'done' (rien à faire) ou 'error'.
+    Après le redémarrage, le nouveau processus repart de 'idle'.
+    """
 
-    # Réinstaller les dépendances uniquement si requirements.txt a changé
-    deps_updated = False
-    if _read_req() != req_before:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = 'idle'
+        self._step = None
+        self._error = None
+
+    def status(self):
+        with self._lock:
+            return {'state': self._state, 'step': self._step, 'error': self._error}
+
+    def apply(self):
+        """Lance la mise à jour ; False si une opération est déjà en cours."""
+        return self._start(self._apply)
+
+    def rollback(self):
+        """Lance le retour à la version précédente ; False si occupé."""
+        return self._start(self._rollback)
+
+    def _start(self, target):
+        with self._lock:
+            if self._state in ('running', 'restarting'):
+                return False
+            self._state, self._step, self._error = 'running', None, None
+            self._thread = threading.Thread(target=self._run, args=(target,), name='update-apply', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, target):
         try:
-            pip = subprocess.run(
-                [sys.executable, '-m', 'pip', 'install', '-r', req_path],
-                cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=300,
-            )
-            if pip.returncode != 0:
-                return jsonify({
-                    "success": False,
-                    "error": "Code mis à jour, mais échec de l'installation des dépendances : "
-                             + (pip.stderr.strip() or "erreur inconnue"),
-                }), 500
-            deps_updated = True
-        except subprocess.TimeoutExpired:
-            return jsonify({
-                "success": False,
-                "error": "Délai dépassé lors de l'installation des dépendances",
-            }), 500
-
-    return jsonify({
-        "success": True,
-        "deps_updated": deps_updated,
-        "message": "Mise à jour appliquée.",
-    })
\ No newline at end of file
+            target()
+        except UpdateError as e:
+            self._set('error', self._step, str(e))
+        except Exception as e:
+            self._set('error', self._step, f"Erreur: {e}")
+
+    def _set(self, state, step, error=None):
+        with self._lock:
+            self._state, self._step, self._error = state, step, error
+
+    def _progress(self, step):
+        self._set('running', step)
+
+    def _restart(self, step):
+        self._set('restarting', step)
+        threading.Timer(RESTART_DELAY, restart_application).start()
+
+    def _install_requirements(self, current, target):
+        """Installe les dépendances de `target`, préparée dans STAGING_DIR,
+        uniquement si requirements.txt diffère de celui de `current`."""
+        code, _, _ = _run_git(['diff', '--quiet', current, target, '--', 'requirements.txt'])
+        if code == 1:
+            self._progress("Installation des dépendances...")
+            _run_python(['-m', 'pip', 'install', '-r', os.path.join(STAGING_DIR, 'requirements.txt')],
+                        timeout=900, cwd=STAGING_DIR)
+
+    def _apply(self):
+        self._progress("Récupération des nouveautés...")
+        _git(['fetch', '--quiet'], timeout=120)
+        target = _git(['rev-parse', '@{u}'])
+        current = _git(['rev-parse', 'HEAD'])
+        if target == current:
+            self._set('done', "Déjà à jour")
+            return
+        # Fast-forward uniquement : jamais de commit de merge ni de conflit
+        # sur l'appareil
+        code, _, _ = _run_git(['merge-base', '--is-ancestor', 'HEAD', target])
+        if code != 0:
+            raise UpdateError("Modifications locales : mise à jour impossible sans fusion")
+
+        self._progress("Préparation de la nouvelle version...")
+        _remove_staging()
+        _git(['worktree', 'add', '--detach', STAGING_DIR, target], timeout=120)
+        try:
+            self._install_requirements(current, target)
+
+            self._progress("Précompilation...")
+            _run_python(['-m', 'compileall', '-q', '--invalidation-mode', 'checked-hash'] + COMPILE_TARGETS,
+                        timeout=300, cwd=STAGING_DIR)
+
+            self._progress("Installation de la nouvelle version...")
+            _copy_bytecode(STAGING_DIR, PROJECT_ROOT)
+            _git(['update-ref', PREVIOUS_REF, current])
+            _git(['merge', '--ff-only', '--quiet', target], timeout=120)
+        finally:
+            _remove_staging()
+
+        self._restart("Redémarrage...")
+
+    def _rollback(self):
+        code, previous, _ = _run_git(['rev-parse', '--verify', '--quiet', PREVIOUS_REF])
+        if code != 0:
+            raise UpdateError("Aucune version précédente")
+        current = _git(['rev-parse', 'HEAD'])
+
+        # Les dépendances de la version précédente, préparées comme pour une
+        # mise à jour, avant de toucher au dossier servi
+        self._progress("Préparation de la version précédente...")
+        _remove_staging()
+        _git(['worktree', 'add', '--detach', STAGING_DIR, previous], timeout=120)
+        try:
+            self._install_requirements(current, previous)
+        finally:
+            _remove_staging()
+
+        self._progress("Retour à la version précédente...")
+        # --keep : refuse plutôt que d'écraser une modification locale
+        _git(['reset', '--keep', previous], timeout=60)
+        # La version quittée devient la « précédente » (retour arrière annulable)
+        _git(['update-ref', PREVIOUS_REF, current])
+
+        self._restart("Redémarrage...")
+
+
+update_applier = UpdateApplier()
+
+
+@update_bp.route('/update/apply', methods=['POST'])
+def update_apply():
+    """Lance la mise à jour ; la page suit ensuite /update/progress."""
+    if not update_applier.apply():
+        return jsonify({"success": False, "error": "Mise à jour déjà en cours"}), 409
+    return jsonify({"success": True})
+
+
+@update_bp.route('/update/rollback', methods=['POST'])
+def update_rollback():
+    """Revient à la version d'avant la dernière mise à jour."""
+    if not update_applier.rollback():
+        return jsonify({"success": False, "error": "Mise à jour déjà en cours"}), 409
+    return jsonify({"success": True})
+
+
+@update_bp.route('/update/progress')
+def update_progress():
+    return jsonify(update_applier.status())
@@ -1,18 +1,54 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify
+import glob
+import os
 import subprocess
 import re
+import threading
 import time
 
+from karapp.wpa_ctrl import WpaCtrl, WpaCtrlError, SCAN_RESULTS_EVENT
+
 connection_bp = Blueprint("wifi", __name__)
 
 WIFI_INTERFACE = "wlan0"
 
+# Flag « interface activée » de /sys/class/net/<if>/flags
+IFF_UP = 0x1
+
+# Après un échec d'ouverture de la socket de contrôle, délai avant de
+# réessayer (entre-temps on passe par wpa_cli).
+WPA_RETRY_DELAY = 30
+
 @connection_bp.route("/wifi_settings")
 def wifi_settings():
-    networks = scan_wifi_networks()
+    # Rendu immédiat depuis le cache du scanner ; la page se met ensuite à
+    # jour seule via /wifi/networks.
+    scan = wifi_scanner.snapshot()
     current_wifi = get_current_wifi()
     wifi_enabled = is_wifi_enabled()
-    return render_template('wifi.html', networks=networks, current_wifi=current_wifi, wifi_enabled=wifi_enabled)
+    # Message de fin d'une activation / désactivation, affiché une fois
+    success = error = None
+    result = wifi_power.take_result()
+    if result is not None:
+        state, message = result
+        if state == 'error':
+            error = message
+        else:
+            success = message
+    return render_template('wifi.html', networks=scan['networks'], updated_at=scan['updated_at'],
+                           current_wifi=current_wifi, wifi_enabled=wifi_enabled, power=wifi_power.status(),
+                           success=success, error=error)
+
+@connection_bp.route("/wifi/networks")
+def wifi_networks():
+    """Liste des réseaux en cache (JSON) : fragment HTML prêt à insérer et
+    horodatage du scan, pour la mise à jour en direct de la page."""
+    scan = wifi_scanner.snapshot()
+    return jsonify({
+        'updated_at': scan['updated_at'],
+        'html': render_template('_wifi_networks.html', networks=scan['networks'],
+                                updated_at=scan['updated_at']),
+    })
 
 @connection_bp.route('/wifi/connect', methods=['POST'])
 def wifi_connect():
@@ -27,137 +63,264 @@ def wifi_connect():
     if success:
         return redirect(url_for('wifi.wifi_settings'))
     else:
-        networks = scan_wifi_networks()
+        scan = wifi_scanner.snapshot()
         current_wifi = get_current_wifi()
         wifi_enabled = is_wifi_enabled()
-        return render_template('wifi.html', networks=networks, current_wifi=current_wifi, wifi_enabled=wifi_enabled, error=message)
+        return render_template('wifi.html', networks=scan['networks'], updated_at=scan['updated_at'],
+                               current_wifi=current_wifi, wifi_enabled=wifi_enabled, power=wifi_power.status(),
+                               error=message)
 
 @connection_bp.route('/wifi/toggle', methods=['POST'])
 def wifi_toggle():
-    """Active ou désactive le WiFi"""
+    """Active ou désactive le WiFi (en arrière-plan, voir WifiPower)"""
     action = request.form.get('action')  # 'enable' ou 'disable'
 
     if action == 'enable':
-        success, message = enable_wifi()
-        # Attendre un peu plus après activation avant de scanner
-        if success:
-            time.sleep(2)
+        started = wifi_power.enable()
     elif action == 'disable':
-        success, message = disable_wifi()
+        started = wifi_power.disable()
     else:
         return redirect(url_for('wifi.wifi_settings'))
 
-    networks = scan_wifi_networks() if success and action == 'enable' else []
-    current_wifi = get_current_wifi()
-    wifi_enabled = is_wifi_enabled()
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        if not started:
+            return jsonify({'success': False, 'error': "Opération déjà en cours"}), 409
+        return jsonify({'success': True, **wifi_power.status()})
+    # La page suit ensuite la transition via /wifi/power
+    return redirect(url_for('wifi.wifi_settings'))
+
+@connection_bp.route('/wifi/power')
+def wifi_power_status():
+    """État de l'activation / désactivation en cours (JSON)."""
+    return jsonify(wifi_power.status())
+
+_wpa = None
+_wpa_lock = threading.Lock()
+_wpa_retry_at = 0
+
+def get_wpa_ctrl():
+    """Connexion partagée à la socket de contrôle de wpa_supplicant (attachée
+    aux événements), ou None si elle est inaccessible : wpa_supplicant absent,
+    ou utilisateur hors du groupe `netdev`."""
+    global _wpa, _wpa_retry_at
+    with _wpa_lock:
+        if _wpa is not None:
+            if _wpa.is_open:
+                return _wpa
+            _wpa.close()
+            _wpa = None
+        if time.monotonic() < _wpa_retry_at:
+            return None
+        ctrl = WpaCtrl(WIFI_INTERFACE)
+        try:
+            ctrl.open()
+            ctrl.attach()
+        except (OSError, WpaCtrlError):
+            ctrl.close()
+            _wpa_retry_at = time.monotonic() + WPA_RETRY_DELAY
+            return None
+        _wpa = ctrl
+        return _wpa
+
+def wpa_request(*args, timeout=5):
+    """Exécute une commande wpa_cli, p. ex. wpa_request('set_network', '0',
+    'ssid', '"Maison"'), par la socket de contrôle ou à défaut par
+    `sudo wpa_cli`. Retourne la réponse brute ; lève WpaCtrlError en cas
+    d'échec (réponse FAIL, délai dépassé, wpa_cli absent)."""
+    ctrl = get_wpa_ctrl()
+    if ctrl is not None:
+        return ctrl.request(' '.join([args[0].upper()] + list(args[1:])), timeout=timeout)
 
-    if success:
-        return render_template('wifi.html', networks=networks, current_wifi=current_wifi, wifi_enabled=wifi_enabled, success=message)
-    else:
-        return render_template('wifi.html', networks=networks, current_wifi=current_wifi, wifi_enabled=wifi_enabled, error=message)
+    try:
+        result = subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE] + list(args),
+                                capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise WpaCtrlError("Délai d'attente dépassé")
+    except FileNotFoundError:
+        raise WpaCtrlError("wpa_cli non disponible")
+    if result.returncode != 0 or result.stdout.startswith('FAIL'):
+        raise WpaCtrlError(result.stderr.strip() or result.stdout.strip() or 'configuration invalide')
+    return result.stdout
 
-def scan_wifi_networks():
-    """Scanne les réseaux WiFi disponibles via wpa_cli.
+def trigger_scan():
+    """Demande un nouveau scan à wpa_supplicant, sans attendre sa fin.
 
     On NE se sert PLUS de `iwlist scan` : cet outil entre en conflit avec le
     wpa_supplicant déjà lancé pour wlan0 (via /etc/network/interfaces) et
-    renvoie une liste vide. On demande donc le scan à wpa_supplicant lui-même
-    (`wpa_cli scan`) puis on lit ses résultats (`wpa_cli scan_results`).
+    renvoie une liste vide. Les résultats arrivent par l'événement de fin de
+    scan, que `wifi_scanner` attend.
     """
     try:
-        # Déclencher un nouveau scan (peut répondre FAIL-BUSY si un scan est
-        # déjà en cours : ce n'est pas bloquant, on lira les résultats quand même).
-        subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'scan'],
-                       capture_output=True, text=True, timeout=10)
-
-        # Laisser le temps au scan de se terminer avant de lire les résultats.
-        time.sleep(2)
+        # Peut répondre FAIL-BUSY si un scan est déjà en cours : ce n'est pas
+        # bloquant, on lira les résultats quand même.
+        wpa_request('scan', timeout=10)
+    except WpaCtrlError:
+        pass
 
-        result = subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'scan_results'],
-                                capture_output=True, text=True, timeout=10)
+def read_scan_results():
+    """Lit les résultats du dernier scan de wpa_supplicant (`scan_results`)."""
+    try:
+        return parse_scan_results(wpa_request('scan_results', timeout=10))
+    except WpaCtrlError:
+        return []
+    except Exception:
+        return []
 
-        if result.returncode != 0:
-            return []
+def parse_scan_results(output):
+    """Transforme la sortie de `scan_results` en liste de réseaux, du meilleur
+    signal au plus faible, un seul par SSID."""
+    # SSID déjà enregistrés dans wpa_supplicant → connexion directe possible
+    # (sans redemander le mot de passe).
+    saved_ssids = {ssid for _, ssid in list_saved_networks()}
+
+    networks = {}
+
+    # Format des lignes (séparées par des tabulations) :
+    # bssid / frequency / signal level / flags / ssid
+    # 10:d7:b0:20:1b:b2   2462   -80   [WPA2-PSK-CCMP][WPS][ESS]   Livebox-1BB2
+    for line in output.split('\n'):
+        line = line.rstrip('\n')
+        # Sauter l'en-tête et les lignes vides
+        if not line or line.startswith('bssid'):
+            continue
+
+        parts = line.split('\t')
+        if len(parts) < 5:
+            continue
+
+        flags = parts[3]
+        ssid = parts[4].strip()
+
+        # Ignorer les réseaux masqués (SSID vide)
+        if not ssid:
+            continue
+
+        # Convertir le signal (dBm) en pourcentage approximatif
+        # -30 dBm = excellent (100%), -90 dBm = très faible (0%)
+        try:
+            dbm = int(parts[2])
+        except ValueError:
+            dbm = -80
+        signal_percent = max(0, min(100, 2 * (dbm + 100)))
+
+        # Déterminer la sécurité à partir des flags
+        if 'WPA2' in flags:
+            security = 'WPA2'
+            secured = True
+        elif 'WPA' in flags:
+            security = 'WPA'
+            secured = True
+        elif 'WEP' in flags:
+            security = 'WEP'
+            secured = True
+        else:
+            security = 'Open'
+            secured = False
 
-        # SSID déjà enregistrés dans wpa_supplicant → connexion directe possible
-        # (sans redemander le mot de passe).
-        saved_ssids = {ssid for _, ssid in list_saved_networks()}
+        cell = {
+            'ssid': ssid,
+            'signal': signal_percent,
+            'security': security,
+            'secured': secured,
+            'known': ssid in saved_ssids,
+        }
 
-        networks = {}
+        # Garder le meilleur signal pour chaque SSID
+        if ssid not in networks or signal_percent > networks[ssid]['signal']:
+            networks[ssid] = cell
 
-        # Format des lignes (séparées par des tabulations) :
-        # bssid / frequency / signal level / flags / ssid
-        # 10:d7:b0:20:1b:b2   2462   -80   [WPA2-PSK-CCMP][WPS][ESS]   Livebox-1BB2
-        for line in result.stdout.split('\n'):
-            line = line.rstrip('\n')
-            # Sauter l'en-tête et les lignes vides
-            if not line or line.startswith('bssid'):
-                continue
+    return sorted(networks.values(), key=lambda x: x['signal'], reverse=True)
 
-            parts = line.split('\t')
-            if len(parts) < 5:
-                continue
 
-            flags = parts[3]
-            ssid = parts[4].strip()
+class WifiScanner:
+    """Scan WiFi en arrière-plan, avec résultats horodatés en cache.
 
-            # Ignorer les réseaux masqués (SSID vide)
-            if not ssid:
-                continue
+    Le thread ne tourne que tant que quelqu'un consulte la liste : chaque
+    lecture (`snapshot`) le relance si besoin, et il s'arrête de lui-même
+    après IDLE_TIMEOUT secondes sans lecture (inutile de scanner en continu).
+    """
 
-            # Convertir le signal (dBm) en pourcentage approximatif
-            # -30 dBm = excellent (100%), -90 dBm = très faible (0%)
-            try:
-                dbm = int(parts[2])
-            except ValueError:
-                dbm = -80
-            signal_percent = max(0, min(100, 2 * (dbm + 100)))
-
-            # Déterminer la sécurité à partir des flags
-            if 'WPA2' in flags:
-                security = 'WPA2'
-                secured = True
-            elif 'WPA' in flags:
-                security = 'WPA'
-                secured = True
-            elif 'WEP' in flags:
-                security = 'WEP'
-                secured = True
-            else:
-                security = 'Open'
-                secured = False
-
-            cell = {
-                'ssid': ssid,
-                'signal': signal_percent,
-                'security': security,
-                'secured': secured,
-                'known': ssid in saved_ssids,
+    # Secondes entre deux scans, et sans lecture avant arrêt du thread.
+    SCAN_INTERVAL = 10
+    IDLE_TIMEOUT = 60
+    # Attente de la fin d'un scan avant de lire ses résultats : durée fixe
+    # via wpa_cli, maximum si l'on reçoit les événements de la socket.
+    SCAN_DURATION = 2
+    SCAN_TIMEOUT = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._networks = []
+        self._updated_at = None
+        self._last_read = 0
+
+    def snapshot(self):
+        """Dernière liste connue : {networks, updated_at (epoch, None avant le
+        premier scan)}. Ne bloque jamais ; (re)démarre le scan en arrière-plan."""
+        with self._lock:
+            self._last_read = time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='wifi-scanner', daemon=True)
+                self._thread.start()
+            return {
+                'networks': list(self._networks),
+                'updated_at': self._updated_at,
             }
 
-            # Garder le meilleur signal pour chaque SSID
-            if ssid not in networks or signal_percent > networks[ssid]['signal']:
-                networks[ssid] = cell
-
-        return sorted(networks.values(), key=lambda x: x['signal'], reverse=True)
-
-    except (subprocess.TimeoutExpired, FileNotFoundError):
-        return []
-    except Exception:
-        return []
+    def request_scan(self):
+        """Lance un scan sans attendre l'intervalle (p. ex. WiFi réactivé)."""
+        self._wake.set()
+
+    def clear(self):
+        """Oublie les résultats (WiFi désactivé)."""
+        with self._lock:
+            self._networks = []
+            self._updated_at = None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if time.monotonic() - self._last_read > self.IDLE_TIMEOUT:
+                    self._thread = None
+                    return
+            try:
+                networks = self._scan()
+            except Exception as e:
+                print(f"Erreur lors du scan WiFi: {e}")
+                networks = None
+            if networks is not None:
+                with self._lock:
+                    self._networks = networks
+                    self._updated_at = int(time.time())
+            self._wake.wait(self.SCAN_INTERVAL)
+            self._wake.clear()
+
+    def _scan(self):
+        ctrl = get_wpa_ctrl()
+        if ctrl is None:
+            trigger_scan()
+            time.sleep(self.SCAN_DURATION)
+            return read_scan_results()
+        # Lire les résultats dès que wpa_supplicant signale la fin du scan
+        marker = ctrl.event_marker()
+        trigger_scan()
+        ctrl.wait_event(SCAN_RESULTS_EVENT, self.SCAN_TIMEOUT, after=marker)
+        return read_scan_results()
+
+
+wifi_scanner = WifiScanner()
 
 def list_saved_networks():
     """Retourne la liste (id, ssid) des réseaux déjà enregistrés dans
-    wpa_supplicant (via `wpa_cli list_networks`)."""
+    wpa_supplicant (commande `list_networks`)."""
     saved = []
     try:
-        result = subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'list_networks'],
-                                capture_output=True, text=True, timeout=5)
-        if result.returncode != 0:
-            return saved
+        output = wpa_request('list_networks')
 
         # Format tab-séparé : network id / ssid / bssid / flags (1re ligne = en-tête)
-        for line in result.stdout.split('\n'):
+        for line in output.split('\n'):
             parts = line.split('\t')
             if len(parts) < 2:
                 continue
@@ -177,7 +340,7 @@ def find_network_id(ssid):
     return None
 
 def connect_to_wifi(ssid, password=None):
-    """Se connecte à un réseau WiFi avec wpa_cli.
+    """Se connecte à un réseau WiFi via wpa_supplicant.
 
     Réutilise l'entrée existante si le SSID est déjà enregistré (met à jour le
     mot de passe au passage) au lieu d'en créer une nouvelle, ce qui évitait
@@ -189,62 +352,60 @@ def connect_to_wifi(ssid, password=None):
         created = network_id is None
 
         if created:
-            result = subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'add_network'],
-                                  capture_output=True, text=True, timeout=5)
-
-            if result.returncode != 0:
+            try:
+                # Récupérer l'ID du réseau créé
+                network_id = wpa_request('add_network').strip()
+            except WpaCtrlError:
                 return False, "Impossible d'ajouter le réseau"
 
-            # Récupérer l'ID du réseau créé
-            network_id = result.stdout.strip()
-
         try:
             # Configurer le SSID
-            subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'set_network',
-                          network_id, 'ssid', f'"{ssid}"'],
-                         capture_output=True, text=True, timeout=5, check=True)
+            wpa_request('set_network', network_id, 'ssid', f'"{ssid}"')
 
             # Configurer la sécurité
             if password:
                 # Mot de passe fourni → réseau sécurisé (nouveau ou mise à jour du psk)
-                subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'set_network',
-                              network_id, 'psk', f'"{password}"'],
-                             capture_output=True, text=True, timeout=5, check=True)
+                wpa_request('set_network', network_id, 'psk', f'"{password}"')
             elif created:
                 # Nouveau réseau sans mot de passe → réseau ouvert
-                subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'set_network',
-                              network_id, 'key_mgmt', 'NONE'],
-                             capture_output=True, text=True, timeout=5, check=True)
+                wpa_request('set_network', network_id, 'key_mgmt', 'NONE')
             # else : réseau connu reconnecté sans mot de passe → on garde sa
             # config existante (psk/key_mgmt), on se contente de l'activer.
 
             # Activer le réseau
-            subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'enable_network', network_id],
-                         capture_output=True, text=True, timeout=5, check=True)
+            wpa_request('enable_network', network_id)
 
             # Sauvegarder la configuration
-            subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'save_config'],
-                         capture_output=True, text=True, timeout=5)
+            try:
+                wpa_request('save_config')
+            except WpaCtrlError:
+                pass
 
             return True, f"Connexion au réseau {ssid} en cours..."
 
-        except subprocess.CalledProcessError as e:
+        except WpaCtrlError as e:
             # En cas d'erreur, supprimer le réseau UNIQUEMENT si on vient de le
             # créer (ne pas effacer une entrée existante, p. ex. le réseau maison).
             if created:
-                subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'remove_network', network_id],
-                             capture_output=True, text=True, timeout=5)
-            return False, f"Erreur de configuration: {e.stderr if e.stderr else 'configuration invalide'}"
+                try:
+                    wpa_request('remove_network', network_id)
+                except WpaCtrlError:
+                    pass
+            return False, f"Erreur de configuration: {e}"
 
-    except subprocess.TimeoutExpired:
-        return False, "Délai d'attente dépassé"
-    except FileNotFoundError:
-        return False, "wpa_cli non disponible"
     except Exception as e:
         return False, f"Erreur: {str(e)}"
 
 def get_current_wifi():
     """Récupère le réseau WiFi actuellement connecté"""
+    # Socket de contrôle disponible : son `STATUS` fait foi, sans sous-processus
+    ctrl = get_wpa_ctrl()
+    if ctrl is not None:
+        try:
+            return ssid_from_status(ctrl.request('STATUS'))
+        except WpaCtrlError:
+            pass
+
     try:
         # Essayer avec iwgetid (avec sudo)
         result = subprocess.run(['sudo', 'iwgetid', WIFI_INTERFACE, '-r'],
@@ -258,12 +419,9 @@ def get_current_wifi():
                               capture_output=True, text=True, timeout=5)
 
         if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if line.startswith('ssid='):
-                    ssid = line.split('=', 1)[1].strip()
-                    # Ignorer si le SSID est vide
-                    if ssid:
-                        return ssid
+            ssid = ssid_from_status(result.stdout)
+            if ssid:
+                return ssid
 
         # Dernière tentative : utiliser ip/iw pour vérifier la connexion
         result = subprocess.run(['iw', 'dev', WIFI_INTERFACE, 'link'],
@@ -283,6 +441,16 @@ def get_current_wifi():
     except Exception:
         return None
 
+def ssid_from_status(output):
+    """SSID du réseau associé d'après la sortie de `status`, ou None."""
+    for line in output.split('\n'):
+        if line.startswith('ssid='):
+            ssid = line.split('=', 1)[1].strip()
+            # Ignorer si le SSID est vide
+            if ssid:
+                return ssid
+    return None
+
 def is_wifi_enabled():
     """Vérifie si la radio WiFi est activée.
 
@@ -326,37 +494,167 @@ def is_wifi_enabled():
     except Exception:
         return False
 
-def enable_wifi():
-    """Active le WiFi"""
+def rfkill_blocked():
+    """État de blocage de la radio WiFi lu dans /sys/class/rfkill (sans
+    sous-processus) : True/False, ou None si aucune radio n'est déclarée."""
+    blocked = None
+    for path in glob.glob('/sys/class/rfkill/rfkill*'):
+        try:
+            with open(os.path.join(path, 'type')) as f:
+                if f.read().strip() != 'wlan':
+                    continue
+            with open(os.path.join(path, 'soft')) as f:
+                soft = f.read().strip() == '1'
+            with open(os.path.join(path, 'hard')) as f:
+                hard = f.read().strip() == '1'
+        except OSError:
+            continue
+        blocked = bool(blocked) or soft or hard
+    return blocked
+
+def interface_is_up():
+    """Flag administratif UP de l'interface (/sys/class/net/<if>/flags)."""
     try:
-        # Activer l'interface
-        result = subprocess.run(['sudo', 'ip', 'link', 'set', WIFI_INTERFACE, 'up'],
-                              capture_output=True, text=True, timeout=10)
-
-        if result.returncode == 0:
-            # Attendre que l'interface soit prête
-            time.sleep(3)
-            # Relancer wpa_supplicant pour qu'il se reconnecte
-            subprocess.run(['sudo', 'wpa_cli', '-i', WIFI_INTERFACE, 'reconfigure'],
-                         capture_output=True, text=True, timeout=5)
-            # Attendre encore un peu pour la connexion
-            time.sleep(2)
-            return True, "WiFi activé - Reconnexion en cours..."
-        else:
-            return False, f"Erreur d'activation: {result.stderr}"
-    except Exception as e:
-        return False, f"Erreur: {str(e)}"
+        with open(f'/sys/class/net/{WIFI_INTERFACE}/flags') as f:
+            return bool(int(f.read().strip(), 16) & IFF_UP)
+    except (OSError, ValueError):
+        return False
 
-def disable_wifi():
-    """Désactive le WiFi"""
+def wpa_state():
+    """Valeur `wpa_state` du statut de wpa_supplicant (p. ex. 'SCANNING',
+    'COMPLETED', 'INTERFACE_DISABLED'), ou None s'il ne répond pas."""
     try:
-        # Désactiver l'interface
+        output = wpa_request('status', timeout=2)
+    except WpaCtrlError:
+        return None
+    for line in output.split('\n'):
+        if line.startswith('wpa_state='):
+            return line.split('=', 1)[1].strip()
+    return None
+
+
+class WifiPower:
+    """Activation / désactivation du WiFi en arrière-plan.
+
+    Au lieu d'attendre des durées fixes, chaque étape interroge l'état réel
+    (rfkill, flags de l'interface, état de wpa_supplicant) et passe à la
+    suivante dès qu'il est atteint. `status()` donne l'état courant pour
+    l'affichage : 'enabling' / 'disabling' pendant la transition, puis
+    'enabled', 'disabled' ou 'error'.
+    """
+
+    POLL_INTERVAL = 0.2
+    # Délais maximaux de chaque étape (secondes)
+    RADIO_TIMEOUT = 5
+    INTERFACE_TIMEOUT = 10
+    WPA_TIMEOUT = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = None
+        self._message = None
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'message': self._message,
+                'busy': self._thread is not None and self._thread.is_alive(),
+            }
+
+    def take_result(self):
+        """Résultat de la dernière transition terminée, (état, message), à
+        afficher une seule fois ; None s'il n'y en a pas (ou plus)."""
+        with self._lock:
+            if self._message is None or self._state not in ('enabled', 'disabled', 'error'):
+                return None
+            result = (self._state, self._message)
+            self._message = None
+            return result
+
+    def enable(self):
+        """Lance l'activation ; False si une transition est déjà en cours."""
+        return self._start('enabling', self._enable)
+
+    def disable(self):
+        """Lance la désactivation ; False si une transition est déjà en cours."""
+        return self._start('disabling', self._disable)
+
+    def _start(self, state, target):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._state = state
+            self._message = None
+            self._thread = threading.Thread(target=self._run, args=(target,), name='wifi-power', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, target):
+        try:
+            target()
+        except Exception as e:
+            self._set('error', f"Erreur: {str(e)}")
+
+    def _set(self, state, message):
+        with self._lock:
+            self._state = state
+            self._message = message
+
+    def _wait_for(self, predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+    def _enable(self):
+        if rfkill_blocked():
+            self._set('enabling', "Déblocage de la radio...")
+            subprocess.run(['sudo', 'rfkill', 'unblock', 'wifi'],
+                           capture_output=True, text=True, timeout=10)
+            if not self._wait_for(lambda: not rfkill_blocked(), self.RADIO_TIMEOUT):
+                self._set('error', "Radio WiFi bloquée (rfkill)")
+                return
+
+        self._set('enabling', "Activation de l'interface...")
+        result = subprocess.run(['sudo', 'ip', 'link', 'set', WIFI_INTERFACE, 'up'],
+                                capture_output=True, text=True, timeout=10)
+        if result.returncode != 0:
+            self._set('error', f"Erreur d'activation: {result.stderr}")
+            return
+        if not self._wait_for(interface_is_up, self.INTERFACE_TIMEOUT):
+            self._set('error', "L'interface WiFi ne démarre pas")
+            return
+
+        # Relancer wpa_supplicant pour qu'il se reconnecte, puis attendre
+        # qu'il ait repris la main sur l'interface (scan ou association).
+        self._set('enabling', "Démarrage de wpa_supplicant...")
+        try:
+            wpa_request('reconfigure')
+        except WpaCtrlError:
+            pass
+        self._wait_for(lambda: wpa_state() not in (None, 'INTERFACE_DISABLED'), self.WPA_TIMEOUT)
+
+        self._set('enabled', "WiFi activé - Reconnexion en cours...")
+        # Nouveau scan en arrière-plan : la page affichera les réseaux dès
+        # qu'ils seront trouvés
+        wifi_scanner.request_scan()
+
+    def _disable(self):
+        self._set('disabling', "Désactivation de l'interface...")
         result = subprocess.run(['sudo', 'ip', 'link', 'set', WIFI_INTERFACE, 'down'],
-                              capture_output=True, text=True, timeout=10)
+                                capture_output=True, text=True, timeout=10)
+        if result.returncode != 0:
+            self._set('error', f"Erreur de désactivation: {result.stderr}")
+            return
+        if not self._wait_for(lambda: not interface_is_up(), self.INTERFACE_TIMEOUT):
+            self._set('error', "L'interface WiFi ne s'arrête pas")
+            return
+        wifi_scanner.clear()
+        self._set('disabled', "WiFi désactivé")
 
-        if result.returncode == 0:
-            return True, "WiFi désactivé"
-        else:
-            return False, f"Erreur de désactivation: {result.stderr}"
-    except Exception as e:
-        return False, f"Erreur: {str(e)}"
+
+wifi_power = WifiPower()
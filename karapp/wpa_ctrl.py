@@ -0,0 +1,190 @@
+"""
+Client de l'interface de contrôle de wpa_supplicant (socket Unix).
+
+Remplace les appels `sudo wpa_cli ...` : chaque appel à wpa_cli coûte un
+fork/exec plus sudo (plusieurs dizaines de ms sur un Pi Zero), alors que
+wpa_cli ne fait lui-même qu'écrire la commande dans cette socket. On garde ici
+une seule connexion ouverte, utilisée à la fois pour les commandes et pour les
+événements (`ATTACH`), comme le fait `wpa_ctrl_request` côté C : les messages
+qui commencent par « <niveau> » sont des événements, les autres des réponses.
+
+Un faux wpa_supplicant pour les tests est dans tests/fake_wpa_supplicant.py.
+"""
+import itertools
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+
+# Dossier des sockets de contrôle (ctrl_interface de wpa_supplicant.conf)
+CTRL_DIR = '/var/run/wpa_supplicant'
+
+# Événement émis par wpa_supplicant quand un scan est terminé
+SCAN_RESULTS_EVENT = 'CTRL-EVENT-SCAN-RESULTS'
+
+_counter = itertools.count()
+
+
+class WpaCtrlError(Exception):
+    """Échec d'une commande (réponse FAIL, délai dépassé, socket fermée)."""
+
+
+class WpaCtrl:
+    """Connexion persistante à la socket de contrôle d'une interface."""
+
+    def __init__(self, interface='wlan0', ctrl_path=None):
+        self.ctrl_path = ctrl_path or os.path.join(CTRL_DIR, interface)
+        self.local_path = None
+        self._sock = None
+        self._reader = None
+        self._replies = queue.Queue()
+        self._request_lock = threading.Lock()
+        self._events = threading.Condition()
+        self._event_seq = 0
+        self._last_events = []
+        self._listeners = []
+        self.attached = False
+
+    # --- connexion -------------------------------------------------------
+
+    def open(self):
+        """Ouvre la socket. Lève OSError si wpa_supplicant est absent ou si
+        les droits manquent (groupe `netdev`)."""
+        # Socket datagramme : il faut une adresse locale pour recevoir les
+        # réponses (wpa_cli fait de même dans /tmp).
+        self.local_path = os.path.join(
+            tempfile.gettempdir(), f'karadoc_wpa_{os.getpid()}_{next(_counter)}')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(self.local_path)
+            sock.connect(self.ctrl_path)
+        except OSError:
+            sock.close()
+            self._unlink_local()
+            raise
+        self._sock = sock
+        self._reader = threading.Thread(target=self._read_loop, name='wpa-ctrl', daemon=True)
+        self._reader.start()
+        return self
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                if self.attached:
+                    sock.send(b'DETACH')
+            except OSError:
+                pass
+            sock.close()
+        self.attached = False
+        self._unlink_local()
+
+    @property
+    def is_open(self):
+        return self._sock is not None and self._reader is not None and self._reader.is_alive()
+
+    def _unlink_local(self):
+        if self.local_path:
+            try:
+                os.unlink(self.local_path)
+            except OSError:
+                pass
+
+    # --- commandes -------------------------------------------------------
+
+    def request(self, command, timeout=5):
+        """Envoie une commande (p. ex. 'SCAN_RESULTS') et renvoie la réponse
+        brute. Lève WpaCtrlError si la réponse commence par FAIL."""
+        reply = self.raw_request(command, timeout)
+        if reply.startswith('FAIL'):
+            raise WpaCtrlError(f'{command.split()[0]}: {reply.strip()}')
+        return reply
+
+    def raw_request(self, command, timeout=5):
+        """Comme `request`, sans interpréter la réponse."""
+        if self._sock is None:
+            raise WpaCtrlError('Connexion fermée')
+        with self._request_lock:
+            # Purger une éventuelle réponse tardive à une commande expirée
+            while not self._replies.empty():
+                self._replies.get_nowait()
+            try:
+                self._sock.send(command.encode('utf-8'))
+            except OSError as e:
+                raise WpaCtrlError(str(e))
+            try:
+                reply = self._replies.get(timeout=timeout)
+            except queue.Empty:
+                raise WpaCtrlError(f'{command.split()[0]}: délai dépassé')
+        if reply is None:
+            raise WpaCtrlError('Connexion fermée')
+        return reply
+
+    def attach(self):
+        """Demande à recevoir les événements de wpa_supplicant."""
+        if not self.attached:
+            if self.raw_request('ATTACH').strip() != 'OK':
+                raise WpaCtrlError('ATTACH refusé')
+            self.attached = True
+
+    # --- événements ------------------------------------------------------
+
+    def add_listener(self, callback):
+        """`callback(event)` est appelé (depuis le thread de lecture) pour chaque
+        événement, sans son préfixe de niveau, p. ex. 'CTRL-EVENT-CONNECTED ...'."""
+        self._listeners.append(callback)
+
+    def event_marker(self):
+        """Repère à passer à `wait_event` pour n'attendre que les événements
+        postérieurs (à prendre AVANT d'envoyer la commande déclencheuse)."""
+        with self._events:
+            return self._event_seq
+
+    def wait_event(self, prefix, timeout, after=None):
+        """Attend un événement commençant par `prefix`, reçu après le repère
+        `after` (défaut : maintenant). Retourne l'événement ou None."""
+        deadline = time.monotonic() + timeout
+        with self._events:
+            seen = self._event_seq if after is None else after
+            while True:
+                for seq, event in self._last_events:
+                    if seq > seen and event.startswith(prefix):
+                        return event
+                seen = self._event_seq
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._sock is None:
+                    return None
+                self._events.wait(remaining)
+
+    def _read_loop(self):
+        sock = self._sock
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            message = data.decode('utf-8', errors='replace')
+            if message.startswith('<') and '>' in message[:4]:
+                self._dispatch_event(message[message.index('>') + 1:])
+            else:
+                self._replies.put(message)
+        # Socket fermée : débloquer une requête ou une attente en cours
+        self._replies.put(None)
+        with self._events:
+            self._events.notify_all()
+
+    def _dispatch_event(self, event):
+        with self._events:
+            self._event_seq += 1
+            self._last_events.append((self._event_seq, event))
+            del self._last_events[:-32]
+            self._events.notify_all()
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Erreur dans un écouteur wpa_supplicant: {e}")
@@ -0,0 +1,95 @@
+/**
+ * Liste de fichiers d'un dossier : défilement infini et pochettes chargées
+ * à la demande.
+ *
+ * La première page est rendue par le serveur ; quand le bas de la liste
+ * approche (.cardlist-more visible), la page suivante est demandée à
+ * data-next-url (/listing/<categorie>, pages d'artistes ou d'albums) avec
+ * ?after=<curseur> et ses cartes ajoutées. Les pochettes (data-artwork) ne
+ * sont téléchargées que pour les cartes proches de l'écran.
+ */
+
+let cardList = null;
+let loadingMore = null;
+let artworkObserver = null;
+
+document.addEventListener('DOMContentLoaded', function() {
+    cardList = document.querySelector('.cardlist[data-next-url]');
+    if (!cardList) {
+        return;
+    }
+
+    artworkObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                const card = entry.target;
+                card.style.backgroundImage = `url('${card.dataset.artwork}')`;
+                artworkObserver.unobserve(card);
+            }
+        });
+    }, { rootMargin: '200px' });
+    observeArtwork(cardList);
+
+    const more = document.querySelector('.cardlist-more');
+    if (more) {
+        const moreObserver = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMoreCards().then(added => {
+                    // Réobserver pour enchaîner si le bas est encore visible
+                    // (page courte, grand écran)
+                    if (added) {
+                        moreObserver.unobserve(more);
+                        moreObserver.observe(more);
+                    }
+                });
+            }
+        }, { rootMargin: '400px' });
+        moreObserver.observe(more);
+    }
+});
+
+function observeArtwork(root) {
+    root.querySelectorAll('[data-artwork]').forEach(card => artworkObserver.observe(card));
+}
+
+/**
+ * Charge la page suivante. Retourne une Promise résolue à true si des cartes
+ * ont été ajoutées (aussi utilisée par le lecteur et la visionneuse pour
+ * continuer au-delà des cartes affichées).
+ */
+function loadMoreCards() {
+    if (!cardList || !cardList.dataset.nextCursor) {
+        return Promise.resolve(false);
+    }
+    if (loadingMore) {
+        return loadingMore;
+    }
+
+    const separator = cardList.dataset.nextUrl.includes('?') ? '&' : '?';
+    const url = `${cardList.dataset.nextUrl}${separator}after=${encodeURIComponent(cardList.dataset.nextCursor)}`;
+    loadingMore = fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success === false) {
+                // Curseur refusé : arrêter le défilement plutôt que d'insérer une page vide
+                cardList.dataset.nextCursor = '';
+                throw new Error(data.error);
+            }
+            const template = document.createElement('template');
+            template.innerHTML = data.html;
+            const cards = template.content.querySelectorAll('[data-artwork]');
+            // Les nouvelles cartes passent avant la carte « Ajouter »
+            cardList.insertBefore(template.content, cardList.querySelector('.add-card'));
+            cards.forEach(card => artworkObserver.observe(card));
+            cardList.dataset.nextCursor = data.next || '';
+            return true;
+        })
+        .catch(error => {
+            console.error('Erreur:', error);
+            return false;
+        })
+        .finally(() => {
+            loadingMore = null;
+        });
+    return loadingMore;
+}
@@ -13,6 +13,15 @@
 
     let currentType = 'track';
 
+    // Recherche pendant la saisie : on attend une courte pause de frappe, et
+    // seule la réponse de la DERNIÈRE requête est affichée (une réponse lente
+    // à une saisie plus ancienne ne doit pas écraser la plus récente).
+    const TYPING_DELAY = 350;
+    const MIN_CHARS = 2;
+    let typingTimer = null;
+    let searchSeq = 0;
+    let pending = null;
+
     // Sélecteur de type (segmenté)
     typeBtns.forEach(btn => {
         btn.addEventListener('click', function () {
@@ -34,28 +43,58 @@
         }
     });
 
+    // Le clavier virtuel (keyboard.js) émet un événement 'input' à chaque touche
+    queryInput.addEventListener('input', function () {
+        clearTimeout(typingTimer);
+        if (queryInput.value.trim().length < MIN_CHARS) {
+            return;
+        }
+        typingTimer = setTimeout(runSearch, TYPING_DELAY);
+    });
+
     function runSearch() {
+        clearTimeout(typingTimer);
         const q = queryInput.value.trim();
         if (!q) {
             return;
         }
 
+        // Annuler la requête précédente encore en vol
+        if (pending) {
+            pending.abort();
+        }
+        pending = new AbortController();
+        const seq = ++searchSeq;
+
         resultsEl.innerHTML = '<p class="deezer-loading">Recherche…</p>';
 
-        const url = '/deezer/search?type=' + encodeURIComponent(currentType) +
-                    '&q=' + encodeURIComponent(q);
+        // « Tout » : les quatre types en un seul appel, résultats groupés
+        const url = currentType === 'all'
+            ? '/deezer/search/all?q=' + encodeURIComponent(q)
+            : '/deezer/search?type=' + encodeURIComponent(currentType) +
+              '&q=' + encodeURIComponent(q);
 
-        fetch(url)
+        fetch(url, { signal: pending.signal })
             .then(r => r.json())
             .then(data => {
+                if (seq !== searchSeq) {
+                    return;  // réponse périmée
+                }
                 if (data.error) {
                     resultsEl.innerHTML = '';
                     showAlertModal(data.error);
                     return;
                 }
-                renderResults(data.results || []);
+                if (data.groups) {
+                    renderGroups(data.groups);
+                } else {
+                    renderResults(data.results || []);
+                }
             })
-            .catch(() => {
+            .catch(err => {
+                if (err.name === 'AbortError' || seq !== searchSeq) {
+                    return;
+                }
                 resultsEl.innerHTML = '';
                 showAlertModal('Erreur lors de la recherche Deezer.');
             });
@@ -69,52 +108,129 @@
             return;
         }
 
-        results.forEach(item => {
-            const row = document.createElement('div');
-            row.className = 'deezer-item';
-
-            // Lien de lecture (cover + infos) → page widget
-            const link = document.createElement('a');
-            link.className = 'deezer-item-link';
-            link.href = '/deezer/play/' + item.type + '/' + item.id +
-                        '?title=' + encodeURIComponent(item.title || '');
-
-            const cover = document.createElement('div');
-            cover.className = 'deezer-item-cover';
-            if (item.cover) {
-                cover.style.backgroundImage = "url('" + item.cover + "')";
-            } else {
-                cover.style.backgroundColor = '#a238ff';
+        resultsEl.appendChild(buildSaveAllButton(results));
+        results.forEach(item => resultsEl.appendChild(buildRow(item)));
+    }
+
+    // Résultats groupés par type, dans l'ordre des boutons de type
+    function renderGroups(groups) {
+        resultsEl.innerHTML = '';
+        let total = 0;
+        const all = [];
+
+        typeBtns.forEach(btn => {
+            const items = groups[btn.dataset.type] || [];
+            if (!items.length) {
+                return;
             }
+            total += items.length;
+            all.push(...items);
+            const heading = document.createElement('h3');
+            heading.className = 'deezer-group-title';
+            heading.textContent = btn.textContent;
+            resultsEl.appendChild(heading);
+            items.forEach(item => resultsEl.appendChild(buildRow(item)));
+        });
 
-            const info = document.createElement('div');
-            info.className = 'deezer-item-info';
-            const title = document.createElement('div');
-            title.className = 'deezer-item-title';
-            title.textContent = item.title || '';
-            const subtitle = document.createElement('div');
-            subtitle.className = 'deezer-item-subtitle';
-            subtitle.textContent = item.subtitle || '';
-            info.appendChild(title);
-            info.appendChild(subtitle);
-
-            link.appendChild(cover);
-            link.appendChild(info);
-
-            // Bouton Enregistrer
-            const saveBtn = document.createElement('button');
-            saveBtn.type = 'button';
-            saveBtn.className = 'deezer-save-btn';
-            saveBtn.title = 'Enregistrer';
-            saveBtn.innerHTML = '<i class="fas fa-plus"></i>';
-            saveBtn.addEventListener('click', function () {
-                saveItem(item, saveBtn);
-            });
+        if (!total) {
+            resultsEl.innerHTML = '<p class="deezer-loading">Aucun résultat.</p>';
+        } else {
+            resultsEl.insertBefore(buildSaveAllButton(all), resultsEl.firstChild);
+        }
+    }
+
+    // Enregistre toute la page de résultats en une requête (POST /deezer/save/batch)
+    function buildSaveAllButton(items) {
+        const btn = document.createElement('button');
+        btn.type = 'button';
+        btn.className = 'deezer-search-go';
+        btn.innerHTML = '<i class="fas fa-plus"></i> Tout enregistrer';
+        btn.addEventListener('click', function () {
+            btn.disabled = true;
+            fetch('/deezer/save/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ items: items.map(toPayload) })
+            })
+                .then(r => r.json())
+                .then(data => {
+                    if (data.success) {
+                        resultsEl.querySelectorAll('.deezer-save-btn').forEach(markSaved);
+                        showAlertModal(data.message);
+                    } else {
+                        btn.disabled = false;
+                        showAlertModal(data.error || "Impossible d'enregistrer.");
+                    }
+                })
+                .catch(() => {
+                    btn.disabled = false;
+                    showAlertModal("Impossible d'enregistrer.");
+                });
+        });
+        return btn;
+    }
+
+    function toPayload(item) {
+        return {
+            deezer_id: item.id,
+            type: item.type,
+            title: item.title,
+            subtitle: item.subtitle,
+            cover: item.cover
+        };
+    }
+
+    function markSaved(btn) {
+        btn.disabled = true;
+        btn.innerHTML = '<i class="fas fa-check"></i>';
+        btn.classList.add('saved');
+    }
+
+    function buildRow(item) {
+        const row = document.createElement('div');
+        row.className = 'deezer-item';
+
+        // Lien de lecture (cover + infos) → page widget
+        const link = document.createElement('a');
+        link.className = 'deezer-item-link';
+        link.href = '/deezer/play/' + item.type + '/' + item.id +
+                    '?title=' + encodeURIComponent(item.title || '');
+
+        const cover = document.createElement('div');
+        cover.className = 'deezer-item-cover';
+        if (item.cover) {
+            cover.style.backgroundImage = "url('" + item.cover + "')";
+        } else {
+            cover.style.backgroundColor = '#a238ff';
+        }
+
+        const info = document.createElement('div');
+        info.className = 'deezer-item-info';
+        const title = document.createElement('div');
+        title.className = 'deezer-item-title';
+        title.textContent = item.title || '';
+        const subtitle = document.createElement('div');
+        subtitle.className = 'deezer-item-subtitle';
+        subtitle.textContent = item.subtitle || '';
+        info.appendChild(title);
+        info.appendChild(subtitle);
+
+        link.appendChild(cover);
+        link.appendChild(info);
 
-            row.appendChild(link);
-            row.appendChild(saveBtn);
-            resultsEl.appendChild(row);
+        // Bouton Enregistrer
+        const saveBtn = document.createElement('button');
+        saveBtn.type = 'button';
+        saveBtn.className = 'deezer-save-btn';
+        saveBtn.title = 'Enregistrer';
+        saveBtn.innerHTML = '<i class="fas fa-plus"></i>';
+        saveBtn.addEventListener('click', function () {
+            saveItem(item, saveBtn);
         });
+
+        row.appendChild(link);
+        row.appendChild(saveBtn);
+        return row;
     }
 
     function saveItem(item, btn) {
@@ -123,20 +239,13 @@
         fetch('/deezer/save', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                deezer_id: item.id,
-                type: item.type,
-                title: item.title,
-                subtitle: item.subtitle,
-                cover: item.cover
-            })
+            body: JSON.stringify(toPayload(item))
         })
             .then(r => r.json())
             .then(data => {
                 if (data.success) {
                     // Marquer visuellement comme enregistré
-                    btn.innerHTML = '<i class="fas fa-check"></i>';
-                    btn.classList.add('saved');
+                    markSaved(btn);
                     showAlertModal(data.message);
                 } else {
                     btn.disabled = false;
@@ -2,30 +2,27 @@
  * Gestion de la suppression des fichiers et dossiers
  */
 
-document.addEventListener('DOMContentLoaded', function() {
-    // Sélectionner tous les boutons de suppression
-    const deleteButtons = document.querySelectorAll('.delete-btn');
+// Un seul écouteur pour tous les boutons, y compris ceux des cartes ajoutées
+// au fil du défilement (cardlist.js)
+document.addEventListener('click', function(e) {
+    const button = e.target.closest('.delete-btn');
+    if (!button) return;
+    e.preventDefault();
+    e.stopPropagation(); // Empêcher la propagation vers le lien parent
 
-    deleteButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
-            e.preventDefault();
-            e.stopPropagation(); // Empêcher la propagation vers le lien parent
+    const fileId = button.getAttribute('data-file-id');
+    const fileName = button.getAttribute('data-file-name');
+    const isDir = button.classList.contains('delete-btn-dir');
 
-            const fileId = this.getAttribute('data-file-id');
-            const fileName = this.getAttribute('data-file-name');
-            const isDir = this.classList.contains('delete-btn-dir');
+    // Confirmation de suppression
+    const message = isDir
+        ? `Êtes-vous sûr de vouloir supprimer le dossier "${fileName}" et tout son contenu ?`
+        : `Êtes-vous sûr de vouloir supprimer "${fileName}" ?`;
 
-            // Confirmation de suppression
-            const message = isDir
-                ? `Êtes-vous sûr de vouloir supprimer le dossier "${fileName}" et tout son contenu ?`
-                : `Êtes-vous sûr de vouloir supprimer "${fileName}" ?`;
-
-            showConfirmModal(message, { confirmText: 'Supprimer' }).then(confirmed => {
-                if (confirmed) {
-                    deleteFile(fileId, this);
-                }
-            });
-        });
+    showConfirmModal(message, { confirmText: 'Supprimer' }).then(confirmed => {
+        if (confirmed) {
+            deleteFile(fileId, button);
+        }
     });
 });
 
@@ -21,25 +21,15 @@ document.addEventListener('DOMContentLoaded', function() {
 
     console.log('Player.js: Audio player trouvé');
 
-    // Récupérer toutes les pistes de musique
-    const musicCards = document.querySelectorAll('.file');
-    console.log('Player.js: Nombre de pistes trouvées:', musicCards.length);
-
-    tracks = Array.from(musicCards).map(card => ({
-        url: card.dataset.trackUrl,
-        title: card.dataset.trackTitle,
-        artist: card.dataset.trackArtist,
-        artwork: card.dataset.trackArtwork
-    }));
-
-    console.log('Player.js: Tracks chargées:', tracks);
-
-    // Ajouter les event listeners pour ouvrir le modal
-    musicCards.forEach((card, index) => {
-        card.addEventListener('click', () => {
-            console.log('Click sur la piste:', index);
-            openPlayer(index);
-        });
+    // Les cartes sont ajoutées au fil du défilement (cardlist.js) : un seul
+    // écouteur sur la liste, et la liste des pistes relue à chaque ouverture
+    document.querySelector('.cardlist').addEventListener('click', e => {
+        const card = e.target.closest('.file');
+        if (!card) return;
+        tracks = readTracks();
+        const index = Array.from(document.querySelectorAll('.cardlist .file')).indexOf(card);
+        console.log('Click sur la piste:', index);
+        openPlayer(index);
     });
 
     // Event listeners pour les contrôles du lecteur
@@ -66,6 +56,18 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Pistes des cartes affichées
+function readTracks() {
+    return Array.from(document.querySelectorAll('.cardlist .file')).map(card => ({
+        url: card.dataset.trackUrl,
+        title: card.dataset.trackTitle,
+        artist: card.dataset.trackArtist,
+        artwork: card.dataset.trackArtwork,
+        // Durée connue en base : affichée avant le chargement du fichier
+        duration: parseFloat(card.dataset.trackDuration)
+    }));
+}
+
 // Ouvrir le lecteur avec une piste spécifique
 function openPlayer(index) {
     console.log('openPlayer appelé avec index:', index);
@@ -116,7 +118,7 @@ function loadTrack(index) {
     // Afficher l'artwork si disponible
     const artworkDiv = document.getElementById('trackArtwork');
     if (track.artwork) {
-        artworkDiv.style.backgroundImage = `url('data:image/jpeg;base64,${track.artwork}')`;
+        artworkDiv.style.backgroundImage = `url('${track.artwork}')`;
     } else {
         artworkDiv.style.backgroundImage = 'none';
         artworkDiv.style.backgroundColor = '#f3d2c1';
@@ -125,7 +127,7 @@ function loadTrack(index) {
     // Réinitialiser la timeline
     document.getElementById('timeline').value = 0;
     document.getElementById('currentTime').textContent = '0:00';
-    document.getElementById('duration').textContent = '0:00';
+    document.getElementById('duration').textContent = formatTime(track.duration);
 }
 
 // Toggle play/pause
@@ -173,6 +175,18 @@ function previousTrack() {
 
 // Piste suivante
 function nextTrack() {
+    // Dernière carte affichée : charger la page suivante avant de reboucler
+    if (currentTrackIndex === tracks.length - 1 && typeof loadMoreCards === 'function') {
+        loadMoreCards().then(() => {
+            tracks = readTracks();
+            goToNextTrack();
+        });
+        return;
+    }
+    goToNextTrack();
+}
+
+function goToNextTrack() {
     currentTrackIndex = (currentTrackIndex + 1) % tracks.length;
     loadTrack(currentTrackIndex);
     if (isPlaying) {
@@ -224,7 +238,7 @@ function updateTimeline() {
 
     // Mettre à jour les temps affichés
     document.getElementById('currentTime').textContent = formatTime(audioPlayer.currentTime);
-    document.getElementById('duration').textContent = formatTime(audioPlayer.duration);
+    document.getElementById('duration').textContent = formatTime(audioPlayer.duration || tracks[currentTrackIndex].duration);
 }
 
 // Formater le temps (secondes -> mm:ss)
@@ -2,21 +2,18 @@
  * Gestion du rafraîchissement des dossiers
  */
 
-document.addEventListener('DOMContentLoaded', function() {
-    // Sélectionner tous les boutons de refresh
-    const refreshButtons = document.querySelectorAll('.refresh-btn');
+// Un seul écouteur pour tous les boutons, y compris ceux des cartes ajoutées
+// au fil du défilement (cardlist.js)
+document.addEventListener('click', function(e) {
+    const button = e.target.closest('.refresh-btn');
+    if (!button) return;
+    e.preventDefault();
+    e.stopPropagation(); // Empêcher la propagation vers le lien parent
 
-    refreshButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
-            e.preventDefault();
-            e.stopPropagation(); // Empêcher la propagation vers le lien parent
+    const folderId = button.getAttribute('data-folder-id');
+    const folderName = button.getAttribute('data-folder-name');
 
-            const folderId = this.getAttribute('data-folder-id');
-            const folderName = this.getAttribute('data-folder-name');
-
-            refreshFolder(folderId, folderName, this);
-        });
-    });
+    refreshFolder(folderId, folderName, button);
 });
 
 function refreshFolder(folderId, folderName, buttonElement) {
@@ -0,0 +1,108 @@
+// Recherche dans la bibliothèque locale : interroge /search pendant la saisie
+// (clavier virtuel) et affiche les résultats, chacun menant à son dossier ou
+// au lecteur Deezer.
+(function () {
+    const queryInput = document.getElementById('library-query');
+    const resultsEl = document.getElementById('library-results');
+
+    if (!queryInput || !resultsEl) {
+        return;
+    }
+
+    // Icône et couleur par catégorie (mêmes couleurs que l'accueil)
+    const STYLES = {
+        photo: { icon: 'fa-camera', color: '#8bd3dd' },
+        musique: { icon: 'fa-music', color: '#f3d2c1' },
+        podcast: { icon: 'fa-podcast', color: '#cddafd' },
+        deezer: { icon: 'fa-deezer', color: '#c3aed6', brand: true }
+    };
+
+    const TYPING_DELAY = 200;
+    let typingTimer = null;
+    let searchSeq = 0;
+
+    queryInput.addEventListener('input', function () {
+        clearTimeout(typingTimer);
+        typingTimer = setTimeout(runSearch, TYPING_DELAY);
+    });
+
+    queryInput.addEventListener('keydown', function (e) {
+        if (e.key === 'Enter') {
+            e.preventDefault();
+            runSearch();
+        }
+    });
+
+    function runSearch() {
+        clearTimeout(typingTimer);
+        const q = queryInput.value.trim();
+        const seq = ++searchSeq;
+
+        if (!q) {
+            resultsEl.innerHTML = '';
+            return;
+        }
+
+        fetch('/search?q=' + encodeURIComponent(q))
+            .then(r => r.json())
+            .then(data => {
+                // Ignorer les réponses à une saisie plus ancienne
+                if (seq !== searchSeq) {
+                    return;
+                }
+                if (data.error) {
+                    resultsEl.innerHTML = '';
+                    showAlertModal(data.error);
+                    return;
+                }
+                renderResults(data.results || []);
+            })
+            .catch(() => {
+                if (seq === searchSeq) {
+                    resultsEl.innerHTML = '';
+                }
+            });
+    }
+
+    function renderResults(results) {
+        resultsEl.innerHTML = '';
+
+        if (!results.length) {
+            resultsEl.innerHTML = '<p class="deezer-loading">Aucun résultat.</p>';
+            return;
+        }
+
+        results.forEach(item => {
+            const style = STYLES[item.kind === 'deezer' ? 'deezer' : item.category] || STYLES.musique;
+
+            const row = document.createElement('div');
+            row.className = 'deezer-item';
+
+            const link = document.createElement('a');
+            link.className = 'deezer-item-link';
+            link.href = item.url;
+
+            const cover = document.createElement('div');
+            cover.className = 'deezer-item-cover search-item-icon';
+            cover.style.backgroundColor = style.color;
+            const icon = (item.kind === 'dir') ? 'fa-folder' : style.icon;
+            cover.innerHTML = '<i class="' + (style.brand ? 'fab ' : 'fas ') + icon + '"></i>';
+
+            const info = document.createElement('div');
+            info.className = 'deezer-item-info';
+            const title = document.createElement('div');
+            title.className = 'deezer-item-title';
+            title.textContent = item.title || '';
+            const subtitle = document.createElement('div');
+            subtitle.className = 'deezer-item-subtitle';
+            subtitle.textContent = item.subtitle || '';
+            info.appendChild(title);
+            info.appendChild(subtitle);
+
+            link.appendChild(cover);
+            link.appendChild(info);
+            row.appendChild(link);
+            resultsEl.appendChild(row);
+        });
+    }
+})();
@@ -7,33 +7,77 @@ document.addEventListener('DOMContentLoaded', function() {
     const statusEl = document.getElementById('update-status');
     const btn = document.getElementById('update-btn');
     const item = document.getElementById('update-item');
+    const checkBtn = document.getElementById('update-check-btn');
+    const rollbackBtn = document.getElementById('update-rollback-btn');
 
-    if (!statusEl || !btn) {
+    if (!statusEl || !btn || !checkBtn || !rollbackBtn) {
         return;
     }
 
-    // Vérifier la disponibilité d'une mise à jour au chargement de la page
-    fetch('/update/check')
-        .then(response => response.json())
-        .then(data => {
-            if (!data.success) {
-                statusEl.textContent = data.error || 'Vérification impossible';
-                return;
-            }
+    // État connu au chargement de la page (vérifié en arrière-plan par le
+    // serveur) ; tant qu'une vérification est en cours, on réinterroge.
+    function showStatus(data) {
+        if (data.checking) {
+            statusEl.textContent = 'Vérification en cours...';
+            setTimeout(() => loadStatus('GET'), 2000);
+            return;
+        }
+        checkBtn.disabled = false;
+
+        if (!data.success) {
+            statusEl.textContent = data.error || 'Vérification impossible';
+            return;
+        }
+
+        rollbackBtn.style.display = data.previous ? '' : 'none';
+
+        let checked = '';
+        if (data.checked_at) {
+            const date = new Date(data.checked_at * 1000);
+            checked = ` – vérifié à ${date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}`;
+        }
+        if (data.update_available) {
+            const n = data.behind;
+            statusEl.textContent = `Mise à jour disponible (${n} nouveau${n > 1 ? 'x' : ''} commit${n > 1 ? 's' : ''})`;
+            item.classList.add('update-available');
+            btn.style.display = '';
+        } else {
+            statusEl.textContent = `À jour (version ${data.current})${checked}`;
+            item.classList.remove('update-available');
+            btn.style.display = 'none';
+        }
+    }
 
-            if (data.update_available) {
-                const n = data.behind;
-                statusEl.textContent = `Mise à jour disponible (${n} nouveau${n > 1 ? 'x' : ''} commit${n > 1 ? 's' : ''})`;
-                item.classList.add('update-available');
-                btn.style.display = '';
-            } else {
-                statusEl.textContent = `À jour (version ${data.current})`;
+    function loadStatus(method) {
+        fetch('/update/check', { method: method })
+            .then(response => response.json())
+            .then(showStatus)
+            .catch(error => {
+                console.error('Erreur:', error);
+                statusEl.textContent = 'Vérification impossible (réseau ?)';
+                checkBtn.disabled = false;
+            });
+    }
+
+    loadStatus('GET');
+
+    // Vérification immédiate à la demande (sans bloquer la page)
+    checkBtn.addEventListener('click', function() {
+        checkBtn.disabled = true;
+        loadStatus('POST');
+    });
+
+    // Retour à la version d'avant la dernière mise à jour
+    rollbackBtn.addEventListener('click', function() {
+        showConfirmModal(
+            "Revenir à la version précédente ? L'application va redémarrer.",
+            { confirmText: 'Revenir' }
+        ).then(confirmed => {
+            if (confirmed) {
+                runUpdateAction('/update/rollback', statusEl, rollbackBtn, 'Retour à la version précédente...');
             }
-        })
-        .catch(error => {
-            console.error('Erreur:', error);
-            statusEl.textContent = 'Vérification impossible (réseau ?)';
         });
+    });
 
     // Lancer la mise à jour au clic
     btn.addEventListener('click', function() {
@@ -49,38 +93,71 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 function applyUpdate(statusEl, btn) {
+    runUpdateAction('/update/apply', statusEl, btn, 'Mise à jour en cours...');
+}
+
+/**
+ * Lance une opération de mise à jour (application ou retour arrière), puis
+ * suit ses étapes jusqu'au redémarrage du serveur.
+ */
+function runUpdateAction(url, statusEl, btn, label) {
     btn.disabled = true;
     btn.style.opacity = '0.5';
-    statusEl.textContent = 'Mise à jour en cours...';
+    statusEl.textContent = label;
+
+    function fail(message) {
+        showAlertModal(message || 'Échec de la mise à jour');
+        btn.disabled = false;
+        btn.style.opacity = '1';
+        statusEl.textContent = 'Échec de la mise à jour';
+    }
 
-    fetch('/update/apply', {
+    fetch(url, {
         method: 'POST',
         headers: { 'X-Requested-With': 'XMLHttpRequest' }
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            let msg = 'Mise à jour appliquée !';
-            if (data.deps_updated) {
-                msg += ' Les dépendances ont changé : un redémarrage manuel peut être nécessaire.';
-            }
-            // Laisser au reloader le temps de recharger le code, puis recharger
-            // la page pour afficher la nouvelle version.
-            showAlertModal(msg).then(() => {
-                setTimeout(() => window.location.reload(), 1500);
-            });
+            followProgress(statusEl, fail);
         } else {
-            showAlertModal(data.error || 'Échec de la mise à jour');
-            btn.disabled = false;
-            btn.style.opacity = '1';
-            statusEl.textContent = 'Échec de la mise à jour';
+            fail(data.error);
         }
     })
     .catch(error => {
         console.error('Erreur:', error);
-        showAlertModal('Erreur lors de la mise à jour');
-        btn.disabled = false;
-        btn.style.opacity = '1';
-        statusEl.textContent = 'Échec de la mise à jour';
+        fail('Erreur lors de la mise à jour');
     });
-}
\ No newline at end of file
+}
+
+function followProgress(statusEl, fail) {
+    let restarting = false;
+
+    function poll() {
+        fetch('/update/progress')
+            .then(response => response.json())
+            .then(data => {
+                if (data.state === 'running' || data.state === 'restarting') {
+                    restarting = restarting || data.state === 'restarting';
+                    statusEl.textContent = data.step || 'Mise à jour en cours...';
+                    setTimeout(poll, 1000);
+                } else if (data.state === 'error') {
+                    fail(data.error);
+                } else if (data.state === 'done') {
+                    statusEl.textContent = data.step;
+                } else if (restarting) {
+                    // Nouveau processus démarré : afficher la nouvelle version
+                    window.location.reload();
+                } else {
+                    setTimeout(poll, 1000);
+                }
+            })
+            .catch(() => {
+                // Serveur en cours de redémarrage : réessayer
+                statusEl.textContent = 'Redémarrage...';
+                restarting = true;
+                setTimeout(poll, 1000);
+            });
+    }
+    poll();
+}
@@ -1,14 +1,17 @@
 let photos = [];
 let currentPhotoIndex = 0;
 
-// Récupérer toutes les photos
-document.addEventListener('DOMContentLoaded', function() {
-    const thumbnails = document.querySelectorAll('.file');
-    photos = Array.from(thumbnails).map(thumb => thumb.dataset.photoUrl);
+// Photos des cartes affichées (la liste s'allonge au fil du défilement)
+function readPhotos() {
+    return Array.from(document.querySelectorAll('.cardlist .file')).map(thumb => thumb.dataset.photoUrl);
+}
 
-    // Ajouter les event listeners
-    thumbnails.forEach((thumbnail, index) => {
-        thumbnail.addEventListener('click', () => openModal(index));
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelector('.cardlist').addEventListener('click', e => {
+        const thumbnail = e.target.closest('.file');
+        if (!thumbnail) return;
+        photos = readPhotos();
+        openModal(Array.from(document.querySelectorAll('.cardlist .file')).indexOf(thumbnail));
     });
 });
 
@@ -26,6 +29,18 @@ function closeModal() {
 }
 
 function nextPhoto() {
+    // Dernière photo affichée : charger la page suivante avant de reboucler
+    if (currentPhotoIndex === photos.length - 1 && typeof loadMoreCards === 'function') {
+        loadMoreCards().then(() => {
+            photos = readPhotos();
+            showNextPhoto();
+        });
+        return;
+    }
+    showNextPhoto();
+}
+
+function showNextPhoto() {
     currentPhotoIndex = (currentPhotoIndex + 1) % photos.length;
     document.getElementById('modalImage').src = photos[currentPhotoIndex];
 }
@@ -0,0 +1,7 @@
+"""
+Tests de karapp, sans matériel (WiFi, Bluetooth) : les backends parlent à des
+faux (fake_*.py) qui simulent wpa_supplicant et BlueZ. Le test de charge de
+la base lance bench/db_stress.py sur une base temporaire.
+
+    python -m unittest discover -s tests -t .
+"""
@@ -0,0 +1,117 @@
+"""
+Faux BlueZ pour les tests : un bus D-Bus simulé (même interface que celui de
+pydbus) à passer à `BluezDbusManager` :
+
+    bus = FakeBluezBus()
+    bus.add_device('11:22:33:44:55:66', 'Enceinte', paired=True, uuids=[AUDIO_SINK_UUID])
+    manager = BluezDbusManager(bus=bus)
+"""
+import copy
+
+from karapp.bluetooth_dbus import ADAPTER_IFACE, DEVICE_IFACE
+
+
+class FakeBluezError(Exception):
+    """Erreur D-Bus simulée, au même format que celles de pydbus
+    (« GDBus.Error:org.bluez.Error.Failed: message »)."""
+
+    def __init__(self, name, message=''):
+        super().__init__(f'GDBus.Error:org.bluez.Error.{name}: {message or name}')
+
+
+class FakeBluezBus:
+    """Faux bus D-Bus exposant un adaptateur BlueZ (hci0) et des appareils.
+
+    Les appareils ajoutés avec `discoverable=True` n'apparaissent qu'après un
+    StartDiscovery. `fail[(méthode, mac)] = 'Nom'` fait échouer une action
+    (p. ex. fail[('Connect', mac)] = 'Failed'). Les appels reçus sont gardés
+    dans `calls`.
+    """
+
+    ADAPTER_PATH = '/org/bluez/hci0'
+
+    def __init__(self):
+        self.objects = {
+            self.ADAPTER_PATH: {ADAPTER_IFACE: {'Address': '00:00:00:00:00:00', 'Powered': True,
+                                                'Discovering': False}},
+        }
+        self.hidden = {}  # appareils visibles seulement pendant la découverte
+        self.fail = {}
+        self.calls = []
+
+    def add_device(self, mac, name, paired=False, connected=False, trusted=False,
+                   uuids=(), rssi=None, discoverable=False):
+        props = {'Address': mac.upper(), 'Name': name, 'Alias': name, 'Paired': paired,
+                 'Connected': connected, 'Trusted': trusted, 'UUIDs': list(uuids)}
+        if rssi is not None:
+            props['RSSI'] = rssi
+        path = f"{self.ADAPTER_PATH}/dev_{mac.upper().replace(':', '_')}"
+        if discoverable:
+            self.hidden[path] = {DEVICE_IFACE: props}
+        else:
+            self.objects[path] = {DEVICE_IFACE: props}
+        return path
+
+    def get(self, bus_name, path='/'):
+        return _FakeBluezObject(self, path)
+
+
+class _FakeBluezObject:
+
+    def __init__(self, bus, path):
+        object.__setattr__(self, '_bus', bus)
+        object.__setattr__(self, '_path', path)
+
+    def _props(self):
+        interfaces = self._bus.objects.get(self._path)
+        if interfaces is None:
+            raise FakeBluezError('DoesNotExist', 'Does Not Exist')
+        return interfaces.get(DEVICE_IFACE) or interfaces.get(ADAPTER_IFACE)
+
+    def _call(self, method):
+        props = self._props()
+        self._bus.calls.append((method, self._path))
+        error = self._bus.fail.get((method, props.get('Address')))
+        if error:
+            raise FakeBluezError(error)
+        return props
+
+    def __getattr__(self, name):
+        props = self._props()
+        if name not in props:
+            raise AttributeError(name)
+        return props[name]
+
+    def __setattr__(self, name, value):
+        self._call(f'Set{name}')[name] = value
+
+    # org.freedesktop.DBus.ObjectManager
+    def GetManagedObjects(self):
+        return copy.deepcopy(self._bus.objects)
+
+    # org.bluez.Adapter1
+    def StartDiscovery(self):
+        self._call('StartDiscovery')['Discovering'] = True
+        self._bus.objects.update(self._bus.hidden)
+        self._bus.hidden = {}
+
+    def StopDiscovery(self):
+        self._call('StopDiscovery')['Discovering'] = False
+
+    def RemoveDevice(self, path):
+        self._call('RemoveDevice')
+        if self._bus.objects.pop(path, None) is None:
+            raise FakeBluezError('DoesNotExist', 'Does Not Exist')
+
+    # org.bluez.Device1
+    def Pair(self, timeout=None):
+        props = self._call('Pair')
+        if props['Paired']:
+            raise FakeBluezError('AlreadyExists', 'Already Exists')
+        props['Paired'] = True
+
+    def Connect(self, timeout=None):
+        self._call('Connect')['Connected'] = True
+
+    def Disconnect(self, timeout=None):
+        self._call('Disconnect')['Connected'] = False
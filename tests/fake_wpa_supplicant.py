@@ -0,0 +1,137 @@
+"""
+Faux wpa_supplicant pour les tests : répond sur une socket Unix datagramme,
+comme la socket de contrôle (karapp/wpa_ctrl.py).
+"""
+import os
+import socket
+import threading
+
+from karapp.wpa_ctrl import SCAN_RESULTS_EVENT
+
+
+class FakeWpaSupplicant:
+    """Faux wpa_supplicant répondant sur une socket Unix datagramme.
+
+    Gère les commandes utilisées par karapp.wifi (SCAN, SCAN_RESULTS,
+    LIST_NETWORKS, ADD_NETWORK, SET_NETWORK, ENABLE_NETWORK, REMOVE_NETWORK,
+    SAVE_CONFIG, STATUS, RECONFIGURE, ATTACH/DETACH, PING). Un SCAN envoie
+    l'événement CTRL-EVENT-SCAN-RESULTS aux clients attachés après
+    `scan_delay` secondes. Les commandes de `fail` (p. ex. {'ENABLE_NETWORK'})
+    répondent FAIL. Les commandes reçues sont gardées dans `commands`.
+
+        fake = FakeWpaSupplicant('/tmp/wlan0', scan_results=[
+            ('10:d7:b0:20:1b:b2', 2462, -60, '[WPA2-PSK-CCMP][ESS]', 'Maison'),
+        ]).start()
+        ctrl = WpaCtrl(ctrl_path='/tmp/wlan0').open()
+    """
+
+    def __init__(self, path, scan_results=None, scan_delay=0.05):
+        self.path = path
+        self.scan_results = list(scan_results or [])
+        self.scan_delay = scan_delay
+        self.networks = {}  # id -> {variable: valeur}
+        self.current_ssid = None
+        self.commands = []
+        self.fail = set()
+        self._attached = set()
+        self._next_id = 0
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._thread = threading.Thread(target=self._serve, name='fake-wpa', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def send_event(self, event, level=2):
+        """Envoie un événement à tous les clients attachés."""
+        sock = self._sock
+        if sock is None:
+            return
+        for client in list(self._attached):
+            try:
+                sock.sendto(f'<{level}>{event}'.encode('utf-8'), client)
+            except OSError:
+                self._attached.discard(client)
+
+    def _serve(self):
+        # Socket gardée localement : `stop` peut la fermer à tout moment
+        sock = self._sock
+        while True:
+            try:
+                data, client = sock.recvfrom(4096)
+            except OSError:
+                break
+            command = data.decode('utf-8')
+            self.commands.append(command)
+            reply = self._handle(command, client)
+            try:
+                sock.sendto(reply.encode('utf-8'), client)
+            except OSError:
+                pass
+
+    def _handle(self, command, client):
+        name, _, args = command.partition(' ')
+        if name in self.fail:
+            return 'FAIL\n'
+        if name == 'PING':
+            return 'PONG\n'
+        if name == 'ATTACH':
+            self._attached.add(client)
+            return 'OK\n'
+        if name == 'DETACH':
+            self._attached.discard(client)
+            return 'OK\n'
+        if name == 'SCAN':
+            threading.Timer(self.scan_delay, self.send_event, args=(SCAN_RESULTS_EVENT + ' ',)).start()
+            return 'OK\n'
+        if name == 'SCAN_RESULTS':
+            lines = ['bssid / frequency / signal level / flags / ssid']
+            lines += ['\t'.join(str(v) for v in row) for row in self.scan_results]
+            return '\n'.join(lines) + '\n'
+        if name == 'LIST_NETWORKS':
+            lines = ['network id / ssid / bssid / flags']
+            for network_id, conf in self.networks.items():
+                lines.append(f"{network_id}\t{conf.get('ssid', '').strip(chr(34))}\tany\t")
+            return '\n'.join(lines) + '\n'
+        if name == 'ADD_NETWORK':
+            network_id = self._next_id
+            self._next_id += 1
+            self.networks[network_id] = {}
+            return f'{network_id}\n'
+        if name in ('SET_NETWORK', 'ENABLE_NETWORK', 'REMOVE_NETWORK', 'SELECT_NETWORK'):
+            parts = args.split(' ', 2)
+            try:
+                network_id = int(parts[0])
+            except ValueError:
+                return 'FAIL\n'
+            if network_id not in self.networks:
+                return 'FAIL\n'
+            if name == 'SET_NETWORK' and len(parts) == 3:
+                self.networks[network_id][parts[1]] = parts[2]
+            elif name == 'REMOVE_NETWORK':
+                del self.networks[network_id]
+            elif name in ('ENABLE_NETWORK', 'SELECT_NETWORK'):
+                self.current_ssid = self.networks[network_id].get('ssid', '').strip('"')
+                self.send_event(f'CTRL-EVENT-CONNECTED - Connection to 00:00:00:00:00:00 completed [id={network_id}]')
+            return 'OK\n'
+        if name in ('SAVE_CONFIG', 'RECONFIGURE'):
+            return 'OK\n'
+        if name == 'STATUS':
+            if self.current_ssid:
+                return f'wpa_state=COMPLETED\nssid={self.current_ssid}\n'
+            return 'wpa_state=DISCONNECTED\n'
+        return 'UNKNOWN COMMAND\n'
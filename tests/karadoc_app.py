@@ -0,0 +1,22 @@
+"""Application Flask de Karadoc sur une base temporaire, pour les tests des
+routes. DB_PATH et DATA_PATH sont lus à l'import de app.py : ils sont fixés
+avant, et l'import n'a lieu qu'une fois par processus."""
+import os
+import tempfile
+
+_app_module = None
+
+
+def load_app():
+    """Module app.py, base créée, sans les workers d'arrière-plan."""
+    global _app_module
+    if _app_module is None:
+        tmp = tempfile.mkdtemp(prefix='karadoc-tests-')
+        os.environ['DB_PATH'] = tmp
+        os.environ['DATA_PATH'] = tmp
+        import app as karadoc
+        # Pas de workers (WiFi, Bluetooth, Deezer…) à la première requête
+        karadoc._workers_started = True
+        karadoc.init_database()
+        _app_module = karadoc
+    return _app_module
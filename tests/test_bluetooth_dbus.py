@@ -0,0 +1,257 @@
+import unittest
+from unittest import mock
+
+from karapp import bluetooth
+from karapp.bluetooth_dbus import BluezDbusManager, AUDIO_SINK_UUID, HID_UUID
+from tests.fake_bluez import FakeBluezBus
+
+SPEAKER = '11:22:33:44:55:66'
+KEYBOARD = 'AA:BB:CC:DD:EE:FF'
+PHONE = '01:02:03:04:05:06'
+
+
+class BluezDbusManagerTest(unittest.TestCase):
+    """Backend D-Bus face au faux BlueZ."""
+
+    def setUp(self):
+        self.bus = FakeBluezBus()
+        self.bus.add_device(SPEAKER, 'Enceinte', paired=True, trusted=True, uuids=[AUDIO_SINK_UUID])
+        self.bus.add_device(KEYBOARD, 'Clavier', uuids=[HID_UUID], rssi=-40)
+        self.manager = BluezDbusManager(bus=self.bus)
+
+    def test_no_adapter(self):
+        bus = FakeBluezBus()
+        bus.objects.clear()
+        with self.assertRaises(RuntimeError):
+            BluezDbusManager(bus=bus)
+
+    def test_known_devices(self):
+        devices = {d['mac']: d for d in self.manager.get_devices()}
+        self.assertEqual(set(devices), {SPEAKER, KEYBOARD})
+        self.assertEqual(devices[SPEAKER]['device_type'], 'audio')
+        self.assertTrue(devices[SPEAKER]['paired'])
+        self.assertEqual(devices[KEYBOARD]['device_type'], 'input')
+        self.assertEqual(devices[KEYBOARD]['rssi'], -40)
+        self.assertIsNone(self.manager.get_device(PHONE))
+
+    def test_discovery(self):
+        self.bus.add_device(PHONE, 'Téléphone', rssi=-70, discoverable=True)
+        events = []
+        passes = iter(range(3))
+
+        def should_stop():
+            if next(passes, None) == 1:
+                # Entre deux passages : le clavier s'éloigne, l'enceinte se connecte
+                del self.bus.objects[f"{FakeBluezBus.ADAPTER_PATH}/dev_{KEYBOARD.replace(':', '_')}"]
+                self.bus.get('org.bluez', self.manager._device_path(SPEAKER)).Connect()
+            return len(events) >= 5
+
+        self.manager.discover(lambda mac, changes: events.append((mac, changes)), should_stop, interval=0)
+        self.assertEqual({mac for mac, _ in events[:3]}, {SPEAKER, KEYBOARD, PHONE})
+        self.assertIn((SPEAKER, {'connected': True}), events[3:])
+        self.assertIn((KEYBOARD, None), events[3:])
+        # Découverte arrêtée en sortant
+        self.assertEqual(self.bus.calls[-1][0], 'StopDiscovery')
+
+    def test_pair_and_connect(self):
+        self.assertEqual(self.manager.pair_device(KEYBOARD), (True, "Appairage réussi"))
+        self.assertEqual(self.manager.pair_device(KEYBOARD), (True, "Périphérique déjà appairé"))
+        self.assertTrue(self.manager.get_device(KEYBOARD)['trusted'])
+        self.assertEqual(self.manager.connect_device(SPEAKER), (True, "Connexion réussie"))
+        self.assertTrue(self.manager.get_device(SPEAKER)['connected'])
+        self.assertEqual([d['mac'] for d in self.manager.get_connected_devices()], [SPEAKER])
+        self.assertEqual(self.manager.disconnect_device(SPEAKER), (True, "Déconnexion réussie"))
+        self.assertFalse(self.manager.get_device(SPEAKER)['connected'])
+
+    def test_action_errors(self):
+        self.bus.fail[('Connect', SPEAKER)] = 'Failed'
+        self.assertEqual(self.manager.connect_device(SPEAKER), (False, "Erreur de connexion: Failed"))
+        # Appareil inconnu de BlueZ
+        success, message = self.manager.connect_device(PHONE)
+        self.assertFalse(success)
+        self.assertIn('Does Not Exist', message)
+
+    def test_remove(self):
+        self.assertEqual(self.manager.remove_device(SPEAKER), (True, "Périphérique supprimé"))
+        self.assertIsNone(self.manager.get_device(SPEAKER))
+        self.assertFalse(self.manager.remove_device(SPEAKER)[0])
+
+
+class ManagerSelectionTest(unittest.TestCase):
+    """Choix du gestionnaire : D-Bus, ou bluetoothctl en attendant D-Bus."""
+
+    def setUp(self):
+        bluetooth.reset_bt_manager()
+        bluetooth._dbus_retry_at = 0
+        self.attempts = 0
+
+    tearDown = setUp
+
+    def _patched(self, error):
+        """`BluezDbusManager()` échoue avec `error` au premier essai, puis
+        réussit sur un faux bus."""
+        real_init = BluezDbusManager.__init__
+
+        def init(manager, bus=None):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise error
+            real_init(manager, bus=FakeBluezBus())
+        return mock.patch.object(BluezDbusManager, '__init__', init)
+
+    def test_dbus_retried_after_fallback(self):
+        with self._patched(RuntimeError("bus système indisponible")), \
+                mock.patch('karapp.bluetooth.time') as clock:
+            clock.monotonic.return_value = 100
+            fallback = bluetooth._get_bt_manager()
+            self.assertEqual(type(fallback).__name__, 'BluetoothManager')
+            # Pas de nouvel essai avant le délai
+            clock.monotonic.return_value = 100 + bluetooth.DBUS_RETRY_DELAY - 1
+            self.assertIs(bluetooth._get_bt_manager(), fallback)
+            self.assertEqual(self.attempts, 1)
+            # Puis D-Bus remplace bluetoothctl, et reste en cache
+            clock.monotonic.return_value = 100 + bluetooth.DBUS_RETRY_DELAY
+            manager = bluetooth._get_bt_manager()
+            self.assertIsInstance(manager, BluezDbusManager)
+            self.assertIs(bluetooth._get_bt_manager(), manager)
+            self.assertEqual(self.attempts, 2)
+
+    def test_reset_retries_dbus_immediately(self):
+        with self._patched(RuntimeError("bluetoothd absent")), mock.patch('karapp.bluetooth.time') as clock:
+            clock.monotonic.return_value = 100
+            bluetooth._get_bt_manager()
+            bluetooth.reset_bt_manager()
+            self.assertIsInstance(bluetooth._get_bt_manager(), BluezDbusManager)
+
+    def test_no_retry_without_pydbus(self):
+        with self._patched(ImportError("No module named 'pydbus'")), \
+                mock.patch('karapp.bluetooth.time') as clock:
+            clock.monotonic.return_value = 100
+            fallback = bluetooth._get_bt_manager()
+            clock.monotonic.return_value = 10 ** 6
+            self.assertIs(bluetooth._get_bt_manager(), fallback)
+            self.assertEqual(self.attempts, 1)
+
+
+class RunActionTest(unittest.TestCase):
+    """Actions du worker : résultat publié dans la table de la découverte."""
+
+    def setUp(self):
+        self.bus = FakeBluezBus()
+        self.bus.add_device(SPEAKER, 'Enceinte', paired=True, uuids=[AUDIO_SINK_UUID])
+        bluetooth._bt_manager = BluezDbusManager(bus=self.bus)
+        self.discovery = bluetooth.BluetoothDiscovery()
+        for device in bluetooth._bt_manager.get_devices():
+            self.discovery.update_device(device['mac'], device)
+        self.patches = [mock.patch.object(bluetooth, 'bt_discovery', self.discovery),
+                        mock.patch.object(bluetooth, 'save_preferred_device'),
+                        mock.patch.object(bluetooth, 'load_preferred_device', return_value=None),
+                        # Pas de thread de découverte pendant le test
+                        mock.patch.object(self.discovery, '_run')]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        bluetooth.reset_bt_manager()
+
+    def test_connect_result(self):
+        bluetooth.run_action('connect', SPEAKER)
+        device, = self.discovery.snapshot()['devices']
+        self.assertTrue(device['connected'])
+        self.assertEqual(device['result'], "Connexion réussie")
+        self.assertIsNone(device['pending'])
+
+    def test_remove_result_survives_device_removal(self):
+        bluetooth.run_action('remove', SPEAKER)
+        # La découverte voit l'appareil disparaître de BlueZ
+        self.discovery.update_device(SPEAKER, None)
+        scan = self.discovery.snapshot()
+        self.assertEqual(scan['devices'], [])
+        self.assertEqual([(m['name'], m['result']) for m in scan['messages']],
+                         [('Enceinte', "Périphérique supprimé")])
+
+
+class DiscoveryEventTest(unittest.TestCase):
+    """Événements de la découverte : infos complétées une fois par appareil."""
+
+    def setUp(self):
+        self.bus = FakeBluezBus()
+        self.bus.add_device(KEYBOARD, 'Clavier', uuids=[HID_UUID], rssi=-40)
+        self.manager = BluezDbusManager(bus=self.bus)
+        self.discovery = bluetooth.BluetoothDiscovery()
+        patch = mock.patch.object(bluetooth, '_get_bt_manager', return_value=self.manager)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_new_device_is_completed_once(self):
+        with mock.patch.object(self.manager, 'get_device', wraps=self.manager.get_device) as get_device:
+            self.discovery._on_device_event(KEYBOARD, {'name': 'Clavier', 'rssi': -40})
+            self.discovery._on_device_event(KEYBOARD, {'rssi': -50})
+        get_device.assert_called_once_with(KEYBOARD)
+        device = self.discovery.get_device(KEYBOARD)
+        self.assertEqual(device['device_type'], 'input')
+        self.assertEqual(device['rssi'], -50)
+
+    def test_update_device_reports_new_devices(self):
+        self.assertTrue(self.discovery.update_device(KEYBOARD, {'rssi': -40}))
+        self.assertFalse(self.discovery.update_device(KEYBOARD, {'rssi': -50}))
+        self.assertFalse(self.discovery.update_device(KEYBOARD, None))
+
+
+class ReconnectTest(unittest.TestCase):
+    """Reconnexion au démarrage de l'appareil préféré."""
+
+    def setUp(self):
+        self.bus = FakeBluezBus()
+        self.bus.add_device(SPEAKER, 'Enceinte', paired=True, trusted=True, uuids=[AUDIO_SINK_UUID])
+        self.discovery = bluetooth.BluetoothDiscovery()
+        self.managers = []
+        self.patches = [mock.patch.object(bluetooth, 'bt_discovery', self.discovery),
+                        mock.patch.object(bluetooth, 'load_preferred_device',
+                                          return_value={'mac': SPEAKER, 'name': 'Enceinte'}),
+                        mock.patch.object(bluetooth, 'save_preferred_device'),
+                        mock.patch.object(bluetooth, '_get_bt_manager', side_effect=self._manager),
+                        mock.patch.object(bluetooth, 'reset_bt_manager'),
+                        mock.patch.object(bluetooth.time, 'sleep'),
+                        mock.patch.object(self.discovery, '_run')]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        bluetooth._bt_manager = None
+
+    def _manager(self):
+        manager = BluezDbusManager(bus=self.bus)
+        bluetooth._bt_manager = manager
+        self.managers.append(manager)
+        return manager
+
+    def test_retries_while_bluez_is_down(self):
+        failures = iter([RuntimeError("bluetoothd absent")] * 2)
+
+        def find_device(manager, mac):
+            error = next(failures, None)
+            if error:
+                raise error
+            return manager.get_device(mac)
+
+        with mock.patch.object(BluezDbusManager, 'find_device', find_device):
+            bluetooth.reconnect_preferred_device()
+        self.assertEqual(bluetooth.reset_bt_manager.call_count, 2)
+        device = self.discovery.get_device(SPEAKER)
+        self.assertTrue(device['connected'])
+        self.assertEqual(device['name'], 'Enceinte')
+
+    def test_gives_up_on_unknown_device(self):
+        bluetooth.load_preferred_device.return_value = {'mac': PHONE, 'name': 'Téléphone'}
+        bluetooth.reconnect_preferred_device()
+        self.assertEqual(len(self.managers), 1)
+        bluetooth.time.sleep.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
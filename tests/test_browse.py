@@ -0,0 +1,39 @@
+import unittest
+
+from karapp.models import db, FileModel
+from tests.karadoc_app import load_app
+
+
+class BrowseTest(unittest.TestCase):
+    """Navigation par album : paramètres refusés, pistes d'un album."""
+
+    def setUp(self):
+        self.app = load_app().app
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            FileModel.query.filter_by(category='musique').delete()
+            for number in (2, 1):
+                db.session.add(FileModel(type='file', category='musique', path=f'/musique/{number}.mp3',
+                                         name=f'Piste {number}', artist='Artiste', album='Album',
+                                         track_number=number, codec=''))
+            db.session.commit()
+
+    def test_album_tracks(self):
+        response = self.client.get('/musique/album', query_string={'artist': 'Artiste', 'album': 'Album'})
+        self.assertEqual(response.status_code, 200)
+        page = response.get_data(as_text=True)
+        self.assertIn('Album · Artiste', page)
+        self.assertLess(page.index('Piste 1'), page.index('Piste 2'))
+
+    def test_album_requires_artist_and_album(self):
+        for query in ({}, {'artist': 'Artiste'}, {'album': 'Album'}):
+            response = self.client.get('/musique/album', query_string=query)
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_bad_cursor(self):
+        response = self.client.get('/musique/albums/page', query_string={'after': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
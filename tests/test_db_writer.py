@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+STRESS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'db_stress.py')
+
+
+class DbStressTest(unittest.TestCase):
+    """Écritures concurrentes pendant des lectures (bench/db_stress.py --check) :
+    aucune erreur « database is locked », toutes les écritures en base et
+    dans les totaux du dossier."""
+
+    def _run(self, mode):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DB_PATH=tmp, DATA_PATH=tmp)
+            result = subprocess.run([sys.executable, STRESS, '--child', '--check', '--mode', mode,
+                                     '--writers', '4', '--readers', '2', '--rows', '50'],
+                                    cwd=os.path.dirname(os.path.dirname(STRESS)), env=env,
+                                    capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    def test_writer(self):
+        self._run('writer')
+
+    def test_direct(self):
+        self._run('direct')
+
+
+if __name__ == '__main__':
+    unittest.main()
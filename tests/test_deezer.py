@@ -0,0 +1,37 @@
+import unittest
+
+from karapp.models import db, DeezerItem
+from tests.karadoc_app import load_app
+
+
+class DeezerDeleteTest(unittest.TestCase):
+    """Suppression d'un élément enregistré depuis la grille d'une section."""
+
+    def setUp(self):
+        self.app = load_app().app
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            DeezerItem.query.delete()
+            first = DeezerItem(deezer_id='1', type='album', title='Premier album', subtitle='Artiste')
+            second = DeezerItem(deezer_id='2', type='album', title='Second album', subtitle='Artiste')
+            db.session.add_all([first, second])
+            db.session.commit()
+            self.first_id = first.id
+
+    def test_form_delete_keeps_other_items(self):
+        response = self.client.post(f'/deezer/delete/{self.first_id}', follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        page = response.get_data(as_text=True)
+        self.assertIn('Second album', page)
+        self.assertNotIn('Premier album', page)
+
+    def test_xhr_delete(self):
+        response = self.client.post(f'/deezer/delete/{self.first_id}',
+                                    headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.get_json(), {'success': True})
+        with self.app.app_context():
+            self.assertEqual([item.title for item in DeezerItem.query.all()], ['Second album'])
+
+
+if __name__ == '__main__':
+    unittest.main()
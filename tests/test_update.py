@@ -0,0 +1,78 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from karapp import update
+
+
+def _git(repo, *args):
+    return subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                          cwd=repo, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class RollbackTest(unittest.TestCase):
+    """Retour à la version précédente dans un dépôt git temporaire : les
+    dépendances sont réinstallées si requirements.txt diffère."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repo = tmp.name
+        _git(self.repo, 'init', '-q')
+        self.previous = self._commit('flask==2.0\n')
+
+        run_git = update._run_git
+
+        def run_git_in_repo(args, timeout=30, cwd=update.PROJECT_ROOT):
+            return run_git(args, timeout=timeout, cwd=self.repo if cwd == update.PROJECT_ROOT else cwd)
+
+        self.installed = []
+        patches = [mock.patch.object(update, '_run_git', run_git_in_repo),
+                   mock.patch.object(update, 'STAGING_DIR', os.path.join(self.repo, '.git', 'karadoc-update')),
+                   mock.patch.object(update, '_run_python', self._run_python),
+                   mock.patch.object(update.UpdateApplier, '_restart')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _commit(self, requirements, message='version'):
+        with open(os.path.join(self.repo, 'requirements.txt'), 'w') as f:
+            f.write(requirements)
+        with open(os.path.join(self.repo, 'app.py'), 'a') as f:
+            f.write(f'# {message}\n')
+        _git(self.repo, 'add', '.')
+        _git(self.repo, 'commit', '-q', '-m', message)
+        return _git(self.repo, 'rev-parse', 'HEAD')
+
+    def _run_python(self, args, timeout, cwd):
+        if args[:3] == ['-m', 'pip', 'install']:
+            with open(args[-1]) as f:
+                self.installed.append(f.read())
+
+    def _rollback(self):
+        current = _git(self.repo, 'rev-parse', 'HEAD')
+        _git(self.repo, 'update-ref', update.PREVIOUS_REF, self.previous)
+        update.UpdateApplier()._rollback()
+        self.assertEqual(_git(self.repo, 'rev-parse', 'HEAD'), self.previous)
+        self.assertEqual(_git(self.repo, 'rev-parse', update.PREVIOUS_REF), current)
+        self.assertFalse(os.path.exists(update.STAGING_DIR))
+
+    def test_requirements_changed(self):
+        self._commit('flask==3.0\n')
+        self._rollback()
+        self.assertEqual(self.installed, ['flask==2.0\n'])
+
+    def test_requirements_unchanged(self):
+        self._commit('flask==2.0\n', message='autre version')
+        self._rollback()
+        self.assertEqual(self.installed, [])
+
+    def test_no_previous_version(self):
+        with self.assertRaises(update.UpdateError):
+            update.UpdateApplier()._rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from karapp import wifi, wpa_ctrl
+from karapp.wpa_ctrl import WpaCtrl, WpaCtrlError
+from tests.fake_wpa_supplicant import FakeWpaSupplicant
+
+SCAN_RESULTS = [
+    ('10:d7:b0:20:1b:b2', 2462, -60, '[WPA2-PSK-CCMP][ESS]', 'Maison'),
+    ('10:d7:b0:20:1b:b3', 2412, -80, '[WPA2-PSK-CCMP][ESS]', 'Maison'),
+    ('a0:b1:c2:d3:e4:f5', 2437, -70, '[ESS]', 'Café'),
+    ('a0:b1:c2:d3:e4:f6', 2437, -50, '[ESS]', ''),
+]
+
+
+class WpaCtrlTest(unittest.TestCase):
+    """Client de la socket de contrôle face au faux wpa_supplicant."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fake = FakeWpaSupplicant(os.path.join(self.tmp.name, 'wlan0'), scan_results=SCAN_RESULTS).start()
+        self.ctrl = WpaCtrl(ctrl_path=self.fake.path).open()
+
+    def tearDown(self):
+        self.ctrl.close()
+        self.fake.stop()
+        self.tmp.cleanup()
+
+    def test_request(self):
+        self.assertEqual(self.ctrl.request('PING'), 'PONG\n')
+        self.assertEqual(self.ctrl.request('ADD_NETWORK').strip(), '0')
+
+    def test_fail_reply_raises(self):
+        # Réseau inconnu
+        with self.assertRaises(WpaCtrlError):
+            self.ctrl.request('SET_NETWORK 7 ssid "Maison"')
+        # raw_request ne l'interprète pas
+        self.assertEqual(self.ctrl.raw_request('ENABLE_NETWORK 7'), 'FAIL\n')
+
+    def test_scan_event(self):
+        self.ctrl.attach()
+        marker = self.ctrl.event_marker()
+        self.ctrl.request('SCAN')
+        event = self.ctrl.wait_event(wpa_ctrl.SCAN_RESULTS_EVENT, 2, after=marker)
+        self.assertIsNotNone(event)
+
+    def test_closed_connection(self):
+        self.ctrl.close()
+        with self.assertRaises(WpaCtrlError):
+            self.ctrl.request('PING')
+
+
+class WifiOverCtrlTest(unittest.TestCase):
+    """Fonctions de karapp.wifi, la socket de contrôle pointant vers le faux."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fake = FakeWpaSupplicant(os.path.join(self.tmp.name, wifi.WIFI_INTERFACE),
+                                      scan_results=SCAN_RESULTS).start()
+        self._ctrl_dir = wpa_ctrl.CTRL_DIR
+        wpa_ctrl.CTRL_DIR = self.tmp.name
+        wifi._wpa = None
+        wifi._wpa_retry_at = 0
+
+    def tearDown(self):
+        if wifi._wpa is not None:
+            wifi._wpa.close()
+            wifi._wpa = None
+        wpa_ctrl.CTRL_DIR = self._ctrl_dir
+        self.fake.stop()
+        self.tmp.cleanup()
+
+    def test_scan(self):
+        networks = wifi.WifiScanner()._scan()
+        # Un seul réseau par SSID (le meilleur signal), SSID masqués ignorés
+        self.assertEqual([(n['ssid'], n['signal'], n['secured']) for n in networks],
+                         [('Maison', 80, True), ('Café', 60, False)])
+        self.assertIn('SCAN', self.fake.commands)
+
+    def test_connect_new_network(self):
+        success, _ = wifi.connect_to_wifi('Maison', 'secret')
+        self.assertTrue(success)
+        self.assertEqual(self.fake.networks, {0: {'ssid': '"Maison"', 'psk': '"secret"'}})
+        self.assertEqual(wifi.get_current_wifi(), 'Maison')
+        # Connu désormais : pas de doublon à la reconnexion
+        self.assertTrue(wifi.connect_to_wifi('Maison')[0])
+        self.assertEqual(len(self.fake.networks), 1)
+
+    def test_connect_failure_removes_created_network(self):
+        self.fake.fail.add('ENABLE_NETWORK')
+        success, message = wifi.connect_to_wifi('Café')
+        self.assertFalse(success)
+        self.assertIn('Erreur de configuration', message)
+        self.assertEqual(self.fake.networks, {})
+        self.assertTrue(any(c.startswith('REMOVE_NETWORK') for c in self.fake.commands))
+
+    def test_connect_failure_keeps_existing_network(self):
+        self.assertTrue(wifi.connect_to_wifi('Maison', 'secret')[0])
+        self.fake.fail.add('ENABLE_NETWORK')
+        self.assertFalse(wifi.connect_to_wifi('Maison', 'autre')[0])
+        self.assertIn(0, self.fake.networks)
+
+
+if __name__ == '__main__':
+    unittest.main()